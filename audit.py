@@ -0,0 +1,387 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import threading
+import zlib
+from datetime import date, datetime, timezone
+
+
+# Entries per segment before it is sealed, and per compressed block inside it
+SEGMENT_ENTRIES = 16384
+BLOCK_ENTRIES = 512
+# zlib level for sealed blocks; the fastest level still shrinks JSONL about
+# 5x, and sealing runs inside writes such as bulk imports
+COMPRESS_LEVEL = 1
+# Hash the first entry points back to
+GENESIS = "0" * 64
+
+
+def _encode_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# One encoder for every entry; json.dumps with options builds a new one per call
+_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=_encode_value)
+
+
+def _canonical(entry):
+    return _encoder.encode(entry)
+
+
+def entry_hash(entry):
+    # SHA-256 over every field but the hash itself; `prev` links the chain
+    return hashlib.sha256(_canonical({k: v for k, v in entry.items() if k != "hash"}).encode("utf-8")).hexdigest()
+
+
+def _fields(request):
+    # The request's fields but id and name, as they read back from JSON
+    fields = request.to_dict()
+    fields.pop("id", None)
+    fields.pop("name", None)
+    for key, value in fields.items():
+        if isinstance(value, date):
+            fields[key] = value.isoformat()
+    return fields
+
+
+def _day(value):
+    # Dates and datetimes to the "YYYY-MM-DD" prefix of an entry's `at`
+    return value.isoformat()[:10] if value is not None else None
+
+
+class _Segment:
+    # A sealed segment: independently compressed blocks in a .seg file and
+    # a sparse index with the seq range, day range and employees of every
+    # block. The data file is read through a memory map, so a query only
+    # touches and decompresses the blocks it needs.
+    def __init__(self, data_path, index_path):
+        self.data_path = data_path
+        with open(index_path, encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.blocks = self.index["blocks"]
+        for block in self.blocks:
+            block["employees"] = frozenset(block["employees"])
+        self._file = None
+        self._map = None
+
+    def _view(self):
+        if self._map is None:
+            self._file = open(self.data_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read_block(self, block):
+        view = self._view()
+        raw = zlib.decompress(view[block["offset"]:block["offset"] + block["length"]])
+        return [json.loads(line) for line in raw.decode("utf-8").splitlines()]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+
+class AuditLog:
+    # Append-only, hash-chained record of every submission and decision.
+    #
+    # Each entry carries its sequence number, time, actor, action and the
+    # request as it stood, plus the hash of the entry before it, so editing
+    # or dropping any entry breaks every hash after it (see `verify`).
+    #
+    # Entries go to a plain JSONL segment. Every SEGMENT_ENTRIES entries the
+    # segment is sealed: rewritten as zlib blocks with a sparse index, then
+    # the JSONL file is removed. Queries by employee and period skip whole
+    # segments and blocks using the index.
+    def __init__(self, path, segment_entries=SEGMENT_ENTRIES, block_entries=BLOCK_ENTRIES):
+        self.path = os.path.join(path, "audit")
+        self.segment_entries = segment_entries
+        self.block_entries = block_entries
+        self.lock = threading.Lock()
+        self.sealed = []
+        # Entries in the active JSONL segment; they are read back from disk
+        # when needed rather than kept in memory. Only (seq, day, employee)
+        # of each is kept, for the index written when the segment is sealed.
+        self.active = 0
+        self.active_first_day = None
+        self.active_keys = []
+        self.segment = 1
+        self.seq = 0
+        self.head = GENESIS
+        self._log = None
+
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _file(self, segment, suffix):
+        return os.path.join(self.path, f"audit-{segment:06d}{suffix}")
+
+    # Loading
+
+    def _load(self):
+        names = sorted(os.listdir(self.path))
+        for name in names:
+            if name.endswith(".idx"):
+                segment = int(name[6:12])
+                self.sealed.append(_Segment(self._file(segment, ".seg"), self._file(segment, ".idx")))
+                # Sealed before a crash, but the JSONL copy was not removed yet
+                if os.path.exists(self._file(segment, ".jsonl")):
+                    os.remove(self._file(segment, ".jsonl"))
+                self.segment = segment + 1
+                self.seq = self.sealed[-1].index["last_seq"]
+                self.head = self.sealed[-1].index["head"]
+
+        active_path = self._file(self.segment, ".jsonl")
+        if os.path.exists(active_path):
+            good = 0
+            last = None
+            with open(active_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("no line end")
+                        last = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write; cut it off
+                        # so the next entry starts on a clean line
+                        break
+                    if self.active_first_day is None:
+                        self.active_first_day = last["at"][:10]
+                    self.active += 1
+                    self.active_keys.append((last["seq"], last["at"][:10], last["employee"]))
+                    good += len(line)
+            if good != os.path.getsize(active_path):
+                with open(active_path, "r+b") as f:
+                    f.truncate(good)
+            if last is not None:
+                self.seq = last["seq"]
+                self.head = last["hash"]
+        self._log = open(active_path, "a", encoding="utf-8")
+
+    def _read_active(self, containing=""):
+        # Called with the lock held, after the log was flushed. Lines without
+        # `containing` are skipped before parsing.
+        with open(self._file(self.segment, ".jsonl"), encoding="utf-8") as f:
+            return [json.loads(line) for line in f if containing in line and line.strip()]
+
+    # Writing
+
+    def record(self, action, request, actor, at=None):
+        return self.record_many(action, [request], actor, at)[0]
+
+    def record_many(self, action, requests, actor, at=None):
+        # One lock hold and one flush for a batch, e.g. an import chunk.
+        # Each entry is serialized once: the canonical text without the hash
+        # is hashed, and the same text with the hash appended is the line.
+        at = (at or datetime.now(timezone.utc)).isoformat(timespec="seconds")
+        with self.lock:
+            entries = []
+            for request in requests:
+                entry = {
+                    "seq": self.seq + 1,
+                    "at": at,
+                    "actor": actor,
+                    "action": action,
+                    "request": request["id"],
+                    "employee": request.get("name"),
+                    "fields": _fields(request),
+                    "prev": self.head,
+                }
+                text = _canonical(entry)
+                entry["hash"] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                self.seq, self.head = entry["seq"], entry["hash"]
+                entries.append(entry)
+                self._log.write(f'{text[:-1]},"hash":"{entry["hash"]}"}}\n')
+                if self.active_first_day is None:
+                    self.active_first_day = at[:10]
+                self.active += 1
+                self.active_keys.append((entry["seq"], at[:10], entry["employee"]))
+                if self.active >= self.segment_entries:
+                    self._log.flush()
+                    self._seal()
+            self._log.flush()
+            return entries
+
+    def _seal(self):
+        # Rewrite the active segment as compressed blocks. The JSONL lines
+        # are copied as they are, and the index comes from `active_keys`, so
+        # nothing is parsed again. The index is written last, so a segment
+        # without one is still in JSONL form.
+        data_path = self._file(self.segment, ".seg")
+        index_path = self._file(self.segment, ".idx")
+        with open(self._file(self.segment, ".jsonl"), "rb") as f:
+            lines = f.readlines()
+        keys = self.active_keys
+        blocks = []
+        with open(data_path, "wb") as f:
+            for i in range(0, len(lines), self.block_entries):
+                chunk = keys[i:i + self.block_entries]
+                data = zlib.compress(b"".join(lines[i:i + self.block_entries]), COMPRESS_LEVEL)
+                blocks.append({
+                    "offset": f.tell(),
+                    "length": len(data),
+                    "first_seq": chunk[0][0],
+                    "last_seq": chunk[-1][0],
+                    "first_day": chunk[0][1],
+                    "last_day": chunk[-1][1],
+                    "employees": sorted({employee for _, _, employee in chunk if employee is not None}),
+                })
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        index = {
+            "first_seq": keys[0][0],
+            "last_seq": keys[-1][0],
+            "first_day": blocks[0]["first_day"],
+            "last_day": blocks[-1]["last_day"],
+            "head": self.head,
+            "blocks": blocks,
+        }
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps(index, separators=(",", ":")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(index_path + ".tmp", index_path)
+
+        self._log.close()
+        os.remove(self._file(self.segment, ".jsonl"))
+        self.sealed.append(_Segment(data_path, index_path))
+        self.segment += 1
+        self.active = 0
+        self.active_first_day = None
+        self.active_keys = []
+        self._log = open(self._file(self.segment, ".jsonl"), "a", encoding="utf-8")
+
+    def close(self):
+        with self.lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            for segment in self.sealed:
+                segment.close()
+
+    # Reading
+
+    def entries(self, employee=None, start=None, end=None, actions=None, request_id=None):
+        # Entries in seq order, filtered by employee, by the day range
+        # [start, end] (dates or datetimes) and by action
+        first, last = _day(start), _day(end)
+
+        def wanted(entry):
+            day = entry["at"][:10]
+            return (
+                (employee is None or entry["employee"] == employee)
+                and (first is None or day >= first)
+                and (last is None or day <= last)
+                and (actions is None or entry["action"] in actions)
+                and (request_id is None or entry["request"] == request_id)
+            )
+
+        with self.lock:
+            sealed = list(self.sealed)
+            if last is not None and (self.active_first_day is None or last < self.active_first_day):
+                active = []
+            else:
+                active = self._read_active(_canonical(employee) if employee is not None else "")
+        for segment in sealed:
+            index = segment.index
+            if (first is not None and index["last_day"] < first) or (last is not None and index["first_day"] > last):
+                continue
+            for block in segment.blocks:
+                if first is not None and block["last_day"] < first:
+                    continue
+                if last is not None and block["first_day"] > last:
+                    continue
+                if employee is not None and employee not in block["employees"]:
+                    continue
+                for entry in segment.read_block(block):
+                    if wanted(entry):
+                        yield entry
+        for entry in active:
+            if wanted(entry):
+                yield entry
+
+    def decisions(self, employee, year):
+        # All final approvals and rejections for one employee made in `year`,
+        # including those the approval policy made
+        return list(self.entries(employee, date(year, 1, 1), date(year, 12, 31), ("approve", "reject", "auto-approve")))
+
+    # Verification
+
+    def verify(self):
+        # Walk the whole chain and recompute every hash. Returns
+        # (entries checked, problems); no problems means the log is intact.
+        # Cutting entries off the end leaves a valid chain, so compare the
+        # returned head with a copy kept elsewhere to catch that too.
+        problems = []
+        expected_seq, prev = 1, GENESIS
+        count = 0
+
+        def check(entry):
+            nonlocal expected_seq, prev, count
+            count += 1
+            if entry.get("seq") != expected_seq:
+                problems.append(f"entry {entry.get('seq')}: expected seq {expected_seq}")
+            if entry.get("prev") != prev:
+                problems.append(f"entry {entry.get('seq')}: does not follow the entry before it")
+            if entry_hash(entry) != entry.get("hash"):
+                problems.append(f"entry {entry.get('seq')}: contents do not match its hash")
+            expected_seq, prev = (entry.get("seq") or expected_seq) + 1, entry.get("hash")
+
+        with self.lock:
+            sealed = list(self.sealed)
+            active = self._read_active()
+        for segment in sealed:
+            for block in segment.blocks:
+                try:
+                    entries = segment.read_block(block)
+                except (zlib.error, ValueError) as ex:
+                    problems.append(f"{os.path.basename(segment.data_path)} block at {block['offset']}: unreadable ({ex})")
+                    continue
+                if not entries or entries[0]["seq"] != block["first_seq"] or entries[-1]["seq"] != block["last_seq"]:
+                    problems.append(f"{os.path.basename(segment.data_path)} block at {block['offset']}: does not match its index")
+                for entry in entries:
+                    check(entry)
+            if prev != segment.index["head"]:
+                problems.append(f"{os.path.basename(segment.data_path)}: last entry does not match the recorded head")
+        for entry in active:
+            check(entry)
+        return count, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or query the leave audit log")
+    parser.add_argument("command", choices=["verify", "show"])
+    parser.add_argument("--data", default="data", help="data directory of the app")
+    parser.add_argument("--worker", type=int, help="the log of this cluster.py worker, under <data>/workers/<n>")
+    parser.add_argument("--employee")
+    parser.add_argument("--year", type=int)
+    args = parser.parse_args()
+
+    path = args.data
+    if args.worker is not None:
+        path = os.path.join(args.data, "workers", str(args.worker))
+        if not os.path.isdir(path):
+            parser.error(f"no worker directory {path}")
+    log = AuditLog(path)
+    try:
+        if args.command == "verify":
+            count, problems = log.verify()
+            for problem in problems:
+                print(problem)
+            print(f"{count} entries checked, head {log.head}, {'OK' if not problems else f'{len(problems)} problem(s)'}")
+            raise SystemExit(1 if problems else 0)
+        start = date(args.year, 1, 1) if args.year else None
+        end = date(args.year, 12, 31) if args.year else None
+        for entry in log.entries(args.employee, start, end):
+            print(_canonical(entry))
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
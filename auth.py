@@ -0,0 +1,196 @@
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+
+ROLE_PERMISSIONS = {
+    "employee": frozenset({"submit", "view_history"}),
+    "manager": frozenset({"submit", "submit_for_others", "view_history", "decide", "import_export", "announce", "view_reports", "view_metrics"}),
+    "hr": frozenset({"submit", "submit_for_others", "view_history", "decide", "view_reports"}),
+}
+
+# Accounts of a fresh install; matches the test logins in the README
+SEED_USERS = [
+    {"email": "joynadu@management.com", "password": "1234", "name": "Joy Nadu", "role": "manager"},
+    {"email": "hr@management.com", "password": "1234", "name": "Amara Obi", "role": "hr"},
+    {"email": "liam@management.com", "password": "1234", "name": "Liam Johnson", "role": "employee"},
+]
+
+HASH_ITERATIONS = 200_000
+TOKEN_LIFETIME = 7 * 24 * 3600
+
+
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return salt, digest
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Authenticator:
+    # Users live in users.json with salted PBKDF2 hashes. A successful login
+    # returns a signed session token (email, expiry, HMAC) that later
+    # sessions present instead of the password, so returning users skip the
+    # slow hash. Hashing runs on a small thread pool so a burst of logins
+    # never ties up the threads that serve page events.
+    def __init__(self, path="data", workers=4):
+        self.users_path = os.path.join(path, "users.json")
+        self.secret_path = os.path.join(path, "secret.key")
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self.secret = self._load_secret()
+        self.users = self._load_users()
+        self.permissions = lru_cache(maxsize=4096)(self._permissions)
+
+    def _load_secret(self):
+        if not os.path.exists(self.secret_path):
+            with open(self.secret_path, "wb") as f:
+                f.write(secrets.token_bytes(32))
+        with open(self.secret_path, "rb") as f:
+            return f.read()
+
+    def _load_users(self):
+        self.users = {}
+        if os.path.exists(self.users_path):
+            with open(self.users_path, encoding="utf-8") as f:
+                self.users = json.load(f)
+        else:
+            # Only on a fresh install, so an account removed later does not
+            # come back with its well-known password
+            for user in SEED_USERS:
+                self._set_user(user["email"], user["password"], user["name"], user["role"])
+        return self.users
+
+    def _save_users(self):
+        tmp_path = self.users_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.users, f, indent=2)
+        os.replace(tmp_path, self.users_path)
+
+    def _set_user(self, email, password, name, role):
+        if role not in ROLE_PERMISSIONS:
+            raise ValueError(f"Unknown role: {role}")
+        salt, digest = hash_password(password)
+        self.users[email.lower()] = {
+            "name": name,
+            "role": role,
+            "salt": salt.hex(),
+            "hash": digest.hex(),
+            "iterations": HASH_ITERATIONS,
+        }
+        self._save_users()
+
+    def add_user(self, email, password, name, role="employee"):
+        with self.lock:
+            self._set_user(email, password, name, role)
+        self.permissions.cache_clear()
+
+    # Passwords
+
+    def check_password(self, email, password):
+        # Returns the user record or None; always hashes so unknown emails
+        # take as long as wrong passwords
+        user = self.users.get((email or "").strip().lower())
+        if user is None:
+            hash_password(password or "")
+            return None
+        _, digest = hash_password(password or "", bytes.fromhex(user["salt"]), user["iterations"])
+        if hmac.compare_digest(digest.hex(), user["hash"]):
+            return user
+        return None
+
+    def login(self, email, password):
+        # Future resolving to (user, token), or (None, None) on failure
+        def run():
+            user = self.check_password(email, password)
+            if user is None:
+                return None, None
+            return user, self.issue_token(email.strip().lower())
+
+        return self.executor.submit(run)
+
+    # Session tokens
+
+    def issue_token(self, email, lifetime=TOKEN_LIFETIME):
+        payload = f"{email}|{int(time.time()) + lifetime}".encode("utf-8")
+        signature = hmac.new(self.secret, payload, hashlib.sha256).digest()
+        return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+    def verify_token(self, token):
+        # Returns (email, user) for a valid unexpired token, else None
+        try:
+            payload_text, signature_text = (token or "").split(".")
+            payload = _b64decode(payload_text)
+            signature = _b64decode(signature_text)
+        except ValueError:
+            return None
+        expected = hmac.new(self.secret, payload, hashlib.sha256).digest()
+        if not hmac.compare_digest(signature, expected):
+            return None
+        email, _, expires = payload.decode("utf-8").rpartition("|")
+        if not expires.isdigit() or int(expires) < time.time():
+            return None
+        user = self.users.get(email)
+        if user is None:
+            return None
+        return email, user
+
+    # Roles
+
+    def _permissions(self, email):
+        user = self.users.get(email)
+        return ROLE_PERMISSIONS.get(user["role"], frozenset()) if user else frozenset()
+
+    def can(self, email, permission):
+        return permission in self.permissions(email)
+
+    def role(self, email):
+        user = self.users.get(email)
+        return user["role"] if user else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage sign-in accounts of the leave app")
+    parser.add_argument("command", choices=["add-user", "list"])
+    parser.add_argument("email", nargs="?")
+    parser.add_argument("--name", help="full name, as it appears on leave requests")
+    parser.add_argument("--role", choices=sorted(ROLE_PERMISSIONS), default="employee")
+    parser.add_argument("--data", default="data", help="data directory of the app")
+    args = parser.parse_args()
+
+    auth = Authenticator(args.data, workers=1)
+    try:
+        if args.command == "list":
+            for email, user in sorted(auth.users.items()):
+                print(f"{email:<32} {user['role']:<10} {user['name']}")
+            return
+        if not args.email or not args.name:
+            parser.error("add-user needs an email and --name")
+        password = getpass.getpass(f"Password for {args.email}: ")
+        if not password or password != getpass.getpass("Repeat password: "):
+            raise SystemExit("Passwords are empty or do not match")
+        auth.add_user(args.email, password, args.name, args.role)
+        print(f"Added {args.email} ({args.role})")
+    finally:
+        auth.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
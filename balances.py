@@ -0,0 +1,220 @@
+import threading
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch path falls back to lists
+    np = None
+
+
+LEAVE_TYPES = ["Vacation", "Sick Leave", "Maternity", "Paternity", "Annual Leave"]
+# Days granted per calendar year
+ANNUAL_ENTITLEMENT = {
+    "Vacation": 20,
+    "Sick Leave": 10,
+    "Maternity": 90,
+    "Paternity": 10,
+    "Annual Leave": 25,
+}
+# These build up day by day over the year; the rest are available up front
+ACCRUING_TYPES = ("Vacation", "Annual Leave")
+# Unused accruing leave that may move into the next year
+CARRY_OVER_LIMIT = 5
+
+
+def leave_days(start, end, year):
+    # Days of [start, end] falling inside `year`
+    if start is None:
+        return 0
+    end = end or start
+    first = max(start, date(year, 1, 1))
+    last = min(end, date(year, 12, 31))
+    return max((last - first).days + 1, 0)
+
+
+def year_fraction(on):
+    start = date(on.year, 1, 1)
+    days_in_year = (date(on.year + 1, 1, 1) - start).days
+    return ((on - start).days + 1) / days_in_year
+
+
+class BalanceEngine:
+    # Per employee and leave type: days carried over, accrued and used in
+    # `year`, held as an employees x leave types matrix (NumPy when
+    # available).
+    #
+    # `recompute` rebuilds the whole matrix in one vectorized pass and is
+    # what year-end rollover uses; batches of added requests, e.g. an
+    # import chunk, are added the same way. Day to day, the store listener
+    # adjusts a single cell whenever a request enters or leaves Approved.
+    def __init__(self, store, year=None, count_days=leave_days):
+        self.store = store
+        self.year = year or date.today().year
+        self.count_days = count_days
+        self.lock = threading.Lock()
+        self.type_index = {name: i for i, name in enumerate(LEAVE_TYPES)}
+        self.entitlement = self._vector([ANNUAL_ENTITLEMENT[t] for t in LEAVE_TYPES])
+        self.accruing = self._vector([1.0 if t in ACCRUING_TYPES else 0.0 for t in LEAVE_TYPES])
+        self.employees = {}
+        self.used = self._matrix(0)
+        self.carried = self._matrix(0)
+
+        with store.lock:
+            self.recompute()
+            store.subscribe(self.on_change, self.on_batch, self.on_updates)
+
+    # Matrix helpers; lists of lists stand in for arrays without NumPy
+
+    def _vector(self, values):
+        return np.array(values, dtype=float) if np is not None else list(values)
+
+    def _matrix(self, rows):
+        if np is not None:
+            return np.zeros((rows, len(LEAVE_TYPES)))
+        return [[0.0] * len(LEAVE_TYPES) for _ in range(rows)]
+
+    def _row(self, name):
+        row = self.employees.get(name)
+        if row is None:
+            row = self.employees[name] = len(self.employees)
+            if row >= len(self.used):
+                # Grow by doubling so adding employees stays amortized O(1)
+                extra = max(len(self.used), 16)
+                if np is not None:
+                    self.used = np.vstack([self.used, self._matrix(extra)])
+                    self.carried = np.vstack([self.carried, self._matrix(extra)])
+                else:
+                    self.used.extend(self._matrix(extra))
+                    self.carried.extend(self._matrix(extra))
+        return row
+
+    # Batch path
+
+    def _usage(self, requests):
+        # (rows, cols, days) of the approved leave in `requests` this year.
+        # Called with the lock held; may grow the matrices.
+        rows, cols, days = [], [], []
+        type_index = self.type_index
+        count_days = self.count_days
+        year = self.year
+        for request in requests:
+            if request.get("status") != "Approved":
+                continue
+            col = type_index.get(request.get("type"))
+            if col is None:
+                continue
+            used = count_days(request.get("start_date"), request.get("end_date"), year)
+            if used:
+                rows.append(self._row(request["name"]))
+                cols.append(col)
+                days.append(used)
+        return rows, cols, days
+
+    def _totals(self, rows, cols, days):
+        # Usage summed per cell, as a matrix the size of `used`
+        size = len(self.used)
+        width = len(LEAVE_TYPES)
+        if np is not None:
+            flat = np.array(rows, dtype=np.int64) * width + np.array(cols, dtype=np.int64)
+            totals = np.bincount(flat, weights=np.array(days, dtype=float), minlength=size * width)
+            return totals[: size * width].reshape(size, width)
+        totals = self._matrix(size)
+        for row, col, used in zip(rows, cols, days):
+            totals[row][col] += used
+        return totals
+
+    def recompute(self, requests=None):
+        if requests is None:
+            requests = self.store.requests.values()
+        with self.lock:
+            self.used = self._totals(*self._usage(requests))
+
+    def on_batch(self, requests):
+        with self.lock:
+            rows, cols, days = self._usage(requests)
+            if not rows:
+                return
+            if np is not None:
+                self.used += self._totals(rows, cols, days)
+            else:
+                for row, col, used in zip(rows, cols, days):
+                    self.used[row][col] += used
+
+    def remaining_all(self, on=None):
+        # Employees x leave types matrix of days left on `on`
+        on = on or date.today()
+        fraction = min(year_fraction(on), 1.0) if on.year == self.year else 1.0
+        with self.lock:
+            if np is not None:
+                # Accruing types earn `fraction` of the entitlement, the rest all of it
+                scale = self.accruing * fraction + (1 - self.accruing)
+                return self.carried + self.entitlement * scale - self.used
+            result = []
+            for used_row, carried_row in zip(self.used, self.carried):
+                result.append([
+                    carried + entitlement * (fraction if accruing else 1.0) - used
+                    for used, carried, entitlement, accruing in zip(
+                        used_row, carried_row, self.entitlement, self.accruing
+                    )
+                ])
+            return result
+
+    def rollover(self):
+        # Close the year: carry over what is left of accruing leave, capped
+        # at CARRY_OVER_LIMIT, then rebuild usage for the new year
+        year_end = date(self.year, 12, 31)
+        remaining = self.remaining_all(year_end)
+        with self.lock:
+            if np is not None:
+                self.carried = np.clip(remaining, 0, CARRY_OVER_LIMIT) * self.accruing
+            else:
+                self.carried = [
+                    [min(max(value, 0), CARRY_OVER_LIMIT) * accruing for value, accruing in zip(row, self.accruing)]
+                    for row in remaining
+                ]
+            self.year += 1
+        self.recompute()
+
+    # Incremental path
+
+    def on_change(self, request, previous):
+        with self.lock:
+            self._change(request, previous)
+
+    def on_updates(self, changes):
+        with self.lock:
+            for request, previous in changes:
+                self._change(request, previous)
+
+    def _change(self, request, previous):
+        old = {**request, **previous} if previous is not None else None
+        if old is not None and old.get("status") == "Approved":
+            self._adjust(old, -1)
+        if request.get("status") == "Approved":
+            self._adjust(request, 1)
+
+    def _adjust(self, request, sign):
+        col = self.type_index.get(request.get("type"))
+        if col is None:
+            return
+        used = self.count_days(request.get("start_date"), request.get("end_date"), self.year)
+        if used:
+            # _row may grow (replace) the matrix, so resolve it first
+            row = self._row(request["name"])
+            self.used[row][col] += sign * used
+
+    # Lookups
+
+    def balance(self, name, leave_type, on=None):
+        # (entitled so far, used, remaining) for one employee and leave type
+        on = on or date.today()
+        col = self.type_index.get(leave_type)
+        if col is None:
+            return None
+        fraction = min(year_fraction(on), 1.0) if on.year == self.year else 1.0
+        with self.lock:
+            row = self.employees.get(name)
+            used = float(self.used[row][col]) if row is not None else 0.0
+            carried = float(self.carried[row][col]) if row is not None else 0.0
+        entitled = carried + ANNUAL_ENTITLEMENT[leave_type] * (fraction if self.accruing[col] else 1.0)
+        return entitled, used, entitled - used
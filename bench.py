@@ -0,0 +1,432 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from balances import LEAVE_TYPES
+from main import LeaveRequestApp
+from policy import APPROVER_ROLES, ApprovalPolicy
+from records import LeaveRequest
+from store import InvalidTransition, StaleRequest
+
+
+# Benchmarks and a headless load driver for LeaveRequestApp.
+#
+#   python bench.py                      hot paths at 1k, 10k, 100k and 1M requests
+#   python bench.py --sizes 1000 10000   pick the sizes
+#   python bench.py --sessions 50        also run 50 concurrent headless sessions
+#   python bench.py --metrics            run with instrumentation on and print it
+#   python bench.py --workers 4          load run on 1, 2 and 4 processes sharing SQLite
+#
+# Every run works on a throwaway data directory and prints one line per
+# measurement, so two runs can be diffed to spot regressions.
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEPARTMENTS = list(LeaveRequestApp.DEPARTMENT_HEADCOUNT)
+REASONS = ["Family vacation", "Medical appointment", "Moving house", "Conference", "Personal matters", ""]
+FIRST_NAMES = ["Liam", "Olivia", "Noah", "Emma", "Ava", "Mia", "Lucas", "Amara", "Kofi", "Yuki", "Sofia", "Omar"]
+LAST_NAMES = ["Johnson", "Chen", "Patel", "Rodriguez", "Okafor", "Tanaka", "Nowak", "Haddad", "Silva", "Berg"]
+# Share of generated requests per status
+STATUS_WEIGHTS = {"Pending": 0.2, "Approved": 0.65, "Rejected": 0.15}
+
+
+def employee_names(count):
+    names = (f"{first} {last}" for last, first in itertools.product(LAST_NAMES, FIRST_NAMES))
+    result = list(itertools.islice(names, count))
+    for i in range(len(result), count):
+        result.append(f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i % len(LAST_NAMES)]} {i}")
+    return result
+
+
+def generate_requests(count, employees=None, seed=0, around=None):
+    # Yields `count` LeaveRequest records ready for store.add_many.
+    # Most leave is short, with the odd long absence; dates spread over the
+    # two years around `around`.
+    rng = random.Random(seed)
+    around = around or date.today()
+    employees = employees or max(count // 20, 10)
+    names = employee_names(employees)
+    departments = {name: DEPARTMENTS[i % len(DEPARTMENTS)] for i, name in enumerate(names)}
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    for _ in range(count):
+        name = rng.choice(names)
+        start = around + timedelta(days=rng.randint(-365, 365))
+        length = rng.choice((0, 0, 1, 2, 4, 4, 9)) if rng.random() < 0.97 else rng.randint(20, 90)
+        status = rng.choices(statuses, weights)[0]
+        decided = status != "Pending"
+        yield LeaveRequest(
+            name=name,
+            type=rng.choice(LEAVE_TYPES),
+            department=departments[name],
+            start_date=start,
+            end_date=start + timedelta(days=length),
+            status=status,
+            reason=rng.choice(REASONS),
+            decided_by="Joy Nadu" if decided else None,
+            decided_on=(start - timedelta(days=rng.randint(1, 30))).isoformat() if decided else None,
+        )
+
+
+def generate_rules(count, seed=0):
+    # `count` routing rules over the bench departments and leave types,
+    # with a catch-all last, for timing policy evaluation
+    rng = random.Random(seed)
+    roles = list(APPROVER_ROLES)
+    rules = []
+    for i in range(count - 1):
+        rule = {"name": f"rule-{i}", "steps": rng.sample(roles, rng.randint(0, len(roles)))}
+        if rng.random() < 0.7:
+            rule["departments"] = rng.sample(DEPARTMENTS, rng.randint(1, 2))
+        if rng.random() < 0.7:
+            rule["types"] = rng.sample(LEAVE_TYPES, rng.randint(1, 2))
+        if rng.random() < 0.5:
+            rule["min_days"] = rng.randint(0, 15)
+        if rng.random() < 0.5:
+            rule["max_days"] = rng.randint(1, 30)
+        rules.append(rule)
+    rules.append({"name": "default", "steps": ["manager"]})
+    return rules
+
+
+class HeadlessStorage(dict):
+    def set(self, key, value):
+        self[key] = value
+
+    async def set_async(self, key, value):
+        self[key] = value
+
+    def remove(self, key):
+        self.pop(key, None)
+
+
+class HeadlessPage:
+    # Just enough of ft.Page for LeaveRequestApp.main to run without a
+    # client. Counts page.update() calls so the driver can report them.
+    def __init__(self, session_id, token=None):
+        self.session_id = session_id
+        self.route = "/"
+        self.views = []
+        self.overlay = []
+        self.dialogs = []
+        self.client_storage = HeadlessStorage()
+        if token is not None:
+            self.client_storage.set(LeaveRequestApp.SESSION_TOKEN_KEY, token)
+        self.updates = 0
+        self.title = self.theme_mode = self.padding = self.snack_bar = None
+        self.on_route_change = self.on_view_pop = self.on_close = None
+
+    def go(self, route):
+        self.route = route
+        if self.on_route_change is not None:
+            self.on_route_change(route)
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def open(self, control):
+        self.dialogs.append(control)
+
+    def close(self, control):
+        if control in self.dialogs:
+            self.dialogs.remove(control)
+
+    def run_thread(self, handler, *args):
+        threading.Thread(target=handler, args=args, daemon=True).start()
+
+
+def close_app(app):
+    app.broker.close()
+    app.notifier.close()
+    app.audit.close()
+    app.workers.shutdown()
+    app.auth.executor.shutdown(wait=False)
+    app.store.close()
+
+
+def timed(fn, repeat):
+    # Median and worst wall time of `repeat` calls, in milliseconds
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def report(size, name, result):
+    median, worst = result
+    print(f"{size:>9,}  {name:<24} median {median:9.3f} ms   max {worst:9.3f} ms", flush=True)
+
+
+class Bench:
+    # One app loaded with `size` synthetic requests in a temporary directory.
+    # Given `path`, it joins the data already there instead, as another
+    # worker process of the same deployment.
+    def __init__(self, size, seed=0, metrics=False, backend="jsonl", path=None, worker=None):
+        self.size = size
+        self.owner = path is None
+        self.path = path or tempfile.mkdtemp(prefix="leave-bench-")
+        self.app = LeaveRequestApp(self.path, metrics=metrics, backend=backend, worker=worker)
+        self.rng = random.Random(seed)
+        self.sessions = itertools.count()
+        started = time.perf_counter()
+        if self.owner:
+            rows = generate_requests(size, seed=seed)
+            while True:
+                chunk = list(itertools.islice(rows, 5000))
+                if not chunk:
+                    break
+                self.app.store.add_many(chunk)
+        self.load_seconds = time.perf_counter() - started
+        # Sessions sign in as the manager, who also makes the bulk decisions
+        self.manager = next(email for email, user in self.app.auth.users.items() if user["role"] == "manager")
+        self.token = self.app.auth.issue_token(self.manager)
+        self.employees = sorted(self.app.store.by_employee)
+
+    def close(self):
+        close_app(self.app)
+        if self.owner:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def import_seconds(self):
+        # The store exported to CSV, then imported into a fresh app, with
+        # routing and the audit trail. Only the import itself is timed.
+        path = tempfile.mkdtemp(prefix="leave-bench-import-")
+        try:
+            csv_path = os.path.join(path, "requests.csv")
+            self.app.export_requests(csv_path)
+            app = LeaveRequestApp(os.path.join(path, "data"))
+            try:
+                started = time.perf_counter()
+                result = app.import_requests(csv_path, actor=self.manager)
+                return time.perf_counter() - started, result.imported
+            finally:
+                close_app(app)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def open_session(self):
+        page = HeadlessPage(f"bench-{os.getpid()}-{next(self.sessions)}", self.token)
+        self.app.main(page)
+        return page
+
+    def session_memory(self, count):
+        # Bytes allocated per open session, signed in and sitting on /home
+        pages = []
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            pages = [self.open_session() for _ in range(count)]
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+            for page in pages:
+                self.app.broker.unsubscribe(page.session_id)
+        return (after - before) / count
+
+    def fields(self):
+        start = date.today() + timedelta(days=self.rng.randint(400, 4000))
+        return LeaveRequest(
+            name=self.rng.choice(self.employees),
+            type=self.rng.choice(LEAVE_TYPES),
+            department=self.rng.choice(DEPARTMENTS),
+            start_date=start,
+            end_date=start + timedelta(days=self.rng.randint(0, 4)),
+            status="Pending",
+            reason="Benchmark",
+        )
+
+    def approve_one(self):
+        # Timed through the app, with the policy check, audit and
+        # notification. Another session may decide the same request first,
+        # and some wait for HR rather than the manager.
+        for request in self.app.store.with_status("Pending")[:10]:
+            try:
+                return self.app.decide_request(request["id"], "Approved", self.manager)
+            except (InvalidTransition, StaleRequest):
+                continue
+
+    def run(self, repeat):
+        app = self.app
+        size = self.size
+        print(f"{size:>9,}  {'load (add_many)':<24} {self.load_seconds:9.3f} s", flush=True)
+        seconds, imported = self.import_seconds()
+        print(f"{size:>9,}  {'import (CSV)':<24} {seconds:9.3f} s   {imported / seconds:9,.0f} rows/s", flush=True)
+
+        page = self.open_session()
+        report(size, "session start", timed(self.open_session, repeat))
+        print(f"{size:>9,}  {'session memory':<24} {self.session_memory(repeat) / 1024:9.1f} KiB", flush=True)
+
+        def fresh_history():
+            session = HeadlessPage("bench-history", self.token)
+            app.main(session)
+            session.go("/history")
+            app.broker.unsubscribe(session.session_id)
+
+        report(size, "history view (fresh)", timed(fresh_history, repeat))
+        page.go("/history")
+        report(size, "route_change (cached)", timed(lambda: page.go("/history") or page.go("/home"), repeat))
+        report(size, "schedule view (month)", timed(lambda: app.staffing.schedule(DEPARTMENTS[1], date.today().replace(day=1), 31), repeat))
+        report(size, "submit", timed(lambda: app.submit_request(self.fields()), repeat))
+        report(size, "approve", timed(self.approve_one, repeat))
+
+        prefixes = [name[:2].lower() for name in self.employees[:repeat]] or ["jo"]
+        queries = itertools.cycle(prefixes)
+        report(size, "search (first page)", timed(
+            lambda: list(itertools.islice(app.search.query(next(queries), None), app.HISTORY_PAGE_SIZE)), repeat
+        ))
+        report(size, "dashboard aggregates", timed(
+            lambda: (app.stats.pending, app.stats.approved_today, app.stats.upcoming), repeat
+        ))
+        report(size, "reports rollups", timed(
+            lambda: (app.reports.rejection_rates(), app.reports.peak_weeks()), repeat
+        ))
+        # Evaluation only: 1,000 requests routed per call, through the
+        # default policy and through a generated one with 300 rules
+        sample = [app.store.requests[request_id] for request_id in itertools.islice(app.store.ids(), 1000)]
+        many_rules = ApprovalPolicy(generate_rules(300, self.rng.random()))
+        for name, policy in (("policy route x1000", app.policy), ("300 rules route x1000", many_rules)):
+            report(size, name, timed(
+                lambda: [policy.route(r.department, r.type, app.request_days(r)) for r in sample], repeat
+            ))
+        # The generated requests were loaded without a route, as if saved
+        # before the policy existed; this routes every pending one
+        report(size, f"reroute ({app.store.count('Pending')} pending)", timed(app.reroute_pending, 1))
+        # Last, as it uses up the pending requests
+        pending = [request.id for request in app.store.with_status("Pending")[:2000]]
+        report(size, f"bulk approve ({len(pending)})", timed(
+            lambda: app.decide_requests(pending, "Approved", self.manager), 1
+        ))
+
+    def load(self, sessions, seconds, ready=None):
+        # Headless multi-session load: each session thread navigates between
+        # views and now and then submits or approves a request, so the
+        # change broker also fans updates out to every open session.
+        # Returns (latencies in ms, page updates, errors). `ready` lines up
+        # the start with other worker processes.
+        routes = ["/home", "/history", "/schedule", "/reports"]
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        pages = [self.open_session() for _ in range(sessions)]
+        if ready is not None:
+            ready.wait()
+        deadline = time.perf_counter() + seconds
+
+        def session_loop(page, seed):
+            rng = random.Random(seed)
+            local = []
+            while time.perf_counter() < deadline:
+                roll = rng.random()
+                started = time.perf_counter()
+                try:
+                    if roll < 0.1:
+                        self.app.submit_request(self.fields())
+                    elif roll < 0.15:
+                        self.approve_one()
+                    else:
+                        page.go(rng.choice(routes))
+                except Exception as ex:
+                    errors.append(ex)
+                local.append((time.perf_counter() - started) * 1000)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=session_loop, args=(page, i)) for i, page in enumerate(pages)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for page in pages:
+            self.app.broker.unsubscribe(page.session_id)
+        return latencies, sum(page.updates for page in pages), len(errors)
+
+    def drive(self, sessions, seconds):
+        report_load(self.size, f"load x{sessions}", seconds, *self.load(sessions, seconds))
+
+    def drive_workers(self, workers, sessions, seconds):
+        # The same load split over `workers` processes sharing this SQLite
+        # database, `sessions` per process
+        context = multiprocessing.get_context("spawn")
+        ready = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_load_worker, args=(self.path, i, sessions, seconds, ready, results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        latencies, updates, errors = [], 0, 0
+        for _ in processes:
+            worker_latencies, worker_updates, worker_errors = results.get()
+            latencies.extend(worker_latencies)
+            updates += worker_updates
+            errors += worker_errors
+        for process in processes:
+            process.join()
+        report_load(self.size, f"workers x{workers}", seconds, latencies, updates, errors)
+
+
+def _load_worker(path, index, sessions, seconds, ready, results):
+    bench = Bench(0, seed=index + 1, backend="sqlite", path=path, worker=index)
+    try:
+        results.put(bench.load(sessions, seconds, ready))
+    finally:
+        bench.close()
+
+
+def report_load(size, name, seconds, latencies, updates, errors):
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] if latencies else 0.0
+
+    print(
+        f"{size:>9,}  {name:<12} {len(latencies) / seconds:9.1f} actions/s   "
+        f"p50 {percentile(0.5):8.2f} ms   p99 {percentile(0.99):8.2f} ms   "
+        f"updates {updates:,}   errors {errors}",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the leave workflow hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=20, help="calls per timed measurement")
+    parser.add_argument("--sessions", type=int, default=0, help="concurrent headless sessions for the load run")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the load run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", action="store_true", help="enable instrumentation and print it per size")
+    parser.add_argument("--workers", type=int, default=0, help="also load 1, 2, 4 ... up to this many processes on SQLite")
+    parser.add_argument("--backend", choices=["jsonl", "sqlite"], default="jsonl")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        bench = Bench(size, args.seed, args.metrics, "sqlite" if args.workers else args.backend)
+        try:
+            bench.run(args.repeat)
+            if args.sessions:
+                bench.drive(args.sessions, args.seconds)
+            workers = 1
+            while args.workers:
+                bench.drive_workers(workers, args.sessions or 10, args.seconds)
+                if workers == args.workers:
+                    break
+                workers = min(workers * 2, args.workers)
+            if args.metrics:
+                print(bench.app.metrics.render(), flush=True)
+        finally:
+            bench.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeBroker:
+    # Fans store changes out to every connected session.
+    #
+    # Changed request ids are collected into one dict and delivered by a
+    # single dispatcher thread at most every `interval` seconds, so a burst
+    # of writes reaches each session as one batch of distinct ids.
+    def __init__(self, store, interval=0.2):
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.subscribers = {}
+        self.closed = False
+
+        store.subscribe(self.on_change)
+        self.thread = threading.Thread(target=self._run, name="change-broker", daemon=True)
+        self.thread.start()
+
+    def subscribe(self, key, callback):
+        # callback(changes) gets a dict of request id -> True for new requests
+        with self.condition:
+            self.subscribers[key] = callback
+
+    def unsubscribe(self, key):
+        with self.condition:
+            self.subscribers.pop(key, None)
+
+    def on_change(self, request, previous):
+        with self.condition:
+            # A request added and changed in the same batch still counts as new
+            self.pending[request["id"]] = self.pending.get(request["id"], False) or previous is None
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            # Let the rest of a burst arrive before delivering
+            time.sleep(self.interval)
+            with self.condition:
+                changes, self.pending = self.pending, {}
+                subscribers = list(self.subscribers.items())
+            for key, callback in subscribers:
+                try:
+                    callback(changes)
+                except Exception:
+                    logger.exception("Dropping subscriber %s", key)
+                    self.unsubscribe(key)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
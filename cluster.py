@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+
+import flet as ft
+
+from auth import Authenticator
+from main import LeaveRequestApp
+from notify import LocalSmtpServer, WebhookStub
+from sqlstore import SqliteStore
+from store import SEED_REQUESTS
+
+
+# Multi-worker deployment: N app processes share one SQLite database and
+# sit behind a single front port.
+#
+#   python cluster.py                 one worker per core, front port 8550
+#   python cluster.py --workers 4     pick the worker count
+#
+# Worker i serves on port + 1 + i. The front port hands every incoming
+# connection to the worker with the fewest open ones. A Flet session is
+# one websocket, so it stays on the worker it started on; a session that
+# reconnects elsewhere signs back in with its stored token.
+
+DEFAULT_PORT = 8550
+
+
+def run_worker(index, data_dir, port, metrics):
+    app = LeaveRequestApp(data_dir, metrics=metrics, outbound=True, backend="sqlite", worker=index)
+    if app.metrics.enabled:
+        app.metrics.serve(app.METRICS_PORT + 1 + index)
+    ft.app(app.main, view=None, port=port)
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+class FrontPort:
+    # Plain TCP forwarding to the least busy worker. Workers that refuse a
+    # connection (still starting, or gone) are skipped.
+    def __init__(self, backends):
+        self.backends = backends
+        self.open = [0] * len(backends)
+        # Rotates the starting point, so ties are broken round-robin
+        self.turn = 0
+
+    async def handle(self, reader, writer):
+        count = len(self.backends)
+        self.turn += 1
+        order = sorted(range(count), key=lambda i: (self.open[i], (i - self.turn) % count))
+        for i in order:
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(*self.backends[i])
+            except OSError:
+                continue
+            self.open[i] += 1
+            try:
+                await asyncio.gather(_pipe(reader, upstream_writer), _pipe(upstream_reader, writer))
+            finally:
+                self.open[i] -= 1
+            return
+        writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def prepare(data_dir):
+    # Create the database, seed data and accounts once, before the workers
+    # start, so they never race to initialise them
+    store = SqliteStore(data_dir)
+    store.seed(SEED_REQUESTS)
+    store.close()
+    Authenticator(data_dir).executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the leave app as several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--data", default="data")
+    args = parser.parse_args()
+
+    prepare(args.data)
+    LocalSmtpServer(os.path.join(args.data, "outbox"), *LeaveRequestApp.SMTP_SERVER)
+    WebhookStub(os.path.join(args.data, "outbox"), *LeaveRequestApp.WEBHOOK_SERVER)
+
+    metrics = os.environ.get("HR_LEAVE_METRICS") == "1"
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    backends = []
+    for index in range(args.workers):
+        port = args.port + 1 + index
+        process = context.Process(target=run_worker, args=(index, args.data, port, metrics), name=f"leave-worker-{index}")
+        process.start()
+        workers.append(process)
+        backends.append(("127.0.0.1", port))
+
+    print(f"Serving {args.workers} worker(s) on http://{args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(FrontPort(backends).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+
+
+DISPLAY_FORMAT = "%b %d, %Y"
+
+
+def to_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(value)
+
+
+def parse_date_range(text):
+    # "Mar 10 - Mar 15, 2024" or "Mar 12, 2024" -> (start, end)
+    try:
+        first, _, last = text.partition(" - ")
+        if not last:
+            day = datetime.strptime(first, DISPLAY_FORMAT).date()
+            return day, day
+        end = datetime.strptime(last, DISPLAY_FORMAT).date()
+        start = datetime.strptime(f"{first}, {end.year}", DISPLAY_FORMAT).date()
+        if start > end:
+            # "Dec 28 - Jan 03, 2025" spans the new year
+            start = start.replace(year=end.year - 1)
+        return start, end
+    except (AttributeError, ValueError):
+        return None, None
+
+
+def format_date_range(start, end):
+    if start is None:
+        return "Not set"
+    if end is None or end == start:
+        return start.strftime(DISPLAY_FORMAT)
+    if start.year == end.year:
+        return f"{start.strftime('%b %d')} - {end.strftime(DISPLAY_FORMAT)}"
+    return f"{start.strftime(DISPLAY_FORMAT)} - {end.strftime(DISPLAY_FORMAT)}"
+
+
+def request_dates(request):
+    return format_date_range(request.get("start_date"), request.get("end_date"))
@@ -0,0 +1,102 @@
+import bisect
+import threading
+from datetime import date, timedelta
+
+
+ACTIVE_STATUSES = ("Pending", "Approved")
+
+
+class LeaveCalendar:
+    # Sorted-endpoint index over the date ranges of active requests.
+    #
+    # Entries are (start, end, id) ordinal tuples kept sorted by start. A
+    # request covering day D must start in [D - longest + 1, D], so point and
+    # range queries bisect to that window and only check the ends inside it.
+    # "Upcoming" is a plain bisect range over the starts.
+    def __init__(self, store, statuses=ACTIVE_STATUSES):
+        self.store = store
+        self.statuses = statuses
+        self.lock = threading.Lock()
+        self.entries = []
+        self.positions = {}
+        self.longest = 1
+
+        with store.lock:
+            for request in store.requests.values():
+                entry = self._entry(request)
+                if entry is not None:
+                    self.entries.append(entry)
+            self.entries.sort()
+            for entry in self.entries:
+                self.positions[entry[2]] = entry
+                self.longest = max(self.longest, entry[1] - entry[0] + 1)
+            store.subscribe(self.on_change, self.on_batch)
+
+    def _entry(self, request):
+        if request.get("status") not in self.statuses:
+            return None
+        start, end = request.get("start_date"), request.get("end_date")
+        if start is None:
+            return None
+        end = end or start
+        return (start.toordinal(), end.toordinal(), request["id"])
+
+    def on_change(self, request, previous):
+        entry = self._entry(request)
+        with self.lock:
+            old = self.positions.pop(request["id"], None)
+            if old == entry:
+                if entry is not None:
+                    self.positions[request["id"]] = entry
+                return
+            if old is not None:
+                i = bisect.bisect_left(self.entries, old)
+                del self.entries[i]
+            if entry is not None:
+                bisect.insort(self.entries, entry)
+                self.positions[request["id"]] = entry
+                self.longest = max(self.longest, entry[1] - entry[0] + 1)
+
+    def on_batch(self, requests):
+        # New entries are sorted on their own and appended; the final sort
+        # only has two runs to merge
+        entries = sorted(e for e in map(self._entry, requests) if e is not None)
+        with self.lock:
+            for entry in entries:
+                self.positions[entry[2]] = entry
+                self.longest = max(self.longest, entry[1] - entry[0] + 1)
+            self.entries.extend(entries)
+            self.entries.sort()
+
+    def overlapping(self, start, end=None):
+        # Ids of requests overlapping [start, end]
+        first = start.toordinal()
+        last = (end or start).toordinal()
+        with self.lock:
+            lo = bisect.bisect_left(self.entries, (first - self.longest + 1,))
+            hi = bisect.bisect_right(self.entries, (last, float("inf")))
+            return [e[2] for e in self.entries[lo:hi] if e[1] >= first]
+
+    def on_leave(self, day):
+        return self.overlapping(day, day)
+
+    def _starts(self, start, end):
+        lo = bisect.bisect_left(self.entries, (start.toordinal(),))
+        hi = bisect.bisect_right(self.entries, (end.toordinal(), float("inf")))
+        return lo, hi
+
+    def starting_between(self, start, end):
+        with self.lock:
+            lo, hi = self._starts(start, end)
+            return [e[2] for e in self.entries[lo:hi]]
+
+    def upcoming(self, days, today=None):
+        today = today or date.today()
+        return self.starting_between(today, today + timedelta(days=days))
+
+    def count_upcoming(self, days, today=None):
+        # len(upcoming(...)) without building the list
+        today = today or date.today()
+        with self.lock:
+            lo, hi = self._starts(today, today + timedelta(days=days))
+            return hi - lo
@@ -1,146 +1,436 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import threading
+import time
 import flet as ft
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from audit import AuditLog
+from auth import Authenticator
+from balances import BalanceEngine, LEAVE_TYPES
+from broker import ChangeBroker
+from dates import request_dates
+from intervals import LeaveCalendar
+from metrics import Metrics
+from notify import EmailChannel, InboxChannel, LocalSmtpServer, Notifier, WebhookChannel, WebhookStub
+from records import LeaveRequest
+from occupancy import StaffingCalendar
+from policy import APPROVER_ROLES, load_policy, save_policy
+from reports import LeaveReports
+from search import RequestSearch
+from sqlstore import SqliteStore
+from stats import DashboardStats
+from store import InvalidTransition, LeaveStore, SEED_REQUESTS, StaleRequest
+import transfer
+from workdays import WorkCalendar
+from workers import Overloaded, WorkerPool
 
 class LeaveRequestApp:
-    def __init__(self):
+    HISTORY_PAGE_SIZE = 50
+    HISTORY_FILTERS = [
+        ("All", None),
+        ("Pending", "Pending"),
+        ("Approved", "Approved"),
+        ("Rejected", "Rejected"),
+    ]
+    SEARCH_DEBOUNCE = 0.25
+    # Department sizes and the minimum number of people who must stay in on
+    # any day; unknown departments fall back to the employees seen so far
+    DEPARTMENT_HEADCOUNT = {
+        "Design Department": 8,
+        "Engineering": 25,
+        "Marketing": 10,
+        "Human Resources": 6,
+        "Finance": 8,
+    }
+    DEPARTMENT_MIN_STAFF = {
+        "Design Department": 1,
+        "Engineering": 2,
+        "Marketing": 1,
+        "Human Resources": 1,
+        "Finance": 1,
+    }
+    # Working-day calendar used for leave durations and balances
+    HOLIDAY_REGION = "FI"
+    WEEKEND = (5, 6)
+    SESSION_TOKEN_KEY = "hr_leave.session_token"
+    REPORT_MONTHS = 6
+    # Team schedule grid: one three-character cell per day
+    SCHEDULE_MODES = {"Week": 7, "Month": None}
+    # Seconds an event handler waits for its background work
+    HANDLER_TIMEOUTS = {
+        "login": 10,
+        "submit": 5,
+        "decide": 5,
+    }
+    # Set HR_LEAVE_METRICS=1 to record timings; the text endpoint listens
+    # on localhost only
+    METRICS_PORT = 9464
+    # Outbound notifications; the defaults point at the local stand-ins
+    # started by `python main.py`
+    SMTP_SERVER = ("127.0.0.1", 8025)
+    WEBHOOK_SERVER = ("127.0.0.1", 8026)
+    WEBHOOK_URL = "http://%s:%d/leave-events" % WEBHOOK_SERVER
+    # Audit log action per decision status
+    AUDIT_ACTIONS = {"Approved": "approve", "Rejected": "reject"}
+    # Recorded as the decider of requests the approval policy approves
+    POLICY_ACTOR = "policy"
+    
+    def __init__(self, data_dir="data", metrics=False, outbound=False, backend="jsonl", worker=None):
+        # backend="sqlite" shares the requests with other worker processes
+        # (see cluster.py); each worker keeps its notification queue and
+        # audit chain in its own directory
+        local_dir = os.path.join(data_dir, "workers", str(worker)) if worker is not None else data_dir
+        self.data_dir = data_dir
         self.user_data = {}
-        self.leave_requests = [
-            {
-                "name": "Liam Johnson",
-                "type": "Vacation",
-                "dates": "Mar 10 - Mar 15, 2024",
-                "status": "Pending",
-                "reason": "Family vacation"
-            },
-            {
-                "name": "Olivia Chen",
-                "type": "Sick Leave",
-                "dates": "Mar 12, 2024",
-                "status": "Approved",
-                "reason": "Medical appointment"
-            },
-            {
-                "name": "Noah Patel",
-                "type": "Maternity",
-                "dates": "Apr 01 - Jun 30, 2024",
-                "status": "Rejected",
-                "reason": "Maternity leave for childbirth"
-            },
-            {
-                "name": "Emma Rodriguez",
-                "type": "Annual Vacation",
-                "dates": "Mar 20 - Mar 28, 2024",
-                "status": "Approved",
-                "reason": "Annual vacation with family"
-            }
-        ]
-
-    def main(self, page: ft.Page):
-        page.title = "HR Leave Request System"
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.padding = 0
-        
-        # Store form data
-        form_data = {}
-        
-        # Error message controls
-        email_error = ft.Text(
-            "Email is required",
-            color="red400",
-            size=12,
-            visible=False
-        )
-        password_error = ft.Text(
-            "Password is required",
-            color="red400",
-            size=12,
-            visible=False
-        )
-        
-        # Form field controls
-        employee_name_field = ft.TextField(
-            label="Employee Name",
-            hint_text="Enter employee name",
-            border_color="grey400",
-        )
-        
-        department_dropdown = ft.Dropdown(
-            label="Department",
-            hint_text="Select department",
-            options=[
-                ft.dropdown.Option("Design Department"),
-                ft.dropdown.Option("Engineering"),
-                ft.dropdown.Option("Marketing"),
-                ft.dropdown.Option("Human Resources"),
-                ft.dropdown.Option("Finance"),
-            ],
-        )
-        
-        leave_type_dropdown = ft.Dropdown(
-            label="Leave Type",
-            hint_text="Select leave type",
-            options=[
-                ft.dropdown.Option("Vacation"),
-                ft.dropdown.Option("Sick Leave"),
-                ft.dropdown.Option("Maternity"),
-                ft.dropdown.Option("Paternity"),
-                ft.dropdown.Option("Annual Leave"),
-            ],
+        self.metrics = Metrics(enabled=metrics)
+        self.auth = Authenticator(data_dir)
+        self.store = SqliteStore(data_dir) if backend == "sqlite" else LeaveStore(data_dir)
+        self.store.seed(SEED_REQUESTS)
+        # Approved leave by date range, behind the Upcoming Leave card
+        self.calendar = LeaveCalendar(self.store, statuses=("Approved",))
+        self.stats = DashboardStats(self.store, self.calendar)
+        self.search = RequestSearch(self.store)
+        self.staffing = StaffingCalendar(
+            self.store,
+            headcounts=self.DEPARTMENT_HEADCOUNT,
+            minimum_staff=self.DEPARTMENT_MIN_STAFF,
         )
+        self.workdays = WorkCalendar(self.HOLIDAY_REGION, weekend=self.WEEKEND)
+        self.balances = BalanceEngine(self.store, count_days=self.workdays.days_in_year)
+        self.reports = LeaveReports(self.store, self.workdays)
+        self.broker = ChangeBroker(self.store)
+        self.workers = WorkerPool()
+        channels = [InboxChannel(data_dir)]
+        if outbound:
+            channels += [EmailChannel(*self.SMTP_SERVER), WebhookChannel(self.WEBHOOK_URL)]
+        self.notifier = Notifier(local_dir, channels)
+        self.audit = AuditLog(local_dir)
+        # Approval routing from data/policy.json; pending requests are
+        # checked against it on every start, so an edited file takes effect
+        self.policy = load_policy(data_dir)
+        self.reroute_pending()
+
+    # Approval routing
+    
+    def request_days(self, request):
+        if request.start_date is None:
+            return 1
+        return self.workdays.business_days(request.start_date, request.end_date)
+    
+    def route_for(self, request):
+        return self.policy.route(request.department, request.type, self.request_days(request))
+    
+    def route_fields(self, route, level=0):
+        return {"route": route.rule, "steps": ",".join(route.steps), "level": level}
+    
+    def approval_steps(self, request):
+        # Roles that approve `request` in turn. Requests saved before the
+        # policy existed are routed on the fly.
+        if request.steps is None:
+            return self.route_for(request).steps
+        return tuple(request.steps.split(",")) if request.steps else ()
+    
+    def waiting_for(self, request):
+        # The role whose approval a pending request needs next, or None
+        if request.status != "Pending":
+            return None
+        steps = self.approval_steps(request)
+        level = request.level or 0
+        return steps[level] if level < len(steps) else None
+    
+    def is_requester(self, email, request):
+        user = self.auth.users.get(email)
+        return user is not None and user["name"] == request.name
+    
+    def can_approve(self, email, request):
+        # Nobody decides their own leave, whatever their role
+        role = self.waiting_for(request)
+        return role is not None and role == self.auth.role(email) and not self.is_requester(email, request)
+    
+    def reroute_pending(self, requests=None):
+        # Check pending requests (all of them by default) against the current
+        # policy and move those whose route changed onto the new one.
+        # Approvals already given carry over while the new route starts with
+        # the same steps; requests the new route needs no more approvals for
+        # are approved. Requests are grouped by outcome, so a policy change
+        # costs one store transaction per group. Returns how many changed.
+        if requests is None:
+            with self.store.lock:
+                requests = [self.store.requests[i] for i in self.store.by_status.get("Pending", ())]
+        groups = {}
+        for request in requests:
+            if request.status != "Pending":
+                continue
+            route = self.route_for(request)
+            fields = self.route_fields(route)
+            level = request.level or 0
+            if request.route == fields["route"] and request.steps == fields["steps"] and level < len(route.steps):
+                continue
+            previous = tuple(request.steps.split(",")) if request.steps else ()
+            if previous[:level] != route.steps[:level]:
+                level = 0
+            key = (fields["route"], fields["steps"], level, level >= len(route.steps))
+            groups.setdefault(key, {})[request.id] = request.version
+        changed = 0
+        for (rule, steps, level, done), expected in groups.items():
+            fields = {"route": rule, "steps": steps, "level": level}
+            if done:
+                approved, _ = self.store.transition_many(
+                    expected,
+                    "Approved",
+                    expected=expected,
+                    decided_on=date.today().isoformat(),
+                    decided_by=self.POLICY_ACTOR,
+                    **fields,
+                )
+                self.finish_decisions(approved, "auto-approve", self.POLICY_ACTOR)
+            else:
+                approved, _ = self.store.transition_many(expected, "Pending", expected=expected, **fields)
+            changed += len(approved)
+        return changed
+    
+    def set_policy(self, rules):
+        # Save and switch to new rules, then re-route every pending request.
+        # Other worker processes pick the file up when they restart.
+        self.policy = save_policy(self.data_dir, rules)
+        return self.reroute_pending()
+    
+    def submit_request(self, fields, request_id=None, actor=None):
+        # Check for double booking and department staffing, then save as a
+        # pending request on the route the approval policy gives it.
+        # Resubmitting a request edits it in place and starts its approvals
+        # over; if it was decided or changed meanwhile, that is reported as a
+        # problem instead. A route without approval steps approves it at
+        # once. Returns (request, problems). The check and the save are one
+        # guarded store write, so two overlapping requests cannot both pass
+        # the staffing check, even from different worker processes.
+        # Saved requests are audited with `actor` as the submitter, who may
+        # only file their own leave unless their role allows otherwise.
+        if actor is not None and not self.auth.can(actor, "submit_for_others"):
+            own_name = self.auth.users.get(actor, {}).get("name")
+            existing = self.store.get(request_id)
+            if fields.name != own_name or (existing is not None and existing.name != own_name):
+                return None, ["You can only request leave for yourself"]
+        route = self.route_for(fields)
         
-        start_date_button = ft.ElevatedButton(
-            "Select start date",
-            icon=ft.Icons.CALENDAR_MONTH,
-            on_click=lambda e: pick_start_date(e)
-        )
+        def check():
+            if not fields.start_date:
+                return []
+            return self.staffing.check(
+                fields.name,
+                fields.department,
+                fields.start_date,
+                fields.end_date,
+                ignore_id=request_id,
+            )
         
-        end_date_button = ft.ElevatedButton(
-            "Select end date",
-            icon=ft.Icons.CALENDAR_MONTH,
-            on_click=lambda e: pick_end_date(e)
-        )
+        def save():
+            fields.update(self.route_fields(route))
+            existing = self.store.get(request_id)
+            if existing is not None:
+                # Decisions do not wait for guarded writes, so the edit is a
+                # compare-and-set against the version just read
+                if existing.status != "Pending":
+                    raise StaleRequest(f"Request {request_id} was already {existing.status.lower()}")
+                return "edit", self.store.transition(
+                    request_id, "Pending", expected_version=existing.version, **fields.to_dict()
+                )
+            return "submit", self.store.add(fields)
         
-        reason_field = ft.TextField(
-            label="Reason",
-            hint_text="Please provide a reason",
-            multiline=True,
-            min_lines=3,
-            max_lines=5,
+        try:
+            saved, problems = self.store.guarded_write(check, save)
+        except StaleRequest as ex:
+            return None, [str(ex)]
+        if problems:
+            return None, problems
+        action, request = saved
+        self.audit.record(action, request, actor)
+        if route.auto:
+            request = self.store.transition(
+                request.id,
+                "Approved",
+                expected_version=request.version,
+                decided_on=date.today().isoformat(),
+                decided_by=self.POLICY_ACTOR,
+            )
+            self.finish_decisions([request], "auto-approve", self.POLICY_ACTOR)
+        return request, []
+    
+    def decide_request(self, request_id, status, decided_by, expected_version=None):
+        # Record one approver's decision. Only the role of the request's
+        # current step may decide, and nobody on their own leave. A rejection,
+        # or approving the last step, decides the request: it is audited and
+        # the employee told. Approving an earlier step passes the request on
+        # to the next one.
+        request = self.store.get(request_id)
+        if request is None:
+            raise KeyError(request_id)
+        if expected_version is None:
+            expected_version = request.version
+        if self.is_requester(decided_by, request):
+            raise InvalidTransition(f"Request {request_id} is your own and needs someone else's decision")
+        if request.status == "Pending" and not self.can_approve(decided_by, request):
+            role = APPROVER_ROLES.get(self.waiting_for(request), "another")
+            raise InvalidTransition(f"Request {request_id} is waiting for {role} approval")
+        level = (request.level or 0) + 1
+        if status == "Approved" and level < len(self.approval_steps(request)):
+            request = self.store.transition(request_id, "Pending", expected_version=expected_version, level=level)
+            self.audit.record("approve-step", request, decided_by)
+            return request
+        request = self.store.transition(
+            request_id,
+            status,
+            expected_version=expected_version,
+            decided_on=date.today().isoformat(),
+            decided_by=decided_by,
         )
+        self.finish_decisions([request], self.AUDIT_ACTIONS[status], decided_by)
+        return request
+    
+    def decide_requests(self, request_ids, status, decided_by):
+        # Decide a batch as `decide_request` would each one, with one store
+        # transaction per outcome, one audit write and one notification
+        # batch. Requests no longer pending, not waiting for the role of
+        # `decided_by`, or filed by `decided_by` themselves, are skipped.
+        # Returns (changed requests, skipped ids); changed requests still
+        # pending moved on to their next step.
+        role = self.auth.role(decided_by)
+        groups = {}
+        skipped = []
+        for request_id in dict.fromkeys(request_ids):
+            request = self.store.get(request_id)
+            if request is None or self.waiting_for(request) != role or self.is_requester(decided_by, request):
+                skipped.append(request_id)
+                continue
+            level = (request.level or 0) + 1
+            if status == "Approved" and level < len(self.approval_steps(request)):
+                key = ("Pending", level)
+            else:
+                key = (status, None)
+            groups.setdefault(key, {})[request_id] = request.version
+        changed = []
+        for (target, level), expected in groups.items():
+            if target == "Pending":
+                fields = {"level": level}
+            else:
+                fields = {"decided_on": date.today().isoformat(), "decided_by": decided_by}
+            done, missed = self.store.transition_many(expected, target, expected=expected, **fields)
+            skipped.extend(missed)
+            if target == "Pending":
+                if done:
+                    self.audit.record_many("approve-step", done, decided_by)
+            else:
+                self.finish_decisions(done, self.AUDIT_ACTIONS[status], decided_by)
+            changed.extend(done)
+        return changed, skipped
+    
+    def finish_decisions(self, decided, action, actor):
+        # Audit final decisions and let the employees know
+        if decided:
+            self.audit.record_many(action, decided, actor)
+            addresses = self.email_addresses()
+            self.notifier.send([
+                message for request in decided for message in self.decision_messages(request, addresses)
+            ])
+    
+    def email_addresses(self):
+        # Employee name -> sign-in email, for employees with an account
+        return {user["name"]: email for email, user in self.auth.users.items()}
+    
+    def decision_messages(self, request, addresses):
+        subject = f"Your {request.type or 'leave'} request was {request.status.lower()}"
+        if request.decided_by == self.POLICY_ACTOR:
+            decider = f"the leave policy ({request.route})"
+        else:
+            decider = request.decided_by or "HR"
+        body = f"{request.type or 'Leave'}: {request_dates(request)}\nDecided by {decider}"
+        key = f"decision:{request.id}:{request.version}"
+        messages = [
+            {"channel": "inbox", "recipient": request.name, "subject": subject, "body": body, "key": key + ":inbox"},
+            {"channel": "webhook", "recipient": request.name, "subject": subject, "body": body, "key": key + ":webhook"},
+        ]
+        address = addresses.get(request.name)
+        if address:
+            messages.append({"channel": "email", "recipient": address, "subject": subject, "body": body, "key": key + ":email"})
+        return messages
+    
+    def announce(self, sender, subject, body):
+        # Queue an announcement for every employee and return how many were
+        # addressed. The per-recipient messages are built and written on a
+        # notifier worker, so this returns at once even for 50k employees.
+        # Sending the same text twice on one day is dropped as a duplicate.
+        with self.store.lock:
+            names = set(self.store.by_employee)
+        addresses = self.email_addresses()
+        names.update(addresses)
+        announcement = hashlib.sha256(f"{sender}|{subject}|{body}|{date.today()}".encode("utf-8")).hexdigest()[:16]
         
-        # Date picker handlers
-        def on_start_date_change(e):
-            form_data["start_date"] = e.control.value
-            start_date_button.text = e.control.value.strftime("%b %d, %Y")
-            page.update()
+        def build():
+            messages = [{"channel": "webhook", "recipient": "all", "subject": subject, "body": body, "key": f"announcement:{announcement}"}]
+            for name in names:
+                key = f"announcement:{announcement}:{name}"
+                messages.append({"channel": "inbox", "recipient": name, "subject": subject, "body": body, "key": key})
+                if name in addresses:
+                    messages.append({"channel": "email", "recipient": addresses[name], "subject": subject, "body": body, "key": key + ":email"})
+            return messages
         
-        def on_end_date_change(e):
-            form_data["end_date"] = e.control.value
-            end_date_button.text = e.control.value.strftime("%b %d, %Y")
-            page.update()
+        self.notifier.send_later(build)
+        return len(names)
+    
+    def import_requests(self, path, actor=None):
+        # Pending requests are routed before they are stored, and every
+        # chunk is audited as it is stored. Those the policy approves
+        # outright are approved together after the last chunk, along with
+        # re-routing those exported mid-route, which keep the approvals
+        # they had as long as the policy still asks for them.
+        later = []
         
-        # Create date pickers
-        start_date_picker = ft.DatePicker(
-            on_change=on_start_date_change,
-            first_date=datetime.now(),
-            last_date=datetime.now() + timedelta(days=365),
-        )
+        def prepare(chunk):
+            for request in chunk:
+                if request.status != "Pending":
+                    continue
+                if request.route is not None:
+                    later.append(request)
+                    continue
+                route = self.route_for(request)
+                request.update(self.route_fields(route))
+                if route.auto:
+                    later.append(request)
         
-        end_date_picker = ft.DatePicker(
-            on_change=on_end_date_change,
-            first_date=datetime.now(),
-            last_date=datetime.now() + timedelta(days=365),
+        result = transfer.import_requests(
+            self.store,
+            path,
+            on_chunk=lambda added: self.audit.record_many("import", added, actor),
+            prepare=prepare,
         )
+        self.reroute_pending(later)
+        return result
+    
+    def export_requests(self, path, request_ids=None):
+        return transfer.export_requests(self.store, path, request_ids)
+    
+    def main(self, page: ft.Page):
+        page.title = "HR Leave Request System"
+        page.theme_mode = ft.ThemeMode.LIGHT
+        page.padding = 0
         
-        # Add date pickers to page overlay
-        page.overlay.extend([start_date_picker, end_date_picker])
+        # Views and overlays are built the first time their route is
+        # visited, so a session that only ever sees the login page pays for
+        # nothing else
+        started = time.perf_counter()
         
-        def pick_start_date(e):
-            start_date_picker.open = True
-            page.update()
+        # Store form data
+        form_data = {}
         
-        def pick_end_date(e):
-            end_date_picker.open = True
+        def show_snack_bar(message, bgcolor):
+            page.snack_bar = ft.SnackBar(
+                content=ft.Text(message),
+                bgcolor=bgcolor,
+            )
+            page.snack_bar.open = True
             page.update()
         
         # Navigation functions
@@ -150,259 +440,546 @@ class LeaveRequestApp:
         def go_to_form(e):
             page.go("/form")
         
-        def go_to_details(e):
-            # Validate form
-            if not employee_name_field.value:
-                employee_name_field.error_text = "This field is required"
-                page.update()
-                return
-            
-            # Store form data
-            form_data["name"] = employee_name_field.value
-            form_data["department"] = department_dropdown.value
-            form_data["leave_type"] = leave_type_dropdown.value
-            form_data["reason"] = reason_field.value
-            
-            page.go("/details")
+        def back_to_form(e):
+            # The only way to edit the request just submitted; any other
+            # visit to the form starts a new one
+            form_data["editing"] = True
+            page.go("/form")
+        
+        def show_busy(ex):
+            if isinstance(ex, Overloaded):
+                show_snack_bar("The server is busy, please try again", "orange")
+            else:
+                show_snack_bar("That took too long, please try again", "orange")
         
         def go_to_history(e):
             page.go("/history")
         
-        # Login function
-        def handle_login(e):
-            email_valid = bool(email_field.value)
-            password_valid = bool(password_field.value)
+        def go_to_schedule(e):
+            page.go("/schedule")
+        
+        # Signed-in user for this session
+        session = {"email": None, "user": None}
+        
+        def start_session(email, user):
+            session["email"] = email
+            session["user"] = user
+        
+        def can(permission):
+            return session["email"] is not None and self.auth.can(session["email"], permission)
+        
+        @self.metrics.timed("handler_milliseconds", "logout")
+        def handle_logout(e):
+            session["email"] = session["user"] = None
+            view_cache.clear()
+            page.client_storage.remove(self.SESSION_TOKEN_KEY)
+            page.go("/")
+        
+        # Announcements; the dialog is built on first use
+        overlays = {}
+        
+        def create_announcement_dialog():
+            announcement_subject_field = ft.TextField(label="Subject", width=400)
+            announcement_body_field = ft.TextField(label="Message", multiline=True, min_lines=3, width=400)
             
-            email_error.visible = not email_valid
-            password_error.visible = not password_valid
+            @self.metrics.timed("handler_milliseconds", "announce")
+            def send_announcement(e):
+                if not announcement_subject_field.value or not announcement_body_field.value:
+                    announcement_subject_field.error_text = None if announcement_subject_field.value else "This field is required"
+                    announcement_body_field.error_text = None if announcement_body_field.value else "This field is required"
+                    page.update()
+                    return
+                count = self.announce(
+                    session["user"]["name"],
+                    announcement_subject_field.value.strip(),
+                    announcement_body_field.value.strip(),
+                )
+                page.close(announcement_dialog)
+                announcement_subject_field.value = announcement_body_field.value = ""
+                announcement_subject_field.error_text = announcement_body_field.error_text = None
+                show_snack_bar(f"Announcement queued for {count} employee(s)", "green")
             
-            if email_valid and password_valid:
-                page.go("/home")
+            announcement_dialog = ft.AlertDialog(
+                title=ft.Text("Create announcement"),
+                content=ft.Column([announcement_subject_field, announcement_body_field], tight=True),
+                actions=[
+                    ft.TextButton("Cancel", on_click=lambda e: page.close(announcement_dialog)),
+                    ft.TextButton("Send", on_click=send_announcement),
+                ],
+            )
             
-            page.update()
+            return announcement_dialog
+        
+        def open_announcement_dialog(e):
+            if not can("announce"):
+                show_snack_bar("Only managers can send announcements", "red")
+                return
+            if "announcement" not in overlays:
+                overlays["announcement"] = create_announcement_dialog()
+            page.open(overlays["announcement"])
+        
+        def go_to_inbox(e):
+            page.go("/inbox")
         
         # Login page
-        email_field = ft.TextField(
-            label="Email",
-            hint_text="Enter your email",
-            prefix_icon=ft.Icons.EMAIL,
-            width=300,
-        )
+        def create_login_view():
+            email_error = ft.Text(
+                "Email is required",
+                color="red400",
+                size=12,
+                visible=False
+            )
+            password_error = ft.Text(
+                "Password is required",
+                color="red400",
+                size=12,
+                visible=False
+            )
+            
+            email_field = ft.TextField(
+                label="Email",
+                hint_text="Enter your email",
+                prefix_icon=ft.Icons.EMAIL,
+                width=300,
+            )
+            
+            password_field = ft.TextField(
+                label="Password",
+                hint_text="Enter your password",
+                prefix_icon=ft.Icons.LOCK,
+                password=True,
+                can_reveal_password=True,
+                width=300,
+            )
+            
+            # Login function
+            @self.metrics.timed("handler_milliseconds", "login")
+            async def handle_login(e):
+                email_valid = bool(email_field.value)
+                password_valid = bool(password_field.value)
+                
+                email_error.visible = not email_valid
+                password_error.value = "Password is required"
+                password_error.visible = not password_valid
+                
+                if not (email_valid and password_valid):
+                    page.update()
+                    return
+                
+                # Password hashing runs on the auth pool, off the event loop
+                login_button.disabled = True
+                page.update()
+                try:
+                    user, token = await self.workers.wait(
+                        self.auth.login(email_field.value, password_field.value),
+                        self.HANDLER_TIMEOUTS["login"],
+                    )
+                except asyncio.TimeoutError:
+                    user = token = None
+                login_button.disabled = False
+                
+                if user is None:
+                    password_error.value = "Invalid email or password"
+                    password_error.visible = True
+                    page.update()
+                    return
+                
+                start_session(email_field.value.strip().lower(), user)
+                password_field.value = ""
+                await page.client_storage.set_async(self.SESSION_TOKEN_KEY, token)
+                page.go("/home")
+            
+            login_button = ft.ElevatedButton(
+                "Login",
+                width=300,
+                height=45,
+                on_click=handle_login,
+            )
+            
+            return ft.View(
+                "/",
+                [
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                ft.Icon(ft.Icons.ACCOUNT_CIRCLE, size=80, color="blue"),
+                                ft.Text("HR Leave Request", size=32, weight=ft.FontWeight.BOLD),
+                                ft.Text("Sign in to continue", size=16, color="grey700"),
+                                ft.Container(height=30),
+                                email_field,
+                                email_error,
+                                ft.Container(height=10),
+                                password_field,
+                                password_error,
+                                ft.Container(height=30),
+                                login_button,
+                            ],
+                            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                            alignment=ft.MainAxisAlignment.CENTER,
+                        ),
+                        expand=True,
+                        padding=20,
+                    )
+                ],
+            )
         
-        password_field = ft.TextField(
-            label="Password",
-            hint_text="Enter your password",
-            prefix_icon=ft.Icons.LOCK,
-            password=True,
-            can_reveal_password=True,
-            width=300,
-        )
+        # Dashboard counters, filled in once the home view exists
+        dashboard = {}
         
-        login_view = ft.View(
-            "/",
-            [
-                ft.Container(
-                    content=ft.Column(
-                        [
-                            ft.Icon(ft.Icons.ACCOUNT_CIRCLE, size=80, color="blue"),
-                            ft.Text("HR Leave Request", size=32, weight=ft.FontWeight.BOLD),
-                            ft.Text("Sign in to continue", size=16, color="grey700"),
-                            ft.Container(height=30),
-                            email_field,
-                            email_error,
-                            ft.Container(height=10),
-                            password_field,
-                            password_error,
-                            ft.Container(height=30),
-                            ft.ElevatedButton(
-                                "Login",
-                                width=300,
-                                height=45,
-                                on_click=handle_login,
-                            ),
-                        ],
-                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                        alignment=ft.MainAxisAlignment.CENTER,
-                    ),
-                    expand=True,
-                    padding=20,
-                )
-            ],
-        )
+        def refresh_dashboard(send=True):
+            # Only the counter texts that changed are patched
+            counters = [
+                (dashboard.get("pending"), self.stats.pending),
+                (dashboard.get("approved_today"), self.stats.approved_today),
+                (dashboard.get("upcoming"), self.stats.upcoming),
+            ]
+            for control, value in counters:
+                value = str(value)
+                if control is not None and control.value != value:
+                    control.value = value
+                    if send and control.page:
+                        control.update()
         
         # Home page
-        home_view = ft.View(
-            "/home",
-            [
-                ft.AppBar(
-                    title=ft.Text("HR Leave Request Home"),
-                    bgcolor="blue",
-                ),
-                ft.Container(
-                    content=ft.Column(
-                        [
-                            ft.Row(
-                                [
-                                    ft.Icon(ft.Icons.PERSON, size=40),
-                                    ft.Text("Hello, HR Staff", size=20, weight=ft.FontWeight.BOLD),
-                                    ft.IconButton(icon=ft.Icons.NOTIFICATIONS, icon_color="blue"),
-                                ],
-                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                            ),
-                            ft.Container(height=20),
-                            ft.Row(
-                                [
-                                    ft.Container(
-                                        content=ft.Column(
-                                            [
-                                                ft.Text("Pending Requests", size=14, color="grey700"),
-                                                ft.Text("12", size=32, weight=ft.FontWeight.BOLD),
-                                            ],
-                                        ),
-                                        bgcolor="blue50",
-                                        padding=20,
-                                        border_radius=10,
-                                        expand=True,
-                                    ),
-                                    ft.Container(width=10),
-                                    ft.Container(
-                                        content=ft.Column(
-                                            [
-                                                ft.Text("Approved Today", size=14, color="grey700"),
-                                                ft.Text("5", size=32, weight=ft.FontWeight.BOLD),
-                                            ],
-                                        ),
-                                        bgcolor="green50",
-                                        padding=20,
-                                        border_radius=10,
-                                        expand=True,
-                                    ),
-                                ],
-                            ),
-                            ft.Container(height=20),
-                            ft.Container(
-                                content=ft.Column(
+        def create_home_view():
+            pending_count_text = ft.Text("0", size=32, weight=ft.FontWeight.BOLD)
+            approved_today_text = ft.Text("0", size=32, weight=ft.FontWeight.BOLD)
+            upcoming_count_text = ft.Text("0", size=32, weight=ft.FontWeight.BOLD)
+            dashboard.update(
+                pending=pending_count_text,
+                approved_today=approved_today_text,
+                upcoming=upcoming_count_text,
+            )
+            
+            greeting_text = ft.Text(f"Hello, {session['user']['name']}", size=20, weight=ft.FontWeight.BOLD)
+            
+            reports_button = ft.OutlinedButton(
+                "View Reports",
+                width=300,
+                height=50,
+                icon=ft.Icons.INSIGHTS,
+                on_click=lambda e: page.go("/reports"),
+                visible=can("view_reports"),
+            )
+            
+            metrics_button = ft.TextButton(
+                "Performance metrics",
+                icon=ft.Icons.SPEED,
+                on_click=lambda e: page.go("/metrics"),
+                visible=can("view_metrics") and self.metrics.enabled,
+            )
+            
+            return ft.View(
+                "/home",
+                [
+                    ft.AppBar(
+                        title=ft.Text("HR Leave Request Home"),
+                        bgcolor="blue",
+                        actions=[
+                            ft.IconButton(icon=ft.Icons.LOGOUT, tooltip="Sign out", on_click=handle_logout),
+                        ],
+                    ),
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                ft.Row(
                                     [
-                                        ft.Text("Upcoming Leave", size=14, color="grey700"),
-                                        ft.Text("3", size=32, weight=ft.FontWeight.BOLD),
+                                        ft.Icon(ft.Icons.PERSON, size=40),
+                                        greeting_text,
+                                        ft.IconButton(icon=ft.Icons.NOTIFICATIONS, icon_color="blue", tooltip="Inbox", on_click=go_to_inbox),
                                     ],
+                                    alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                                 ),
-                                bgcolor="orange50",
-                                padding=20,
-                                border_radius=10,
-                            ),
-                            ft.Container(height=30),
-                            ft.ElevatedButton(
-                                "Request Leave",
-                                width=300,
-                                height=50,
-                                on_click=go_to_form,
-                                bgcolor="blue",
-                                color="white",
-                            ),
-                            ft.Container(height=10),
-                            ft.OutlinedButton(
-                                "View Leave History",
-                                width=300,
-                                height=50,
-                                on_click=go_to_history,
-                            ),
-                            ft.Container(height=30),
-                            ft.Text("Quick Actions", size=18, weight=ft.FontWeight.BOLD),
-                            ft.Container(height=10),
-                            ft.Row(
-                                [
-                                    ft.Container(
-                                        content=ft.Column(
-                                            [
-                                                ft.Icon(ft.Icons.ANNOUNCEMENT, size=30, color="blue"),
-                                                ft.Text("Create\nAnnouncement", size=12, text_align=ft.TextAlign.CENTER),
-                                                ft.Text("Notify all employees", size=10, color="grey600", text_align=ft.TextAlign.CENTER),
-                                            ],
-                                            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                                ft.Container(height=20),
+                                ft.Row(
+                                    [
+                                        ft.Container(
+                                            content=ft.Column(
+                                                [
+                                                    ft.Text("Pending Requests", size=14, color="grey700"),
+                                                    pending_count_text,
+                                                ],
+                                            ),
+                                            bgcolor="blue50",
+                                            padding=20,
+                                            border_radius=10,
+                                            expand=True,
                                         ),
-                                        bgcolor="white",
-                                        padding=15,
-                                        border_radius=10,
-                                        border=ft.border.all(1, "grey300"),
-                                        expand=True,
-                                    ),
-                                    ft.Container(width=10),
-                                    ft.Container(
-                                        content=ft.Column(
-                                            [
-                                                ft.Icon(ft.Icons.CALENDAR_MONTH, size=30, color="blue"),
-                                                ft.Text("View Team\nSchedule", size=12, text_align=ft.TextAlign.CENTER),
-                                                ft.Text("Check weekly calendar", size=10, color="grey600", text_align=ft.TextAlign.CENTER),
-                                            ],
-                                            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                                        ft.Container(width=10),
+                                        ft.Container(
+                                            content=ft.Column(
+                                                [
+                                                    ft.Text("Approved Today", size=14, color="grey700"),
+                                                    approved_today_text,
+                                                ],
+                                            ),
+                                            bgcolor="green50",
+                                            padding=20,
+                                            border_radius=10,
+                                            expand=True,
                                         ),
-                                        bgcolor="white",
-                                        padding=15,
-                                        border_radius=10,
-                                        border=ft.border.all(1, "grey300"),
-                                        expand=True,
+                                    ],
+                                ),
+                                ft.Container(height=20),
+                                ft.Container(
+                                    content=ft.Column(
+                                        [
+                                            ft.Text("Upcoming Leave", size=14, color="grey700"),
+                                            upcoming_count_text,
+                                        ],
                                     ),
-                                ],
-                            ),
-                        ],
-                        scroll=ft.ScrollMode.AUTO,
-                    ),
-                    padding=20,
-                    expand=True,
-                )
-            ],
-        )
+                                    bgcolor="orange50",
+                                    padding=20,
+                                    border_radius=10,
+                                ),
+                                ft.Container(height=30),
+                                ft.ElevatedButton(
+                                    "Request Leave",
+                                    width=300,
+                                    height=50,
+                                    on_click=go_to_form,
+                                    bgcolor="blue",
+                                    color="white",
+                                    visible=can("submit"),
+                                ),
+                                ft.Container(height=10),
+                                ft.OutlinedButton(
+                                    "View Leave History",
+                                    width=300,
+                                    height=50,
+                                    on_click=go_to_history,
+                                    visible=can("view_history"),
+                                ),
+                                ft.Container(height=10),
+                                reports_button,
+                                metrics_button,
+                                ft.Container(height=30),
+                                ft.Text("Quick Actions", size=18, weight=ft.FontWeight.BOLD),
+                                ft.Container(height=10),
+                                ft.Row(
+                                    [
+                                        ft.Container(
+                                            content=ft.Column(
+                                                [
+                                                    ft.Icon(ft.Icons.ANNOUNCEMENT, size=30, color="blue"),
+                                                    ft.Text("Create\nAnnouncement", size=12, text_align=ft.TextAlign.CENTER),
+                                                    ft.Text("Notify all employees", size=10, color="grey600", text_align=ft.TextAlign.CENTER),
+                                                ],
+                                                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                                            ),
+                                            bgcolor="white",
+                                            padding=15,
+                                            border_radius=10,
+                                            border=ft.border.all(1, "grey300"),
+                                            expand=True,
+                                            on_click=open_announcement_dialog,
+                                        ),
+                                        ft.Container(width=10),
+                                        ft.Container(
+                                            content=ft.Column(
+                                                [
+                                                    ft.Icon(ft.Icons.CALENDAR_MONTH, size=30, color="blue"),
+                                                    ft.Text("View Team\nSchedule", size=12, text_align=ft.TextAlign.CENTER),
+                                                    ft.Text("Check weekly calendar", size=10, color="grey600", text_align=ft.TextAlign.CENTER),
+                                                ],
+                                                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                                            ),
+                                            bgcolor="white",
+                                            padding=15,
+                                            border_radius=10,
+                                            border=ft.border.all(1, "grey300"),
+                                            expand=True,
+                                            on_click=go_to_schedule,
+                                        ),
+                                    ],
+                                ),
+                            ],
+                            scroll=ft.ScrollMode.AUTO,
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
         
         # Form page
-        form_view = ft.View(
-            "/form",
-            [
-                ft.AppBar(
-                    leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
-                    title=ft.Text("New Leave Request"),
-                    bgcolor="blue",
-                ),
-                ft.Container(
-                    content=ft.Column(
-                        [
-                            employee_name_field,
-                            ft.Container(height=10),
-                            department_dropdown,
-                            ft.Container(height=10),
-                            leave_type_dropdown,
-                            ft.Container(height=20),
-                            ft.Text("Start Date", size=14, weight=ft.FontWeight.BOLD),
-                            start_date_button,
-                            ft.Container(height=10),
-                            ft.Text("End Date", size=14, weight=ft.FontWeight.BOLD),
-                            end_date_button,
-                            ft.Container(height=20),
-                            reason_field,
-                            ft.Container(height=30),
-                            ft.ElevatedButton(
-                                "Submit",
-                                width=300,
-                                height=50,
-                                on_click=go_to_details,
-                                bgcolor="blue",
-                                color="white",
-                            ),
-                            ft.Container(height=10),
-                            ft.OutlinedButton(
-                                "Cancel",
-                                width=300,
-                                height=50,
-                                on_click=go_to_home,
-                            ),
-                        ],
-                        scroll=ft.ScrollMode.AUTO,
-                    ),
-                    padding=20,
-                    expand=True,
+        def create_form_view():
+            # Employees file their own leave; managers and HR may name anyone
+            own_name = None if can("submit_for_others") else session["user"]["name"]
+            
+            # Form field controls
+            employee_name_field = ft.TextField(
+                label="Employee Name",
+                hint_text="Enter employee name",
+                border_color="grey400",
+                value=own_name,
+                read_only=own_name is not None,
+            )
+            
+            department_dropdown = ft.Dropdown(
+                label="Department",
+                hint_text="Select department",
+                options=[ft.dropdown.Option(name) for name in self.DEPARTMENT_HEADCOUNT],
+            )
+            
+            leave_type_dropdown = ft.Dropdown(
+                label="Leave Type",
+                hint_text="Select leave type",
+                options=[ft.dropdown.Option(name) for name in LEAVE_TYPES],
+            )
+            
+            start_date_button = ft.ElevatedButton(
+                "Select start date",
+                icon=ft.Icons.CALENDAR_MONTH,
+                on_click=lambda e: pick_start_date(e)
+            )
+            
+            end_date_button = ft.ElevatedButton(
+                "Select end date",
+                icon=ft.Icons.CALENDAR_MONTH,
+                on_click=lambda e: pick_end_date(e)
+            )
+            
+            reason_field = ft.TextField(
+                label="Reason",
+                hint_text="Please provide a reason",
+                multiline=True,
+                min_lines=3,
+                max_lines=5,
+            )
+            
+            # Date picker handlers
+            def on_start_date_change(e):
+                form_data["start_date"] = e.control.value.date()
+                start_date_button.text = e.control.value.strftime("%b %d, %Y")
+                page.update()
+            
+            def on_end_date_change(e):
+                form_data["end_date"] = e.control.value.date()
+                end_date_button.text = e.control.value.strftime("%b %d, %Y")
+                page.update()
+            
+            # Create date pickers
+            start_date_picker = ft.DatePicker(
+                on_change=on_start_date_change,
+                first_date=datetime.now(),
+                last_date=datetime.now() + timedelta(days=365),
+            )
+            
+            end_date_picker = ft.DatePicker(
+                on_change=on_end_date_change,
+                first_date=datetime.now(),
+                last_date=datetime.now() + timedelta(days=365),
+            )
+            
+            # page.open adds each picker to the overlay on first use
+            def pick_start_date(e):
+                page.open(start_date_picker)
+            
+            def pick_end_date(e):
+                page.open(end_date_picker)
+            
+            @self.metrics.timed("handler_milliseconds", "submit")
+            async def go_to_details(e):
+                if not can("submit"):
+                    show_snack_bar("Your account cannot submit leave requests", "red")
+                    return
+                
+                # Validate form
+                if not employee_name_field.value:
+                    employee_name_field.error_text = "This field is required"
+                    page.update()
+                    return
+                
+                employee_name_field.error_text = None
+                
+                start_date = form_data.get("start_date")
+                end_date = form_data.get("end_date") or start_date
+                if start_date and end_date < start_date:
+                    show_snack_bar("End date must be on or after the start date", "red")
+                    return
+                
+                # Store form data
+                form_data["name"] = own_name or employee_name_field.value
+                form_data["department"] = department_dropdown.value
+                form_data["leave_type"] = leave_type_dropdown.value
+                form_data["reason"] = reason_field.value
+                
+                fields = LeaveRequest(
+                    name=form_data["name"],
+                    department=form_data["department"],
+                    type=form_data["leave_type"],
+                    start_date=start_date,
+                    end_date=end_date,
+                    reason=form_data["reason"],
                 )
-            ],
-        )
+                try:
+                    request, problems = await self.workers.run(
+                        self.submit_request,
+                        fields,
+                        form_data.get("request_id"),
+                        session["email"],
+                        timeout=self.HANDLER_TIMEOUTS["submit"],
+                    )
+                except (Overloaded, asyncio.TimeoutError) as ex:
+                    show_busy(ex)
+                    return
+                
+                if problems:
+                    show_snack_bar("\n".join(problems), "red")
+                    return
+                
+                form_data["request_id"] = request.id
+                page.go("/details")
+            
+            return ft.View(
+                "/form",
+                [
+                    ft.AppBar(
+                        leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
+                        title=ft.Text("New Leave Request"),
+                        bgcolor="blue",
+                    ),
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                employee_name_field,
+                                ft.Container(height=10),
+                                department_dropdown,
+                                ft.Container(height=10),
+                                leave_type_dropdown,
+                                ft.Container(height=20),
+                                ft.Text("Start Date", size=14, weight=ft.FontWeight.BOLD),
+                                start_date_button,
+                                ft.Container(height=10),
+                                ft.Text("End Date", size=14, weight=ft.FontWeight.BOLD),
+                                end_date_button,
+                                ft.Container(height=20),
+                                reason_field,
+                                ft.Container(height=30),
+                                ft.ElevatedButton(
+                                    "Submit",
+                                    width=300,
+                                    height=50,
+                                    on_click=go_to_details,
+                                    bgcolor="blue",
+                                    color="white",
+                                ),
+                                ft.Container(height=10),
+                                ft.OutlinedButton(
+                                    "Cancel",
+                                    width=300,
+                                    height=50,
+                                    on_click=go_to_home,
+                                ),
+                            ],
+                            scroll=ft.ScrollMode.AUTO,
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
         
         # Details page
         def create_details_view():
@@ -412,30 +989,71 @@ class LeaveRequestApp:
             # Calculate days
             days = 1
             if form_data.get("start_date") and form_data.get("end_date"):
-                days = (form_data["end_date"] - form_data["start_date"]).days + 1
+                # Weekends and public holidays do not count against leave
+                days = self.workdays.business_days(form_data["start_date"], form_data["end_date"])
             
-            def approve_request(e):
-                # Show success snackbar
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text("Leave request approved successfully!"),
-                    bgcolor="green",
-                )
-                page.snack_bar.open = True
-                page.update()
-                # Go to home after a short delay
-                page.go("/home")
+            # Remaining entitlement for this leave type, before this request
+            balance = self.balances.balance(form_data.get("name"), form_data.get("leave_type"))
+            balance_str = f"{balance[2]:.1f} Days" if balance else "N/A"
             
-            def reject_request(e):
-                # Show reject snackbar
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text("Leave request rejected"),
-                    bgcolor="red",
-                )
-                page.snack_bar.open = True
-                page.update()
+            # The version seen here guards against two managers deciding the
+            # same request at once; the loser gets a warning instead
+            request = self.store.get(form_data.get("request_id"))
+            version = request.version if request else None
+            
+            # The approval path the policy gave this request, and who acts next
+            status = request.status if request else "Pending"
+            steps = self.approval_steps(request) if request else ()
+            approver = request is not None and self.can_approve(session["email"], request)
+            if request is not None and request.decided_by == self.POLICY_ACTOR:
+                route_str = "Approved automatically"
+            else:
+                route_str = " → ".join(APPROVER_ROLES[role] for role in steps) or "None"
+            if status == "Pending" and len(steps) > 1:
+                route_str += f" (step {(request.level or 0) + 1} of {len(steps)})"
+            if status != "Pending":
+                decider = "the leave policy" if request.decided_by == self.POLICY_ACTOR else request.decided_by
+                outcome_str = f"{status} by {decider}."
+            elif request is not None and self.waiting_for(request):
+                outcome_str = f"Submitted. Waiting for {APPROVER_ROLES[self.waiting_for(request)]} approval."
+            else:
+                outcome_str = "Submitted. A manager will review this request."
+            status_colors = {"Pending": ("orange200", "orange900"), "Approved": ("green200", "green900"), "Rejected": ("red200", "red900")}
+            
+            @self.metrics.timed("handler_milliseconds", "decide")
+            async def decide(status, message, color):
+                if not can("decide"):
+                    show_snack_bar("Only managers can approve or reject requests", "red")
+                    return
+                if request is not None:
+                    try:
+                        result = await self.workers.run(
+                            self.decide_request,
+                            request.id,
+                            status,
+                            session["email"],
+                            expected_version=version,
+                            timeout=self.HANDLER_TIMEOUTS["decide"],
+                        )
+                        form_data.pop("request_id", None)
+                        if result.status == "Pending":
+                            message = f"Approved, now waiting for {APPROVER_ROLES[self.waiting_for(result)]} approval"
+                    except (StaleRequest, InvalidTransition) as ex:
+                        message, color = str(ex), "orange"
+                    except (Overloaded, asyncio.TimeoutError) as ex:
+                        show_busy(ex)
+                        return
+                
+                show_snack_bar(message, color)
                 # Go to home after a short delay
                 page.go("/home")
             
+            async def approve_request(e):
+                await decide("Approved", "Leave request approved successfully!", "green")
+            
+            async def reject_request(e):
+                await decide("Rejected", "Leave request rejected", "red")
+            
             return ft.View(
                 "/details",
                 [
@@ -451,8 +1069,8 @@ class LeaveRequestApp:
                                     content=ft.Column(
                                         [
                                             ft.Container(
-                                                content=ft.Text("Pending", color="orange900"),
-                                                bgcolor="orange200",
+                                                content=ft.Text(status, color=status_colors[status][1]),
+                                                bgcolor=status_colors[status][0],
                                                 padding=ft.padding.symmetric(horizontal=15, vertical=5),
                                                 border_radius=5,
                                             ),
@@ -494,7 +1112,21 @@ class LeaveRequestApp:
                                             ft.Row(
                                                 [
                                                     ft.Text("Total", color="grey700", expand=True),
-                                                    ft.Text(f"{days} Days", weight=ft.FontWeight.BOLD),
+                                                    ft.Text(f"{days} Working Days", weight=ft.FontWeight.BOLD),
+                                                ],
+                                            ),
+                                            ft.Container(height=10),
+                                            ft.Row(
+                                                [
+                                                    ft.Text("Balance Available", color="grey700", expand=True),
+                                                    ft.Text(balance_str, weight=ft.FontWeight.BOLD),
+                                                ],
+                                            ),
+                                            ft.Container(height=10),
+                                            ft.Row(
+                                                [
+                                                    ft.Text("Approval", color="grey700", expand=True),
+                                                    ft.Text(route_str, weight=ft.FontWeight.BOLD),
                                                 ],
                                             ),
                                             ft.Divider(height=30),
@@ -534,13 +1166,19 @@ class LeaveRequestApp:
                                             icon=ft.Icons.CANCEL,
                                         ),
                                     ],
+                                    visible=approver,
+                                ),
+                                ft.Text(
+                                    outcome_str,
+                                    color="grey700",
+                                    visible=not approver,
                                 ),
                                 ft.Container(height=10),
                                 ft.OutlinedButton(
                                     "Back to Form",
                                     width=300,
                                     height=50,
-                                    on_click=go_to_form,
+                                    on_click=back_to_form,
                                 ),
                             ],
                             scroll=ft.ScrollMode.AUTO,
@@ -552,47 +1190,391 @@ class LeaveRequestApp:
             )
         
         # History page
-        def create_history_view():
-            leave_items = []
+        def create_history_item(req, selected=False, on_select=None, on_decide=None):
+            # Pending rows get a selection checkbox and an approve/reject
+            # menu when the handlers are given
+            decidable = req.status == "Pending" and on_decide is not None
+            status_color = "orange200" if req.status == "Pending" else (
+                "green200" if req.status == "Approved" else "red200"
+            )
+            status_text_color = "orange900" if req.status == "Pending" else (
+                "green900" if req.status == "Approved" else "red900"
+            )
+            # Pending rows name the role whose approval they wait for
+            waiting = self.waiting_for(req)
+            status_text = f"Pending: {APPROVER_ROLES[waiting]}" if waiting else req.status
             
-            for req in self.leave_requests:
-                status_color = "orange200" if req["status"] == "Pending" else (
-                    "green200" if req["status"] == "Approved" else "red200"
-                )
-                status_text_color = "orange900" if req["status"] == "Pending" else (
-                    "green900" if req["status"] == "Approved" else "red900"
-                )
-                
-                leave_items.append(
-                    ft.Container(
-                        content=ft.Row(
+            return ft.Container(
+                content=ft.Row(
+                    [
+                        ft.Checkbox(
+                            value=selected,
+                            visible=decidable and on_select is not None,
+                            on_change=lambda e: on_select(req.id, e.control.value),
+                        ),
+                        ft.Icon(ft.Icons.ACCOUNT_CIRCLE, size=40, color="grey"),
+                        ft.Column(
                             [
-                                ft.Icon(ft.Icons.ACCOUNT_CIRCLE, size=40, color="grey"),
-                                ft.Column(
-                                    [
-                                        ft.Text(req["name"], size=16, weight=ft.FontWeight.BOLD),
-                                        ft.Text(f"{req['type']}: {req['dates']}", size=12, color="grey700"),
-                                    ],
-                                    spacing=2,
-                                    expand=True,
+                                ft.Text(req.name, size=16, weight=ft.FontWeight.BOLD),
+                                ft.Text(f"{req.type}: {request_dates(req)}", size=12, color="grey700"),
+                            ],
+                            spacing=2,
+                            expand=True,
+                        ),
+                        ft.Container(
+                            content=ft.Text(status_text, size=12, color=status_text_color),
+                            bgcolor=status_color,
+                            padding=ft.padding.symmetric(horizontal=10, vertical=5),
+                            border_radius=5,
+                        ),
+                        ft.PopupMenuButton(
+                            icon=ft.Icons.MORE_VERT,
+                            visible=decidable,
+                            items=[
+                                ft.PopupMenuItem(
+                                    text="Approve",
+                                    icon=ft.Icons.CHECK_CIRCLE,
+                                    on_click=lambda e: on_decide([req.id], "Approved"),
                                 ),
-                                ft.Container(
-                                    content=ft.Text(req["status"], size=12, color=status_text_color),
-                                    bgcolor=status_color,
-                                    padding=ft.padding.symmetric(horizontal=10, vertical=5),
-                                    border_radius=5,
+                                ft.PopupMenuItem(
+                                    text="Reject",
+                                    icon=ft.Icons.CANCEL,
+                                    on_click=lambda e: on_decide([req.id], "Rejected"),
                                 ),
-                                ft.IconButton(icon=ft.Icons.MORE_VERT),
                             ],
-                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                         ),
-                        bgcolor="white",
-                        padding=15,
-                        border_radius=10,
-                        border=ft.border.all(1, "grey300"),
-                        margin=ft.margin.only(bottom=10),
-                    )
+                    ],
+                    alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                ),
+                # The version shown, so live updates can skip rows already current
+                data=req.version,
+                bgcolor="white",
+                padding=15,
+                border_radius=10,
+                border=ft.border.all(1, "grey300"),
+                margin=ft.margin.only(bottom=10),
+            )
+        
+        def create_history_view():
+            # Only one page of rows is built up front; the rest are appended
+            # as the list is scrolled, so each update only carries new rows.
+            # The cursor is a lazy iterator of matching request ids.
+            history_filter = {"query": "", "status": None, "timer": None}
+            cursor = {"ids": iter(()), "next": None}
+            rows = {}
+            # Ids of pending requests ticked for a bulk decision
+            selected = set()
+            
+            leave_list = ft.ListView(expand=True, spacing=0)
+            
+            def history_item(req):
+                if not self.can_approve(session["email"], req):
+                    return create_history_item(req)
+                return create_history_item(req, req.id in selected, on_select, decide)
+            
+            def patch_row(row, req):
+                updated = history_item(req)
+                row.content = updated.content
+                row.data = updated.data
+            
+            selection_text = ft.Text(weight=ft.FontWeight.BOLD, expand=True)
+            
+            def refresh_selection():
+                selection_bar.visible = bool(selected)
+                selection_text.value = f"{len(selected)} selected"
+            
+            def on_select(request_id, value):
+                if value:
+                    selected.add(request_id)
+                else:
+                    selected.discard(request_id)
+                refresh_selection()
+                selection_bar.update()
+            
+            def clear_selection(e):
+                selected.clear()
+                for request_id, row in rows.items():
+                    req = self.store.get(request_id)
+                    if req is not None:
+                        patch_row(row, req)
+                refresh_selection()
+                page.update()
+            
+            # Bulk decisions are one store transaction. Their result reaches
+            # this session as one update: rows, selection, dashboard counters
+            # and the message together.
+            @self.metrics.timed("handler_milliseconds", "decide_many")
+            def run_decisions(request_ids, status):
+                decided, skipped = self.decide_requests(request_ids, status, session["email"])
+                for req in decided:
+                    selected.discard(req.id)
+                    row = rows.get(req.id)
+                    if row is not None:
+                        patch_row(row, req)
+                selected.difference_update(skipped)
+                refresh_selection()
+                refresh_dashboard(send=False)
+                stepped = sum(1 for req in decided if req.status == "Pending")
+                message = f"{len(decided) - stepped} request(s) {status.lower()}"
+                if stepped:
+                    message += f", {stepped} passed on to the next approver"
+                if skipped:
+                    message += f", {len(skipped)} skipped (already decided or not yours to approve)"
+                show_snack_bar(message, "green" if status == "Approved" else "red")
+            
+            def decide(request_ids, status):
+                if not can("decide"):
+                    show_snack_bar("Only managers can approve or reject requests", "red")
+                    return
+                if request_ids:
+                    page.run_thread(run_decisions, list(request_ids), status)
+            
+            selection_bar = ft.Container(
+                content=ft.Row(
+                    [
+                        selection_text,
+                        ft.ElevatedButton(
+                            "Approve selected",
+                            icon=ft.Icons.CHECK_CIRCLE,
+                            bgcolor="green",
+                            color="white",
+                            on_click=lambda e: decide(selected, "Approved"),
+                        ),
+                        ft.ElevatedButton(
+                            "Reject selected",
+                            icon=ft.Icons.CANCEL,
+                            bgcolor="red",
+                            color="white",
+                            on_click=lambda e: decide(selected, "Rejected"),
+                        ),
+                        ft.TextButton("Clear", on_click=clear_selection),
+                    ],
+                ),
+                visible=False,
+                bgcolor="blue50",
+                padding=10,
+                border_radius=10,
+                margin=ft.margin.only(bottom=10),
+            )
+            
+            # "All matching" decides every pending request the current search
+            # and filter would list, not just the rows loaded so far
+            confirm_dialog = ft.AlertDialog()
+            
+            def confirm_all_matching(status):
+                request_ids = []
+                if history_filter["status"] in (None, "Pending"):
+                    request_ids = [
+                        request_id for request_id in self.search.query(history_filter["query"], "Pending")
+                        if self.can_approve(session["email"], self.store.get(request_id))
+                    ]
+                if not request_ids:
+                    show_snack_bar("No requests waiting for your approval match the current filter", "orange")
+                    return
+                
+                def on_confirm(e):
+                    page.close(confirm_dialog)
+                    decide(request_ids, status)
+                
+                verb = "Approve" if status == "Approved" else "Reject"
+                confirm_dialog.title = ft.Text(f"{verb} {len(request_ids)} request(s)?")
+                confirm_dialog.content = ft.Text("Every pending request matching the current search and filter is decided at once.")
+                confirm_dialog.actions = [
+                    ft.TextButton("Cancel", on_click=lambda e: page.close(confirm_dialog)),
+                    ft.TextButton(verb, on_click=on_confirm),
+                ]
+                page.open(confirm_dialog)
+            
+            new_requests_button = ft.TextButton(
+                visible=False,
+                icon=ft.Icons.REFRESH,
+                on_click=lambda e: run_query(),
+            )
+            
+            load_more_button = ft.TextButton(
+                "Load more",
+                on_click=lambda e: load_next_page(e),
+            )
+            
+            @self.metrics.timed("handler_milliseconds", "history_page")
+            def load_next_page(e=None):
+                page_ids = []
+                if cursor["next"] is not None:
+                    page_ids.append(cursor["next"])
+                page_ids.extend(itertools.islice(cursor["ids"], self.HISTORY_PAGE_SIZE - len(page_ids)))
+                cursor["next"] = next(cursor["ids"], None)
+                if not page_ids:
+                    return
+                
+                if leave_list.controls and leave_list.controls[-1] is load_more_button:
+                    leave_list.controls.pop()
+                
+                for request_id in page_ids:
+                    req = self.store.get(request_id)
+                    if req is not None:
+                        rows[request_id] = history_item(req)
+                        leave_list.controls.append(rows[request_id])
+                
+                if cursor["next"] is not None:
+                    leave_list.controls.append(load_more_button)
+                
+                if e is not None:
+                    leave_list.update()
+            
+            def on_list_scroll(e):
+                if e.pixels >= e.max_scroll_extent - 200:
+                    load_next_page(e)
+            
+            @self.metrics.timed("handler_milliseconds", "history_query")
+            def run_query(send=True):
+                cursor["ids"] = self.search.query(history_filter["query"], history_filter["status"])
+                cursor["next"] = None
+                rows.clear()
+                selected.clear()
+                refresh_selection()
+                leave_list.controls.clear()
+                new_requests_button.visible = False
+                load_next_page()
+                # Imports and the search debounce finish on other threads,
+                # possibly after the user left this view; the cached view
+                # then shows the new rows when it is next mounted
+                if send and leave_list.page is not None:
+                    leave_list.update()
+                    new_requests_button.update()
+                    selection_bar.update()
+            
+            @self.metrics.timed("handler_milliseconds", "history_live_update")
+            def apply_changes(changes):
+                # Patch rows already on screen; new requests are announced
+                # rather than shuffling the list under the user
+                new_count = 0
+                for request_id, is_new in changes.items():
+                    if is_new:
+                        new_count += 1
+                    row = rows.get(request_id)
+                    req = self.store.get(request_id)
+                    if req is not None and req.status != "Pending":
+                        selected.discard(request_id)
+                    if row is not None and req is not None and row.data != req.version:
+                        patch_row(row, req)
+                refresh_selection()
+                if new_count:
+                    new_count += int(new_requests_button.data or 0) if new_requests_button.visible else 0
+                    new_requests_button.data = new_count
+                    new_requests_button.text = f"{new_count} new request(s) - tap to refresh"
+                    new_requests_button.visible = True
+            
+            live_views["history"] = apply_changes
+            
+            # Import and export run on a worker thread so the session stays
+            # responsive while a large file streams through
+            import_path_field = ft.TextField(
+                label="File on the server",
+                hint_text="/path/to/requests.csv or .jsonl",
+                width=400,
+            )
+            
+            @self.metrics.timed("handler_milliseconds", "import")
+            def run_import(path):
+                try:
+                    result = self.import_requests(path, session["email"])
+                except (OSError, ValueError) as ex:
+                    show_snack_bar(f"Import failed: {ex}", "red")
+                    return
+                message = f"Imported {result.imported} request(s)"
+                if result.failed:
+                    row_number, error = result.errors[0]
+                    message += f", {result.failed} row(s) skipped (row {row_number}: {error})"
+                run_query()
+                show_snack_bar(message, "orange" if result.failed else "green")
+            
+            def start_import(e):
+                page.close(import_dialog)
+                if import_path_field.value:
+                    show_snack_bar("Importing...", "blue")
+                    page.run_thread(run_import, import_path_field.value.strip())
+            
+            import_dialog = ft.AlertDialog(
+                title=ft.Text("Import leave requests"),
+                content=import_path_field,
+                actions=[
+                    ft.TextButton("Cancel", on_click=lambda e: page.close(import_dialog)),
+                    ft.TextButton("Import", on_click=start_import),
+                ],
+            )
+            
+            def open_import_dialog(e):
+                page.open(import_dialog)
+            
+            @self.metrics.timed("handler_milliseconds", "export")
+            def run_export(request_ids):
+                export_dir = os.path.join(self.store.path, "exports")
+                os.makedirs(export_dir, exist_ok=True)
+                path = os.path.join(
+                    export_dir,
+                    f"leave-requests-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv",
                 )
+                count = self.export_requests(path, request_ids)
+                show_snack_bar(f"Exported {count} request(s) to {path}", "green")
+            
+            def export_current_list(e):
+                request_ids = self.search.query(history_filter["query"], history_filter["status"])
+                page.run_thread(run_export, request_ids)
+            
+            def on_search_change(e):
+                # Debounce keystrokes; only the last query in a burst runs
+                history_filter["query"] = e.control.value
+                if history_filter["timer"] is not None:
+                    history_filter["timer"].cancel()
+                history_filter["timer"] = threading.Timer(self.SEARCH_DEBOUNCE, run_query)
+                history_filter["timer"].start()
+            
+            def filter_button(label, status):
+                def on_click(e):
+                    history_filter["status"] = status
+                    filter_row.controls = [filter_button(*f) for f in self.HISTORY_FILTERS]
+                    filter_row.update()
+                    run_query()
+                
+                if history_filter["status"] == status:
+                    return ft.ElevatedButton(label, bgcolor="blue", color="white", on_click=on_click)
+                return ft.OutlinedButton(label, on_click=on_click)
+            
+            filter_row = ft.Row(
+                [filter_button(*f) for f in self.HISTORY_FILTERS],
+                scroll=ft.ScrollMode.AUTO,
+            )
+            
+            menu_items = []
+            if can("decide"):
+                menu_items += [
+                    ft.PopupMenuItem(
+                        text="Approve all matching filter",
+                        icon=ft.Icons.DONE_ALL,
+                        on_click=lambda e: confirm_all_matching("Approved"),
+                    ),
+                    ft.PopupMenuItem(
+                        text="Reject all matching filter",
+                        icon=ft.Icons.REMOVE_DONE,
+                        on_click=lambda e: confirm_all_matching("Rejected"),
+                    ),
+                ]
+            if can("import_export"):
+                menu_items += [
+                    ft.PopupMenuItem(
+                        text="Import requests...",
+                        icon=ft.Icons.UPLOAD_FILE,
+                        on_click=open_import_dialog,
+                    ),
+                    ft.PopupMenuItem(
+                        text="Export current list",
+                        icon=ft.Icons.DOWNLOAD,
+                        on_click=export_current_list,
+                    ),
+                ]
+            
+            leave_list.on_scroll = on_list_scroll
+            run_query(send=False)
             
             return ft.View(
                 "/history",
@@ -602,7 +1584,11 @@ class LeaveRequestApp:
                         title=ft.Text("Leave Requests"),
                         bgcolor="blue",
                         actions=[
-                            ft.IconButton(icon=ft.Icons.MORE_VERT),
+                            ft.PopupMenuButton(
+                                icon=ft.Icons.MORE_VERT,
+                                visible=bool(menu_items),
+                                items=menu_items,
+                            ),
                         ],
                     ),
                     ft.Container(
@@ -612,23 +1598,332 @@ class LeaveRequestApp:
                                     hint_text="Search by employee name...",
                                     prefix_icon=ft.Icons.SEARCH,
                                     border_color="grey400",
+                                    on_change=on_search_change,
                                 ),
                                 ft.Container(height=10),
+                                filter_row,
+                                ft.Container(height=20),
+                                new_requests_button,
+                                selection_bar,
+                                leave_list,
+                            ],
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
+        
+        # Reports page
+        def create_reports_view():
+            today = date.today()
+            months = []
+            year, month = today.year, today.month
+            for _ in range(self.REPORT_MONTHS):
+                months.insert(0, f"{year:04d}-{month:02d}")
+                year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+            
+            department_table = ft.DataTable(
+                columns=[ft.DataColumn(ft.Text("Department"))] + [
+                    ft.DataColumn(ft.Text(datetime.strptime(m, "%Y-%m").strftime("%b %y")), numeric=True)
+                    for m in months
+                ],
+                rows=[
+                    ft.DataRow(
+                        cells=[ft.DataCell(ft.Text(department))] + [
+                            ft.DataCell(ft.Text(str(days))) for days in row
+                        ]
+                    )
+                    for department, row in self.reports.department_months(months).items()
+                ],
+            )
+            
+            rejection_rows = [
+                ft.Row(
+                    [
+                        ft.Text(leave_type, color="grey700", expand=True),
+                        ft.Text(f"{rate:.0%} ({rejected} of {decided})", weight=ft.FontWeight.BOLD),
+                    ],
+                )
+                for leave_type, (rejected, decided, rate) in self.reports.rejection_rates().items()
+            ]
+            
+            peak_rows = [
+                ft.Row(
+                    [
+                        ft.Text(
+                            f"Week {week}, {year} (from {date.fromisocalendar(year, week, 1).strftime('%b %d')})",
+                            color="grey700",
+                            expand=True,
+                        ),
+                        ft.Text(f"{days} days off", weight=ft.FontWeight.BOLD),
+                    ],
+                )
+                for (year, week), days in self.reports.peak_weeks()
+            ]
+            
+            def section(title, controls):
+                return ft.Container(
+                    content=ft.Column(
+                        [ft.Text(title, size=16, weight=ft.FontWeight.BOLD), ft.Container(height=5), *controls],
+                    ),
+                    bgcolor="white",
+                    padding=20,
+                    border_radius=10,
+                    border=ft.border.all(1, "grey300"),
+                    margin=ft.margin.only(bottom=20),
+                )
+            
+            return ft.View(
+                "/reports",
+                [
+                    ft.AppBar(
+                        leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
+                        title=ft.Text("Leave Reports"),
+                        bgcolor="blue",
+                    ),
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                section(
+                                    "Working days off per department",
+                                    [ft.Row([department_table], scroll=ft.ScrollMode.AUTO)],
+                                ),
+                                section(
+                                    "Rejection rate by leave type",
+                                    rejection_rows or [ft.Text("No decisions yet", color="grey700")],
+                                ),
+                                section(
+                                    "Peak absence weeks",
+                                    peak_rows or [ft.Text("No approved leave yet", color="grey700")],
+                                ),
+                            ],
+                            scroll=ft.ScrollMode.AUTO,
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
+        
+        def create_schedule_view():
+            departments = sorted(set(self.DEPARTMENT_HEADCOUNT) | set(self.staffing.members))
+            today = date.today()
+            schedule = {
+                "department": departments[0] if departments else None,
+                "mode": "Week",
+                "start": today - timedelta(days=today.weekday()),
+            }
+            
+            period_text = ft.Text(size=16, weight=ft.FontWeight.BOLD)
+            summary_text = ft.Text(size=12, color="grey700")
+            header_text = ft.Text(font_family="monospace", size=12, weight=ft.FontWeight.BOLD)
+            totals_text = ft.Text(font_family="monospace", size=12, color="orange")
+            grid = ft.ListView(expand=True, spacing=2)
+            
+            def period():
+                start = schedule["start"]
+                days = self.SCHEDULE_MODES[schedule["mode"]]
+                if days is None:
+                    start = start.replace(day=1)
+                    following = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+                    days = (following - start).days
+                return start, days
+            
+            @self.metrics.timed("handler_milliseconds", "schedule_render")
+            def render(send=True):
+                start, days = period()
+                rows, totals = self.staffing.schedule(schedule["department"], start, days)
+                working = [self.workdays.is_working_day(start + timedelta(days=i)) for i in range(days)]
+                
+                last = start + timedelta(days=days - 1)
+                period_text.value = f"{start.strftime('%b %d')} - {last.strftime('%b %d, %Y')}"
+                members = len(self.staffing.members.get(schedule["department"], ()))
+                summary_text.value = f"{len(rows)} of {members} people off in this period"
+                header_text.value = "".join(f"{(start + timedelta(days=i)).day:>3}" for i in range(days))
+                totals_text.value = "".join(f"{count:>3}" if count else "  ." for count in totals)
+                grid.controls = [
+                    ft.Row(
+                        [
+                            ft.Text(name, width=160, size=12, no_wrap=True),
+                            ft.Text(
+                                "".join(
+                                    "  \u25a0" if off else ("  \u00b7" if work else "   ")
+                                    for off, work in zip(cells, working)
+                                ),
+                                font_family="monospace",
+                                size=12,
+                                color="blue",
+                            ),
+                        ],
+                        spacing=0,
+                    )
+                    for name, cells in rows
+                ]
+                if send:
+                    page.update()
+            
+            def shift(direction):
+                def handler(e):
+                    start = schedule["start"]
+                    if schedule["mode"] == "Week":
+                        schedule["start"] = start + timedelta(days=7 * direction)
+                    else:
+                        month = start.year * 12 + start.month - 1 + direction
+                        schedule["start"] = date(month // 12, month % 12 + 1, 1)
+                    render()
+                return handler
+            
+            def set_department(e):
+                schedule["department"] = e.control.value
+                render()
+            
+            def set_mode(e):
+                schedule["mode"] = e.control.value
+                if schedule["mode"] == "Week":
+                    start = schedule["start"]
+                    schedule["start"] = start - timedelta(days=start.weekday())
+                render()
+            
+            render(send=False)
+            # Leave changes from any session redraw the grid
+            live_views["schedule"] = lambda changes: render(send=False)
+            
+            return ft.View(
+                "/schedule",
+                [
+                    ft.AppBar(
+                        leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
+                        title=ft.Text("Team Schedule"),
+                        bgcolor="blue",
+                    ),
+                    ft.Container(
+                        content=ft.Column(
+                            [
                                 ft.Row(
                                     [
-                                        ft.ElevatedButton(
-                                            "All",
-                                            bgcolor="blue",
-                                            color="white",
+                                        ft.Dropdown(
+                                            value=schedule["department"],
+                                            options=[ft.dropdown.Option(name) for name in departments],
+                                            on_change=set_department,
+                                            expand=True,
+                                        ),
+                                        ft.Dropdown(
+                                            value=schedule["mode"],
+                                            options=[ft.dropdown.Option(mode) for mode in self.SCHEDULE_MODES],
+                                            on_change=set_mode,
+                                            width=120,
                                         ),
-                                        ft.OutlinedButton("Pending"),
-                                        ft.OutlinedButton("Approved"),
-                                        ft.OutlinedButton("Rejected"),
                                     ],
-                                    scroll=ft.ScrollMode.AUTO,
                                 ),
-                                ft.Container(height=20),
-                                *leave_items,
+                                ft.Row(
+                                    [
+                                        ft.IconButton(ft.Icons.CHEVRON_LEFT, on_click=shift(-1)),
+                                        period_text,
+                                        ft.IconButton(ft.Icons.CHEVRON_RIGHT, on_click=shift(1)),
+                                    ],
+                                    alignment=ft.MainAxisAlignment.CENTER,
+                                ),
+                                summary_text,
+                                ft.Row([ft.Text("", width=160), header_text], spacing=0),
+                                ft.Row([ft.Text("Off", width=160, size=12, color="orange"), totals_text], spacing=0),
+                                ft.Divider(),
+                                grid,
+                            ],
+                            expand=True,
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
+        
+        def create_inbox_view():
+            messages = self.notifier.inbox(session["user"]["name"])
+            items = [
+                ft.Container(
+                    content=ft.Column(
+                        [
+                            ft.Text(message["subject"], size=16, weight=ft.FontWeight.BOLD),
+                            ft.Text(datetime.fromtimestamp(message["sent"]).strftime("%b %d, %Y %H:%M"), size=12, color="grey700"),
+                            ft.Text(message["body"]),
+                        ],
+                        spacing=4,
+                    ),
+                    bgcolor="white",
+                    padding=15,
+                    border_radius=10,
+                    border=ft.border.all(1, "grey300"),
+                    margin=ft.margin.only(bottom=10),
+                )
+                for message in messages
+            ]
+            
+            return ft.View(
+                "/inbox",
+                [
+                    ft.AppBar(
+                        leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
+                        title=ft.Text("Inbox"),
+                        bgcolor="blue",
+                    ),
+                    ft.Container(
+                        content=ft.ListView(
+                            items or [ft.Text("No messages yet", color="grey700")],
+                            expand=True,
+                        ),
+                        padding=20,
+                        expand=True,
+                    )
+                ],
+            )
+        
+        def create_metrics_view():
+            def number(value):
+                return "-" if value == float("inf") else f"{value:,.2f}"
+            
+            table = ft.DataTable(
+                columns=[
+                    ft.DataColumn(ft.Text("Metric")),
+                    ft.DataColumn(ft.Text("Name")),
+                    ft.DataColumn(ft.Text("Count"), numeric=True),
+                    ft.DataColumn(ft.Text("Mean"), numeric=True),
+                    ft.DataColumn(ft.Text("p50 <="), numeric=True),
+                    ft.DataColumn(ft.Text("p95 <="), numeric=True),
+                ],
+                rows=[
+                    ft.DataRow(
+                        cells=[
+                            ft.DataCell(ft.Text(name)),
+                            ft.DataCell(ft.Text(label)),
+                            ft.DataCell(ft.Text(f"{count:,}")),
+                            ft.DataCell(ft.Text(number(mean))),
+                            ft.DataCell(ft.Text(number(p50))),
+                            ft.DataCell(ft.Text(number(p95))),
+                        ]
+                    )
+                    for name, label, count, mean, p50, p95 in self.metrics.summary()
+                ],
+            )
+            
+            return ft.View(
+                "/metrics",
+                [
+                    ft.AppBar(
+                        leading=ft.IconButton(ft.Icons.ARROW_BACK, on_click=go_to_home),
+                        title=ft.Text("Performance Metrics"),
+                        bgcolor="blue",
+                        actions=[ft.IconButton(ft.Icons.REFRESH, on_click=lambda e: route_change(page.route))],
+                    ),
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                ft.Text(
+                                    f"Also served as Prometheus text on http://127.0.0.1:{self.METRICS_PORT}/metrics",
+                                    size=12,
+                                    color="grey700",
+                                ),
+                                ft.Row([table], scroll=ft.ScrollMode.AUTO),
                             ],
                             scroll=ft.ScrollMode.AUTO,
                         ),
@@ -638,20 +1933,69 @@ class LeaveRequestApp:
                 ],
             )
         
+        # Views built on demand are cached per session and reused while the
+        # data they were built from is unchanged. The details view is keyed
+        # by the request version; the history and schedule views are kept
+        # current by live updates, so they are built once and patched in place
+        # from then on.
+        view_cache = {}
+        
+        def cached_view(route, key, build):
+            entry = view_cache.get(route)
+            if entry is None or entry[0] != key:
+                entry = view_cache[route] = (key, self.metrics.build_view(route, build))
+            return entry[1]
+        
         # Route change handler
+        @self.metrics.timed("route_change_milliseconds", lambda: page.route)
         def route_change(route):
-            page.views.clear()
+            # Everything past the login page needs a signed-in user
+            if page.route != "/" and session["email"] is None:
+                page.go("/")
+                return
+            if page.route == "/" and session["email"] is not None:
+                page.go("/home")
+                return
             
+            view = None
             if page.route == "/":
-                page.views.append(login_view)
+                view = cached_view("/", None, create_login_view)
             elif page.route == "/home":
-                page.views.append(home_view)
-            elif page.route == "/form":
-                page.views.append(form_view)
-            elif page.route == "/details":
-                page.views.append(create_details_view())
-            elif page.route == "/history":
-                page.views.append(create_history_view())
+                # The greeting and the buttons shown depend on who is signed in
+                view = cached_view("/home", session["email"], create_home_view)
+                refresh_dashboard(send=False)
+                # Leaving the form flow; the next form is a new request
+                form_data.clear()
+                view_cache.pop("/form", None)
+            elif page.route == "/form" and can("submit"):
+                if not form_data.pop("editing", False):
+                    form_data.pop("request_id", None)
+                view = cached_view("/form", None, create_form_view)
+            elif page.route == "/details" and can("submit"):
+                request = self.store.get(form_data.get("request_id"))
+                key = (request.id, request.version) if request else None
+                view = cached_view("/details", key, create_details_view)
+            elif page.route == "/history" and can("view_history"):
+                view = cached_view("/history", None, create_history_view)
+            elif page.route == "/schedule":
+                view = cached_view("/schedule", None, create_schedule_view)
+            elif page.route == "/reports" and can("view_reports"):
+                view = cached_view("/reports", self.reports.version, create_reports_view)
+            elif page.route == "/inbox":
+                view = create_inbox_view()
+            elif page.route == "/metrics" and can("view_metrics"):
+                # Always fresh; the numbers change on every event
+                view = create_metrics_view()
+            else:
+                # Unknown routes, or ones this user's role may not open
+                page.go("/home")
+                return
+            
+            # Leave the view list alone when the same view is already shown
+            if page.views[-1:] != [view]:
+                page.views.clear()
+                if view is not None:
+                    page.views.append(view)
             
             page.update()
         
@@ -660,12 +2004,44 @@ class LeaveRequestApp:
             top_view = page.views[-1]
             page.go(top_view.route)
         
+        # Live updates from other sessions, delivered in coalesced batches
+        live_views = {}
+        
+        @self.metrics.timed("handler_milliseconds", "live_update")
+        def on_store_changes(changes):
+            refresh_dashboard(send=False)
+            for apply_changes in list(live_views.values()):
+                apply_changes(changes)
+            page.update()
+        
+        def on_close(e):
+            self.broker.unsubscribe(page.session_id)
+        
+        self.broker.subscribe(page.session_id, on_store_changes)
+        page.on_close = on_close
+        if self.metrics.enabled:
+            self.metrics.watch_updates(getattr(page, "connection", None))
+        
+        # Returning sessions present their signed token instead of a password
+        token = page.client_storage.get(self.SESSION_TOKEN_KEY) if page.client_storage else None
+        restored = self.auth.verify_token(token)
+        if restored is not None:
+            start_session(*restored)
+        
         page.on_route_change = route_change
         page.on_view_pop = view_pop
         page.go(page.route)
+        if self.metrics.enabled:
+            self.metrics.observe("first_paint_milliseconds", "session", (time.perf_counter() - started) * 1000)
 
 
 # Run the app
 if __name__ == "__main__":
-    app = LeaveRequestApp()
+    # Local stand-ins for the mail server and webhook receiver; both write
+    # what they receive under data/outbox
+    LocalSmtpServer(os.path.join("data", "outbox"), *LeaveRequestApp.SMTP_SERVER)
+    WebhookStub(os.path.join("data", "outbox"), *LeaveRequestApp.WEBHOOK_SERVER)
+    app = LeaveRequestApp(metrics=os.environ.get("HR_LEAVE_METRICS") == "1", outbound=True)
+    if app.metrics.enabled:
+        app.metrics.serve(app.METRICS_PORT)
     ft.app(app.main, view=ft.WEB_BROWSER, port=8550)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds of the histogram buckets; the last bucket is +Inf
+MILLISECOND_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SIZE_BUCKETS = (10, 30, 100, 300, 1000, 3000, 10_000, 30_000, 100_000, 300_000, 1_000_000)
+
+# metric name -> (help text, buckets)
+METRICS = {
+    "route_change_milliseconds": ("Time spent in route_change", MILLISECOND_BUCKETS),
+    "view_build_milliseconds": ("Time spent building a view", MILLISECOND_BUCKETS),
+    "view_controls": ("Controls in a freshly built view", SIZE_BUCKETS),
+    "handler_milliseconds": ("Time spent in an event handler", MILLISECOND_BUCKETS),
+    "first_paint_milliseconds": ("Time from session start to its first view", MILLISECOND_BUCKETS),
+    "update_bytes": ("Encoded size of the commands sent by one page update", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    # Fixed buckets, so observing is a bisect and two additions
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self.lock:
+            target = q * self.count
+            running = 0
+            for bound, count in zip(self.buckets, self.counts):
+                running += count
+                if running >= target and running:
+                    return bound
+        return float("inf")
+
+
+class Metrics:
+    # Histograms per metric and label, e.g. ("handler_milliseconds", "login").
+    #
+    # Every hook starts with `if not self.enabled`, so with metrics off an
+    # instrumented call costs one attribute check. Values are exposed as
+    # Prometheus text by `render` and over HTTP by `serve`.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, label, value):
+        histogram = self.histograms.get((name, label))
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault((name, label), Histogram(METRICS[name][1]))
+        histogram.observe(value)
+
+    def timed(self, name, label):
+        # Decorator for plain and async functions; `label` may be a callable
+        # evaluated on each call
+        def decorate(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def run_async(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    key = label() if callable(label) else label
+                    started = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self.observe(name, key, (time.perf_counter() - started) * 1000)
+                return run_async
+
+            @functools.wraps(fn)
+            def run(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                key = label() if callable(label) else label
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, key, (time.perf_counter() - started) * 1000)
+            return run
+        return decorate
+
+    def build_view(self, route, build):
+        # build() with its time and control count recorded
+        if not self.enabled:
+            return build()
+        started = time.perf_counter()
+        view = build()
+        self.observe("view_build_milliseconds", route, (time.perf_counter() - started) * 1000)
+        self.observe("view_controls", route, count_controls(view))
+        return view
+
+    def watch_updates(self, connection):
+        # Record the encoded size of every batch of commands sent over a
+        # Flet connection. The connection is shared by all sessions of a
+        # server process, so it is only wrapped once.
+        if connection is None or getattr(connection, "_metrics_wrapped", False):
+            return
+        send_commands = connection.send_commands
+        from flet.core.protocol import CommandEncoder
+
+        def measured(session_id, commands):
+            if self.enabled:
+                size = len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")))
+                self.observe("update_bytes", "page", size)
+            return send_commands(session_id, commands)
+
+        connection.send_commands = measured
+        connection._metrics_wrapped = True
+
+    # Reading
+
+    def summary(self):
+        # [(metric, label, count, mean, p50, p95)] sorted by metric and label
+        with self.lock:
+            items = sorted(self.histograms.items())
+        return [
+            (name, label, h.count, h.total / h.count if h.count else 0.0, h.quantile(0.5), h.quantile(0.95))
+            for (name, label), h in items
+        ]
+
+    def render(self):
+        # Prometheus text exposition format
+        with self.lock:
+            items = sorted(self.histograms.items())
+        lines = []
+        seen = set()
+        for (name, label), histogram in items:
+            metric = f"hr_leave_{name}"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {metric} {METRICS[name][0]}")
+                lines.append(f"# TYPE {metric} histogram")
+            with histogram.lock:
+                counts = list(histogram.counts)
+                total, count = histogram.total, histogram.count
+            running = 0
+            for bound, bucket_count in zip(histogram.buckets + ("+Inf",), counts):
+                running += bucket_count
+                lines.append(f'{metric}_bucket{{name="{label}",le="{bound}"}} {running}')
+            lines.append(f'{metric}_sum{{name="{label}"}} {total:.6g}')
+            lines.append(f'{metric}_count{{name="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        # Plain-text endpoint at http://host:port/metrics on a daemon thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def count_controls(control):
+    # Number of Flet controls in the tree under `control`
+    count = 0
+    stack = [control]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(child for child in current._get_children() if child is not None)
+    return count
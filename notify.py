@@ -0,0 +1,461 @@
+import heapq
+import json
+import logging
+import os
+import random
+import smtplib
+import socketserver
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 6
+# Seconds before the first retry; doubled on every further attempt
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 300.0
+# Delivered keys remembered for dedup, oldest forgotten first
+DEDUP_KEYS = 200_000
+
+
+class NotificationQueue:
+    # Durable delivery queue. Every change is appended to a JSONL log
+    # (enqueue, done, retry, dead) and replayed on start, so messages
+    # survive a restart; anything that was in flight is delivered again.
+    # Messages carry a dedup key, and a key already queued or delivered is
+    # dropped, so retried handlers and double clicks do not send twice.
+    def __init__(self, path, compact_every=10000):
+        self.path = os.path.join(path, "notifications.jsonl")
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.schedule = []
+        self.in_flight = set()
+        self.seen = OrderedDict()
+        self.dead = 0
+        self.next_id = 1
+        self.entries = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            good = 0
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError("no line end")
+                            entry = json.loads(line)
+                        except ValueError:
+                            # A torn last line from a crash mid-write; cut it
+                            # off so the next entry starts on a clean line
+                            break
+                        self._apply(entry)
+                        self.entries += 1
+                    good += len(line)
+            if good != os.path.getsize(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(good)
+        self.schedule = [(message["due"], message_id) for message_id, message in self.pending.items()]
+        heapq.heapify(self.schedule)
+        self._log = open(self.path, "a", encoding="utf-8")
+
+    def _remember(self, key):
+        self.seen[key] = None
+        while len(self.seen) > DEDUP_KEYS:
+            self.seen.popitem(last=False)
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "enqueue":
+            message = entry["message"]
+            self.pending[message["id"]] = message
+            self._remember(message["key"])
+            self.next_id = max(self.next_id, message["id"] + 1)
+        elif op == "seen":
+            for key in entry["keys"]:
+                self._remember(key)
+        elif op in ("done", "dead"):
+            for message_id in entry["ids"]:
+                self.pending.pop(message_id, None)
+            if op == "dead":
+                self.dead += len(entry["ids"])
+        elif op == "retry":
+            for message_id in entry["ids"]:
+                message = self.pending.get(message_id)
+                if message is not None:
+                    message["attempts"] += 1
+                    message["due"] = entry["due"]
+                    message["error"] = entry.get("error")
+
+    def _write(self, *entries):
+        for entry in entries:
+            self._log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._log.flush()
+        self.entries += len(entries)
+        if self.entries >= max(self.compact_every, 2 * len(self.pending)):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "seen", "keys": list(self.seen)}) + "\n")
+            for message in self.pending.values():
+                f.write(json.dumps({"op": "enqueue", "message": message}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._log.close()
+        self._log = open(self.path, "a", encoding="utf-8")
+        self.entries = 1 + len(self.pending)
+
+    def put_many(self, messages):
+        # messages: dicts with channel, recipient, subject, body and key.
+        # Returns how many were queued after dedup.
+        now = time.time()
+        entries = []
+        with self.lock:
+            for message in messages:
+                if message["key"] in self.seen:
+                    continue
+                message = dict(message, id=self.next_id, attempts=0, due=now)
+                self.next_id += 1
+                self.pending[message["id"]] = message
+                self._remember(message["key"])
+                heapq.heappush(self.schedule, (now, message["id"]))
+                entries.append({"op": "enqueue", "message": message})
+            if entries:
+                self._write(*entries)
+        return len(entries)
+
+    def take_due(self, limit):
+        # Due messages, marked in flight until done() or failed()
+        now = time.time()
+        taken = []
+        with self.lock:
+            while self.schedule and self.schedule[0][0] <= now and len(taken) < limit:
+                due, message_id = heapq.heappop(self.schedule)
+                message = self.pending.get(message_id)
+                # Stale heap entries are skipped
+                if message is None or message["due"] != due or message_id in self.in_flight:
+                    continue
+                self.in_flight.add(message_id)
+                taken.append(message)
+        return taken
+
+    def done(self, messages):
+        with self.lock:
+            ids = [message["id"] for message in messages]
+            for message_id in ids:
+                self.pending.pop(message_id, None)
+                self.in_flight.discard(message_id)
+            self._write({"op": "done", "ids": ids})
+
+    def failed(self, messages, error):
+        # Retry with exponential backoff and jitter; give up after MAX_ATTEMPTS.
+        # A batch can mix new messages with ones already retried, so each
+        # message counts its own attempts; messages on the same attempt
+        # share one log entry. Returns how many were given up on.
+        with self.lock:
+            dead = []
+            retries = {}
+            for message in messages:
+                self.in_flight.discard(message["id"])
+                attempts = message["attempts"] + 1
+                if attempts >= MAX_ATTEMPTS:
+                    dead.append(message["id"])
+                else:
+                    retries.setdefault(attempts, []).append(message)
+            entries = []
+            if dead:
+                for message_id in dead:
+                    self.pending.pop(message_id, None)
+                self.dead += len(dead)
+                entries.append({"op": "dead", "ids": dead, "error": error})
+            now = time.time()
+            for attempts, group in retries.items():
+                delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_CAP) * random.uniform(0.8, 1.2)
+                due = now + delay
+                for message in group:
+                    message["attempts"] = attempts
+                    message["due"] = due
+                    message["error"] = error
+                    heapq.heappush(self.schedule, (due, message["id"]))
+                entries.append({"op": "retry", "ids": [message["id"] for message in group], "due": due, "error": error})
+            self._write(*entries)
+            return len(dead)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def close(self):
+        with self.lock:
+            self._log.close()
+
+
+# Channels. Each delivers a whole batch or raises, in which case the batch
+# is retried; receivers can drop repeats by the message key.
+
+class InboxChannel:
+    # In-app inbox, appended to inbox.jsonl and kept in memory per recipient.
+    # Worker processes may share the file, so readers pick up whatever was
+    # appended since they last looked, whoever wrote it.
+    name = "inbox"
+
+    def __init__(self, path, keep=200):
+        self.path = os.path.join(path, "inbox.jsonl")
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.messages = {}
+        self.offset = 0
+        os.makedirs(path, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._catch_up()
+
+    def _catch_up(self):
+        if os.path.getsize(self.path) == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing this one
+                    break
+                self.offset += len(line)
+                if line.strip():
+                    self._add(json.loads(line))
+
+    def _add(self, message):
+        inbox = self.messages.setdefault(message["recipient"], [])
+        inbox.append(message)
+        if len(inbox) > self.keep:
+            del inbox[: len(inbox) - self.keep]
+
+    def deliver(self, batch):
+        lines = []
+        for message in batch:
+            item = {
+                "recipient": message["recipient"],
+                "subject": message["subject"],
+                "body": message["body"],
+                "sent": message.get("created") or time.time(),
+                "key": message["key"],
+            }
+            lines.append(json.dumps(item, separators=(",", ":")) + "\n")
+        # One append per batch, so batches from different processes never
+        # interleave mid-line
+        os.write(self._fd, "".join(lines).encode("utf-8"))
+
+    def for_recipient(self, recipient):
+        # Newest first
+        with self.lock:
+            self._catch_up()
+            return list(reversed(self.messages.get(recipient, ())))
+
+
+class EmailChannel:
+    # One SMTP connection per batch
+    name = "email"
+
+    def __init__(self, host, port, sender="hr-leave@localhost", timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def deliver(self, batch):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for message in batch:
+                email = EmailMessage()
+                email["From"] = self.sender
+                email["To"] = message["recipient"]
+                email["Subject"] = message["subject"]
+                email["Message-ID"] = f"<{message['key']}@hr-leave>"
+                email.set_content(message["body"])
+                smtp.send_message(email)
+
+
+class WebhookChannel:
+    # One POST per batch: {"events": [...]}
+    name = "webhook"
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, batch):
+        events = [
+            {"key": m["key"], "recipient": m["recipient"], "subject": m["subject"], "body": m["body"]}
+            for m in batch
+        ]
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"events": events}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise OSError(f"webhook answered {response.status}")
+
+
+class Notifier:
+    # Fans messages out to the channels. A dispatcher thread takes due
+    # messages off the durable queue, groups them per channel into batches
+    # of `batch_size` and hands each batch to a worker. `send` only writes
+    # the queue, so callers never wait for delivery.
+    def __init__(self, path, channels, workers=4, batch_size=BATCH_SIZE, interval=0.5):
+        self.queue = NotificationQueue(path)
+        self.channels = {channel.name: channel for channel in channels}
+        self.batch_size = batch_size
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify")
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+        self.thread.start()
+
+    def send(self, messages):
+        created = time.time()
+        queued = self.queue.put_many(
+            dict(message, created=created) for message in messages if message["channel"] in self.channels
+        )
+        if queued:
+            with self.condition:
+                self.condition.notify()
+        return queued
+
+    def send_later(self, build):
+        # Build and queue the messages on a worker; for large fan-outs
+        return self.executor.submit(lambda: self.send(build()))
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                self.condition.wait(self.interval)
+            while not self.closed:
+                due = self.queue.take_due(self.batch_size * 4)
+                if not due:
+                    break
+                by_channel = {}
+                for message in due:
+                    by_channel.setdefault(message["channel"], []).append(message)
+                for channel, messages in by_channel.items():
+                    for i in range(0, len(messages), self.batch_size):
+                        # Waits when every worker is busy, so the queue
+                        # rather than the executor holds the backlog
+                        self.slots.acquire()
+                        self.executor.submit(self._deliver, channel, messages[i:i + self.batch_size])
+
+    def _deliver(self, channel, batch):
+        try:
+            self.channels[channel].deliver(batch)
+        except Exception as ex:
+            dead = self.queue.failed(batch, str(ex))
+            if dead:
+                logger.warning("Giving up on %d %s message(s): %s", dead, channel, ex)
+        else:
+            self.queue.done(batch)
+        finally:
+            self.slots.release()
+
+    def inbox(self, recipient):
+        channel = self.channels.get("inbox")
+        return channel.for_recipient(recipient) if channel else []
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        # The dispatcher may be handing out a batch; let it stop first
+        self.thread.join()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.queue.close()
+
+
+# Local stand-ins for the outside world, used when running on one machine.
+# Both append what they receive to files under `path`.
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        self.reply("220 localhost stand-in SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                self.server.store(b"".join(lines))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class LocalSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, path, host="127.0.0.1", port=8025):
+        os.makedirs(path, exist_ok=True)
+        self.mbox_path = os.path.join(path, "mail.mbox")
+        self.lock = threading.Lock()
+        super().__init__((host, port), _SmtpHandler)
+        threading.Thread(target=self.serve_forever, name="smtp-stand-in", daemon=True).start()
+
+    def store(self, data):
+        with self.lock, open(self.mbox_path, "ab") as f:
+            f.write(b"From hr-leave " + time.asctime().encode("ascii") + b"\n" + data + b"\n")
+
+
+class WebhookStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, path, host="127.0.0.1", port=8026):
+        os.makedirs(path, exist_ok=True)
+        self.log_path = os.path.join(path, "webhooks.jsonl")
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with stub.lock, open(stub.log_path, "ab") as f:
+                    f.write(body.replace(b"\n", b" ") + b"\n")
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        super().__init__((host, port), Handler)
+        threading.Thread(target=self.serve_forever, name="webhook-stub", daemon=True).start()
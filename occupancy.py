@@ -0,0 +1,234 @@
+import threading
+from array import array
+from datetime import timedelta
+
+from intervals import ACTIVE_STATUSES
+
+
+class StaffingCalendar:
+    # Per-department count of people off on each day, kept as an int array
+    # indexed by day ordinal minus `base`. Checking a new request only reads
+    # the days it covers, so the cost is O(days in range) no matter how many
+    # requests exist.
+    #
+    # Each employee also has a bitset: (origin, bits), a day ordinal and a
+    # Python int with bit i set when they are off on day origin + i. The
+    # origin is their earliest day off, so any date can be stored. Together
+    # they form the date x employee matrix behind the team schedule: a
+    # window is one shift and mask per person.
+    def __init__(self, store, headcounts=None, minimum_staff=None, default_minimum=1):
+        self.store = store
+        self.headcounts = dict(headcounts or {})
+        self.minimum_staff = dict(minimum_staff or {})
+        self.default_minimum = default_minimum
+        self.lock = threading.Lock()
+        self.base = None
+        self.days_off = {}
+        self.members = {}
+        self.counted = {}
+        self.employee_days = {}
+
+        with store.lock:
+            self._add(store.requests.values())
+            store.subscribe(self.on_change, self.on_batch, self.on_updates)
+
+    def _range(self, request):
+        if not request.get("department"):
+            return None
+        return self._span(request)
+
+    def _span(self, request):
+        start, end = request.get("start_date"), request.get("end_date")
+        if start is None or request.get("status") not in ACTIVE_STATUSES:
+            return None
+        return start.toordinal(), (end or start).toordinal()
+
+    def _mark(self, name, span):
+        # Set the days of `span` in the employee's bitset, moving its origin
+        # back when the span starts before it
+        first, last = span
+        origin, bits = self.employee_days.get(name, (first, 0))
+        if first < origin:
+            bits <<= origin - first
+            origin = first
+        self.employee_days[name] = (origin, bits | ((1 << (last - first + 1)) - 1) << (first - origin))
+
+    def _rebuild_employee(self, name):
+        # Requests of one person may overlap, so clearing bits is done by
+        # rebuilding that person's set from their (few) requests
+        self.employee_days.pop(name, None)
+        for request in self.store.for_employee(name):
+            span = self._span(request)
+            if span is not None:
+                self._mark(name, span)
+
+    def _add(self, requests):
+        # New requests only ever set bits. Day counts are collected per
+        # department as a difference array and summed in one pass, so a
+        # batch costs O(requests + days spanned) rather than the total of
+        # each request's days
+        spans = {}
+        for request in requests:
+            name, department = request.get("name"), request.get("department")
+            if department:
+                self.members.setdefault(department, set()).add(name)
+            span = self._span(request)
+            if span is None:
+                continue
+            self._mark(name, span)
+            if department:
+                spans.setdefault(department, []).append(span)
+                self.counted[request["id"]] = (department, span)
+        for department, ranges in spans.items():
+            first = min(start for start, _ in ranges)
+            last = max(end for _, end in ranges)
+            counts = self._ensure(department, first, last)
+            delta = [0] * (last - first + 2)
+            for start, end in ranges:
+                delta[start - first] += 1
+                delta[end - first + 1] -= 1
+            offset = first - self.base
+            running = 0
+            for i in range(last - first + 1):
+                running += delta[i]
+                if running:
+                    counts[offset + i] += running
+
+    def _ensure(self, department, first, last):
+        if self.base is None:
+            self.base = first
+        if first < self.base:
+            grow = self.base - first
+            for counts in self.days_off.values():
+                counts[0:0] = array("i", bytes(grow * counts.itemsize))
+            self.base = first
+        counts = self.days_off.get(department)
+        if counts is None:
+            counts = self.days_off[department] = array("i")
+        needed = last - self.base + 1
+        if len(counts) < needed:
+            counts.extend(array("i", bytes((needed - len(counts)) * counts.itemsize)))
+        return counts
+
+    def _apply(self, department, span, sign):
+        first, last = span
+        counts = self._ensure(department, first, last)
+        for i in range(first - self.base, last - self.base + 1):
+            counts[i] += sign
+
+    def _track(self, request):
+        department = request.get("department")
+        if department:
+            self.members.setdefault(department, set()).add(request.get("name"))
+        span = self._range(request)
+        if span is not None:
+            self._apply(department, span, 1)
+            self.counted[request["id"]] = (department, span)
+
+    def on_change(self, request, previous):
+        with self.lock:
+            if previous is None:
+                self._add((request,))
+                return
+            old = self.counted.pop(request["id"], None)
+            if old is not None:
+                self._apply(old[0], old[1], -1)
+            self._track(request)
+            self._rebuild_employee(request.get("name"))
+            if previous.get("name") not in (None, request.get("name")):
+                self._rebuild_employee(previous["name"])
+
+    def on_batch(self, requests):
+        with self.lock:
+            self._add(requests)
+
+    def on_updates(self, changes):
+        # A batch of decisions often touches the same people many times;
+        # each person's day set is rebuilt once
+        with self.lock:
+            names = set()
+            for request, previous in changes:
+                # Approval steps and re-routing keep a request pending, so
+                # its days off are often unchanged
+                span = self._range(request)
+                if span is not None and "name" not in previous and self.counted.get(request["id"]) == (request.get("department"), span):
+                    continue
+                old = self.counted.pop(request["id"], None)
+                if old is not None:
+                    self._apply(old[0], old[1], -1)
+                self._track(request)
+                names.add(request.get("name"))
+                if previous.get("name") is not None:
+                    names.add(previous["name"])
+            for name in names:
+                self._rebuild_employee(name)
+
+    def headcount(self, department):
+        return self.headcounts.get(department) or len(self.members.get(department, ()))
+
+    def minimum(self, department):
+        return self.minimum_staff.get(department, self.default_minimum)
+
+    def check(self, name, department, start, end, ignore_id=None):
+        # Returns a list of human readable problems; empty means OK
+        problems = []
+        end = end or start
+
+        for request in self.store.for_employee(name):
+            if request["id"] == ignore_id or request.get("status") not in ACTIVE_STATUSES:
+                continue
+            other_start = request.get("start_date")
+            if other_start is None:
+                continue
+            other_end = request.get("end_date") or other_start
+            if other_start <= end and start <= other_end:
+                problems.append(
+                    f"{name} already has {request['type']} leave from "
+                    f"{other_start.strftime('%b %d')} to {other_end.strftime('%b %d, %Y')}"
+                )
+
+        if department:
+            members = self.members.get(department, ())
+            headcount = max(self.headcount(department), len(members) + (name not in members))
+            minimum = self.minimum(department)
+            first, last = start.toordinal(), end.toordinal()
+            with self.lock:
+                counts = self.days_off.get(department) or array("i")
+                # The request being edited does not count against itself
+                ignored = self.counted.get(ignore_id)
+                ignored_first, ignored_last = ignored[1] if ignored and ignored[0] == department else (0, -1)
+                for ordinal in range(first, last + 1):
+                    i = ordinal - self.base if self.base is not None else -1
+                    off = counts[i] if 0 <= i < len(counts) else 0
+                    if ignored_first <= ordinal <= ignored_last:
+                        off -= 1
+                    if headcount - off - 1 < minimum:
+                        day = start + timedelta(days=ordinal - first)
+                        problems.append(
+                            f"{department} would drop below {minimum} staff on "
+                            f"{day.strftime('%b %d, %Y')}"
+                        )
+                        break
+
+        return problems
+
+    def schedule(self, department, start, days):
+        # ([(name, [off on day 0..days-1])] for members off at least once in
+        # the window, [people off per day])
+        first = start.toordinal()
+        mask = (1 << days) - 1
+        rows = []
+        with self.lock:
+            for name in sorted(self.members.get(department, ())):
+                origin, bits = self.employee_days.get(name, (first, 0))
+                shift = first - origin
+                window = (bits >> shift if shift >= 0 else bits << -shift) & mask
+                if window:
+                    rows.append((name, [bool(window >> i & 1) for i in range(days)]))
+
+            counts = self.days_off.get(department) or array("i")
+            totals = []
+            for ordinal in range(first, first + days):
+                i = ordinal - self.base if self.base is not None else -1
+                totals.append(counts[i] if 0 <= i < len(counts) else 0)
+        return rows, totals
@@ -0,0 +1,121 @@
+import json
+import os
+from bisect import bisect_right
+
+
+# Roles that can hold an approval step, with their display names; they are
+# user roles from auth.py
+APPROVER_ROLES = {"manager": "Manager", "hr": "HR"}
+# Stands in for any department or leave type no rule names
+OTHER = object()
+RULE_KEYS = frozenset({"name", "departments", "types", "min_days", "max_days", "steps"})
+
+# First matching rule wins. Days are working days; `steps` are the roles
+# that approve in turn, and no steps means the request is approved as
+# soon as it is submitted.
+DEFAULT_RULES = [
+    {"name": "maternity", "types": ["Maternity"], "steps": ["hr"]},
+    {"name": "long-leave", "min_days": 11, "steps": ["manager", "hr"]},
+    {"name": "short-sick-leave", "types": ["Sick Leave"], "max_days": 1, "steps": []},
+    {"name": "default", "steps": ["manager"]},
+]
+
+
+class Route:
+    # The outcome of routing one request: the rule that matched and the
+    # approval steps it asks for. One instance per rule, shared.
+    __slots__ = ("rule", "steps")
+
+    def __init__(self, rule, steps):
+        self.rule = rule
+        self.steps = tuple(steps)
+
+    @property
+    def auto(self):
+        return not self.steps
+
+    def __repr__(self):
+        return f"Route({self.rule!r}, {self.steps!r})"
+
+
+# Used when no rule matches, so nothing is ever approved by omission
+FALLBACK = Route("fallback", ("manager",))
+
+
+def check_rule(rule):
+    unknown = set(rule) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Rule {rule.get('name')!r}: unknown keys {sorted(unknown)}")
+    if not rule.get("name"):
+        raise ValueError("Every rule needs a name")
+    for role in rule.get("steps", ()):
+        if role not in APPROVER_ROLES:
+            raise ValueError(f"Rule {rule['name']!r}: unknown approver role {role!r}")
+    if "steps" not in rule:
+        raise ValueError(f"Rule {rule['name']!r}: no steps (use [] to approve automatically)")
+    return rule
+
+
+class ApprovalPolicy:
+    # Ordered routing rules, compiled once into a decision table.
+    #
+    # Every (department, leave type) pair that some rule names, plus OTHER
+    # for the rest, gets a cell. A cell holds the day counts where the
+    # first matching rule changes and the route in force from each one on,
+    # so `route` is two dict lookups and a bisect whatever the number of
+    # rules.
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = [check_rule(dict(rule)) for rule in rules]
+        self.routes = [Route(rule["name"], rule["steps"]) for rule in self.rules]
+        self.departments = frozenset(d for rule in self.rules for d in rule.get("departments") or ())
+        self.types = frozenset(t for rule in self.rules for t in rule.get("types") or ())
+        self.table = {}
+        for department in (*self.departments, OTHER):
+            for leave_type in (*self.types, OTHER):
+                candidates = [
+                    i for i, rule in enumerate(self.rules)
+                    if (not rule.get("departments") or department in rule["departments"])
+                    and (not rule.get("types") or leave_type in rule["types"])
+                ]
+                self.table[department, leave_type] = self._cell(candidates)
+
+    def _cell(self, candidates):
+        # ([day counts where the route changes], [route from each on])
+        bounds = [(self.rules[i].get("min_days") or 0, self.rules[i].get("max_days")) for i in candidates]
+        points = sorted({0} | {low for low, _ in bounds} | {high + 1 for _, high in bounds if high is not None})
+        routes = []
+        for days in points:
+            for i, (low, high) in zip(candidates, bounds):
+                if low <= days and (high is None or days <= high):
+                    routes.append(self.routes[i])
+                    break
+            else:
+                routes.append(FALLBACK)
+        return points, routes
+
+    def route(self, department, leave_type, days):
+        points, routes = self.table[
+            department if department in self.departments else OTHER,
+            leave_type if leave_type in self.types else OTHER,
+        ]
+        return routes[max(bisect_right(points, days) - 1, 0)]
+
+
+def load_policy(path):
+    # Rules from policy.json in the data directory, or the defaults
+    policy_path = os.path.join(path, "policy.json")
+    if os.path.exists(policy_path):
+        with open(policy_path, encoding="utf-8") as f:
+            return ApprovalPolicy(json.load(f))
+    return ApprovalPolicy()
+
+
+def save_policy(path, rules):
+    # Checks the rules by compiling them before anything is written
+    policy = ApprovalPolicy(rules)
+    policy_path = os.path.join(path, "policy.json")
+    tmp_path = policy_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(policy.rules, f, indent=2)
+    os.replace(tmp_path, policy_path)
+    return policy
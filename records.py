@@ -0,0 +1,227 @@
+import bisect
+import json
+import sys
+from array import array
+from datetime import date
+
+from dates import to_date
+
+
+# Fields of a leave request, in journal order
+FIELDS = (
+    "id", "name", "type", "department", "start_date", "end_date",
+    "status", "reason", "version", "decided_on", "decided_by",
+    "route", "steps", "level",
+)
+# Low-cardinality text fields; every record shares one string object per value
+INTERNED_FIELDS = frozenset({"name", "type", "department", "status", "decided_on", "decided_by", "route", "steps"})
+DATE_FIELDS = frozenset({"start_date", "end_date"})
+
+_FIELD_SET = frozenset(FIELDS)
+# One date object per distinct day, shared the same way
+_dates = {}
+
+
+class LeaveRequest:
+    # One leave request. Slots instead of a per-request dict keep a record
+    # at a fraction of the size, and interned status, type and department
+    # strings are shared by all records.
+    #
+    # Values are interned when set by key, through the constructor, `update`
+    # or `r[key] = value`; plain attribute assignment skips that.
+    #
+    # Records also answer the read side of the dict protocol (`r["status"]`,
+    # `r.get(...)`, `{**r}`), so store listeners and the journal treat them
+    # like the plain dicts they replace. Fields that are None count as
+    # missing; unknown fields from old journals or imports go in `extra`.
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, **fields):
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.extra = None
+        self.update(fields)
+
+    @classmethod
+    def from_fields(cls, fields):
+        request = cls.__new__(cls)
+        for field in FIELDS:
+            setattr(request, field, None)
+        request.extra = None
+        request.update(fields)
+        return request
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            elif key in DATE_FIELDS and type(value) is date:
+                value = _dates.setdefault(value, value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+        elif self.extra is not None:
+            value = self.extra.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def update(self, fields):
+        # __setitem__ inlined for known fields; every record is built here
+        intern, dates = sys.intern, _dates
+        for key, value in fields.items():
+            if key not in _FIELD_SET:
+                self[key] = value
+                continue
+            kind = type(value)
+            if kind is str and key in INTERNED_FIELDS:
+                value = intern(value)
+            elif kind is date and key in DATE_FIELDS:
+                value = dates.setdefault(value, value)
+            setattr(self, key, value)
+
+    def keys(self):
+        keys = [field for field in FIELDS if getattr(self, field) is not None]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def to_dict(self):
+        # Called for every journal and audit write, so it reads the slots
+        # directly rather than going through keys() and __getitem__
+        fields = {}
+        for field in FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                fields[field] = value
+        if self.extra:
+            fields.update(self.extra)
+        return fields
+
+    def __repr__(self):
+        return f"LeaveRequest({self.to_dict()!r})"
+
+
+class _Vocabulary:
+    # Distinct values of one text column; rows store the value's code
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarArchive:
+    # Closed requests from past years, one typed array per field. A row
+    # costs a few dozen bytes instead of a Python object per record; `get`
+    # rebuilds a LeaveRequest on demand. Rows are kept sorted by id so
+    # lookups are a bisect.
+    TEXT_COLUMNS = ("name", "type", "department", "status", "reason", "decided_by", "route", "steps")
+    DATE_COLUMNS = ("start_date", "end_date", "decided_on")
+    INT_COLUMNS = ("level",)
+    # `extra` is kept as JSON text in one more vocabulary column; most rows
+    # share the same few values, usually none
+    EXTRA_COLUMN = "extra"
+
+    def __init__(self):
+        self.ids = array("q")
+        self.versions = array("I")
+        # Date columns hold ordinals, 0 for no date
+        self.dates = {column: array("i") for column in self.DATE_COLUMNS}
+        # Int columns hold -1 for no value
+        self.ints = {column: array("i") for column in self.INT_COLUMNS}
+        self.text = {column: array("I") for column in (*self.TEXT_COLUMNS, self.EXTRA_COLUMN)}
+        self.vocabularies = {column: _Vocabulary() for column in self.text}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, request_id):
+        return self._row(request_id) is not None
+
+    def _row(self, request_id):
+        if request_id is None:
+            return None
+        i = bisect.bisect_left(self.ids, request_id)
+        if i < len(self.ids) and self.ids[i] == request_id:
+            return i
+        return None
+
+    def extend(self, requests):
+        requests = sorted(requests, key=lambda request: request.id)
+        if not requests:
+            return
+        in_order = not self.ids or requests[0].id > self.ids[-1]
+        for request in requests:
+            self.ids.append(request.id)
+            self.versions.append(request.version or 1)
+            for column in self.DATE_COLUMNS:
+                value = to_date(request.get(column))
+                self.dates[column].append(value.toordinal() if value else 0)
+            for column in self.INT_COLUMNS:
+                value = request.get(column)
+                self.ints[column].append(-1 if value is None else value)
+            for column in self.TEXT_COLUMNS:
+                self.text[column].append(self.vocabularies[column].code(request.get(column)))
+            extra = json.dumps(request.extra, sort_keys=True, separators=(",", ":")) if request.extra else None
+            self.text[self.EXTRA_COLUMN].append(self.vocabularies[self.EXTRA_COLUMN].code(extra))
+        if not in_order:
+            self._sort()
+
+    def _sort(self):
+        order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        self.ids = array("q", (self.ids[i] for i in order))
+        self.versions = array("I", (self.versions[i] for i in order))
+        for columns in (self.dates, self.ints, self.text):
+            for column, values in columns.items():
+                columns[column] = array(values.typecode, (values[i] for i in order))
+
+    def _record(self, i):
+        fields = {"id": self.ids[i], "version": self.versions[i]}
+        for column in self.DATE_COLUMNS:
+            ordinal = self.dates[column][i]
+            fields[column] = date.fromordinal(ordinal) if ordinal else None
+        fields["decided_on"] = fields["decided_on"].isoformat() if fields["decided_on"] else None
+        for column in self.INT_COLUMNS:
+            value = self.ints[column][i]
+            fields[column] = value if value >= 0 else None
+        for column in self.TEXT_COLUMNS:
+            fields[column] = self.vocabularies[column].values[self.text[column][i]]
+        extra = self.vocabularies[self.EXTRA_COLUMN].values[self.text[self.EXTRA_COLUMN][i]]
+        if extra is not None:
+            fields.update(json.loads(extra))
+        return LeaveRequest.from_fields(fields)
+
+    def get(self, request_id):
+        i = self._row(request_id)
+        return self._record(i) if i is not None else None
+
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield self._record(i)
+
+    def nbytes(self):
+        # Size of the column arrays, not counting the vocabularies
+        columns = [self.ids, self.versions, *self.dates.values(), *self.ints.values(), *self.text.values()]
+        return sum(len(values) * values.itemsize for values in columns)
@@ -0,0 +1,181 @@
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; rebuilds fall back to the incremental path
+    np = None
+
+
+class LeaveReports:
+    # Materialized rollups for the /reports page:
+    #   days_by_department[(department, "YYYY-MM")]  approved working days
+    #   decisions_by_type[(leave type, status)]      Approved/Rejected counts
+    #   days_by_week[(iso year, iso week)]           approved working days
+    #
+    # The store listener subtracts a request's old contribution and adds the
+    # new one, so a status change costs O(days in the request). `rebuild`
+    # recomputes everything from columns in one pass, and a batch of added
+    # requests, e.g. an import chunk, is added the same way; with NumPy the
+    # day expansion and grouping are vectorized.
+    def __init__(self, store, workdays):
+        self.store = store
+        self.workdays = workdays
+        self.lock = threading.Lock()
+        self.days_by_department = Counter()
+        self.decisions_by_type = Counter()
+        self.days_by_week = Counter()
+        self.version = 0
+
+        with store.lock:
+            self.rebuild()
+            store.subscribe(self.on_change, self.on_batch, self.on_updates)
+
+    # Incremental path
+
+    def _days(self, request):
+        start = request.get("start_date")
+        if start is None:
+            return
+        end = request.get("end_date") or start
+        day = start
+        while day <= end:
+            if self.workdays.is_working_day(day):
+                yield day
+            day += timedelta(days=1)
+
+    def _apply(self, request, sign):
+        status = request.get("status")
+        if status in ("Approved", "Rejected"):
+            self.decisions_by_type[(request.get("type"), status)] += sign
+        if status != "Approved":
+            return
+        department = request.get("department")
+        for day in self._days(request):
+            self.days_by_department[(department, f"{day.year:04d}-{day.month:02d}")] += sign
+            self.days_by_week[day.isocalendar()[:2]] += sign
+
+    def on_change(self, request, previous):
+        with self.lock:
+            if previous is not None:
+                self._apply({**request, **previous}, -1)
+            self._apply(request, 1)
+            self.version += 1
+
+    def on_updates(self, changes):
+        with self.lock:
+            for request, previous in changes:
+                self._apply({**request, **previous}, -1)
+                self._apply(request, 1)
+            self.version += 1
+
+    # Batch path
+
+    def on_batch(self, requests):
+        with self.lock:
+            self.version += 1
+            if np is None:
+                for request in requests:
+                    self._apply(request, 1)
+                return
+            self._add_columns(requests)
+
+    def rebuild(self, requests=None):
+        if requests is None:
+            requests = list(self.store.requests.values())
+        with self.lock:
+            self.days_by_department.clear()
+            self.decisions_by_type.clear()
+            self.days_by_week.clear()
+            self.version += 1
+            if np is None:
+                for request in requests:
+                    self._apply(request, 1)
+                return
+            self._add_columns(requests)
+
+    def _add_columns(self, requests):
+        # Adds the contributions of `requests` to the rollups
+        for request in requests:
+            status = request.get("status")
+            if status in ("Approved", "Rejected"):
+                self.decisions_by_type[(request.get("type"), status)] += 1
+
+        approved = [
+            r for r in requests
+            if r.get("status") == "Approved" and r.get("start_date") is not None
+        ]
+        if not approved:
+            return
+
+        # Columns: department code, start and end ordinals
+        departments = sorted({r.get("department") or "" for r in approved})
+        department_code = {name: i for i, name in enumerate(departments)}
+        dept = np.fromiter((department_code[r.get("department") or ""] for r in approved), dtype=np.int64, count=len(approved))
+        starts = np.fromiter((r["start_date"].toordinal() for r in approved), dtype=np.int64, count=len(approved))
+        ends = np.fromiter(((r.get("end_date") or r["start_date"]).toordinal() for r in approved), dtype=np.int64, count=len(approved))
+        ends = np.maximum(ends, starts)
+
+        # One row per day of leave
+        lengths = ends - starts + 1
+        day_dept = np.repeat(dept, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        days = np.repeat(starts, lengths) + offsets
+
+        # Working-day flags and month/week labels for the covered span
+        first, last = int(days.min()), int(days.max())
+        span = [date.fromordinal(o) for o in range(first, last + 1)]
+        working = np.fromiter((self.workdays.is_working_day(d) for d in span), dtype=bool, count=len(span))
+        month_keys = sorted({(d.year, d.month) for d in span})
+        month_code = {key: i for i, key in enumerate(month_keys)}
+        week_keys = sorted({d.isocalendar()[:2] for d in span})
+        week_code = {key: i for i, key in enumerate(week_keys)}
+        day_month = np.fromiter((month_code[(d.year, d.month)] for d in span), dtype=np.int64, count=len(span))
+        day_week = np.fromiter((week_code[d.isocalendar()[:2]] for d in span), dtype=np.int64, count=len(span))
+
+        index = days - first
+        keep = working[index]
+        index, day_dept = index[keep], day_dept[keep]
+
+        by_dept_month = np.bincount(
+            day_dept * len(month_keys) + day_month[index],
+            minlength=len(departments) * len(month_keys),
+        )
+        for flat in np.flatnonzero(by_dept_month):
+            d, m = divmod(int(flat), len(month_keys))
+            year, month = month_keys[m]
+            self.days_by_department[(departments[d] or None, f"{year:04d}-{month:02d}")] += int(by_dept_month[flat])
+
+        by_week = np.bincount(day_week[index], minlength=len(week_keys))
+        for w in np.flatnonzero(by_week):
+            self.days_by_week[week_keys[int(w)]] += int(by_week[w])
+
+    # Queries
+
+    def department_months(self, months):
+        # {department: [days per month]} for the given "YYYY-MM" labels
+        with self.lock:
+            departments = sorted({d for d, _ in self.days_by_department if d})
+            return {
+                department: [self.days_by_department.get((department, month), 0) for month in months]
+                for department in departments
+            }
+
+    def rejection_rates(self):
+        # {leave type: (rejected, decided, rate)}
+        with self.lock:
+            types = sorted({t for t, _ in self.decisions_by_type if t})
+            result = {}
+            for leave_type in types:
+                rejected = self.decisions_by_type.get((leave_type, "Rejected"), 0)
+                decided = rejected + self.decisions_by_type.get((leave_type, "Approved"), 0)
+                result[leave_type] = (rejected, decided, rejected / decided if decided else 0.0)
+            return result
+
+    def peak_weeks(self, count=5):
+        with self.lock:
+            return sorted(
+                ((week, days) for week, days in self.days_by_week.items() if days > 0),
+                key=lambda item: -item[1],
+            )[:count]
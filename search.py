@@ -0,0 +1,99 @@
+import bisect
+import heapq
+import threading
+
+
+def tokenize(text):
+    return (text or "").lower().split()
+
+
+class RequestSearch:
+    # Employee-name search over the store. Names are indexed per token in a
+    # sorted token list, so a prefix is a bisect range. Matching names are
+    # mapped to their request ids through the store's employee index and
+    # filtered against the status posting list, newest first.
+    #
+    # Results are produced lazily so a keystroke only pays for the rows that
+    # are actually shown.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.tokens = []
+        self.names_by_token = {}
+
+        with store.lock:
+            for name in store.by_employee:
+                self._add_name(name)
+            store.subscribe(self.on_change, self.on_batch, self.on_updates)
+
+    def _add_name(self, name):
+        for token in tokenize(name):
+            names = self.names_by_token.get(token)
+            if names is None:
+                names = self.names_by_token[token] = set()
+                bisect.insort(self.tokens, token)
+            names.add(name)
+
+    def on_change(self, request, previous):
+        # Names are never removed; a stale name just yields no requests
+        if previous is None or "name" in previous:
+            with self.lock:
+                self._add_name(request.get("name"))
+
+    def on_batch(self, requests):
+        # An import brings many requests per person; each name is indexed once
+        names = {request.get("name") for request in requests}
+        with self.lock:
+            for name in names:
+                self._add_name(name)
+
+    def on_updates(self, changes):
+        # Decisions do not rename anyone, so a batch of them is skipped whole
+        names = {request.get("name") for request, previous in changes if "name" in previous}
+        if names:
+            with self.lock:
+                for name in names:
+                    self._add_name(name)
+
+    def match_names(self, query):
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return None
+
+        matched = None
+        with self.lock:
+            for prefix in query_tokens:
+                names = set()
+                lo = bisect.bisect_left(self.tokens, prefix)
+                hi = bisect.bisect_left(self.tokens, prefix + "\uffff", lo)
+                for token in self.tokens[lo:hi]:
+                    names |= self.names_by_token[token]
+                matched = names if matched is None else matched & names
+                if not matched:
+                    break
+        return matched
+
+    def query(self, text="", status=None):
+        # Returns an iterator of request ids, newest first. Index buckets are
+        # in insertion order, and a status change appends a request to its
+        # new bucket, so each run is sorted (cheaply, being nearly sorted)
+        # before the merge.
+        names = self.match_names(text)
+
+        with self.store.lock:
+            if names is None:
+                if status is None:
+                    return iter(self.store.ids(newest_first=True))
+                return iter(sorted(self.store.by_status.get(status, ()), reverse=True))
+
+            status_ids = self.store.by_status.get(status, {}) if status else None
+            runs = []
+            for name in names:
+                ids = list(self.store.by_employee.get(name, ()))
+                if status_ids is not None:
+                    ids = [i for i in ids if i in status_ids]
+                if ids:
+                    ids.sort(reverse=True)
+                    runs.append(ids)
+
+        return heapq.merge(*runs, reverse=True)
@@ -0,0 +1,359 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from records import LeaveRequest
+from store import InvalidTransition, LeaveStore, StaleRequest, TRANSITIONS, _archivable, _decode_dates, _dumps, _record
+
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS requests (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, id INTEGER NOT NULL, fields TEXT NOT NULL)",
+    # Decided requests of past years, moved out of `requests` by `archive`
+    "CREATE TABLE IF NOT EXISTS archive (id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+)
+# Statements are plain constants with ? parameters, so every pooled
+# connection compiles each one once and reuses it from its statement cache
+SELECT_ALL = "SELECT data FROM requests"
+SELECT_REQUEST = "SELECT version, data FROM requests WHERE id = ?"
+SELECT_ARCHIVE = "SELECT data FROM archive ORDER BY id"
+# Archived ids are never handed out again
+SELECT_MAX_ID = "SELECT MAX((SELECT COALESCE(MAX(id), 0) FROM requests), (SELECT COALESCE(MAX(id), 0) FROM archive))"
+SELECT_LAST_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM changes"
+SELECT_CHANGES = "SELECT seq, op, id, fields FROM changes WHERE seq > ? ORDER BY seq"
+INSERT_REQUEST = "INSERT INTO requests (id, version, data) VALUES (?, ?, ?)"
+UPDATE_REQUEST = "UPDATE requests SET version = ?, data = ? WHERE id = ?"
+INSERT_CHANGE = "INSERT INTO changes (op, id, fields) VALUES (?, ?, ?)"
+INSERT_ARCHIVE = "INSERT INTO archive (id, data) VALUES (?, ?)"
+DELETE_REQUEST = "DELETE FROM requests WHERE id = ?"
+PRUNE_CHANGES = "DELETE FROM changes WHERE seq <= ?"
+
+# Changes kept in the feed after pruning; a worker that falls further
+# behind than this would miss updates, which at the poll interval below
+# takes far longer than any stall we expect
+CHANGE_RETENTION = 100_000
+
+
+class ConnectionPool:
+    # A fixed set of SQLite connections shared by threads. `connection()`
+    # blocks while all of them are in use. Inside a transaction, a thread's
+    # `connection()` and `transaction()` calls get the transaction's own
+    # connection, so they see its writes and join it.
+    def __init__(self, path, size=4, timeout=30.0):
+        self.idle = queue.LifoQueue()
+        self.local = threading.local()
+        self.connections = []
+        for _ in range(size):
+            db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False, cached_statements=64)
+            db.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints and still survives
+            # an application crash
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.connections.append(db)
+            self.idle.put(db)
+
+    def in_transaction(self):
+        return getattr(self.local, "db", None) is not None
+
+    @contextmanager
+    def connection(self):
+        if self.in_transaction():
+            yield self.local.db
+            return
+        db = self.idle.get()
+        try:
+            yield db
+        finally:
+            self.idle.put(db)
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock up front, so a
+        # read-check-write sequence cannot interleave with another worker's
+        if self.in_transaction():
+            yield self.local.db
+            return
+        with self.connection() as db:
+            db.execute("BEGIN IMMEDIATE")
+            self.local.db = db
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            else:
+                db.execute("COMMIT")
+            finally:
+                self.local.db = None
+
+    def close(self):
+        for db in self.connections:
+            db.close()
+
+
+class SqliteStore(LeaveStore):
+    # LeaveStore backed by one SQLite database in WAL mode, shared by
+    # several worker processes.
+    #
+    # Each process keeps the usual in-memory maps, indexes and listeners.
+    # Writes go to the database first: the row in `requests` plus an entry
+    # in the `changes` feed, in one transaction. `sync` then applies every
+    # feed entry past the last one seen, in commit order, through the same
+    # listeners a local write would fire. A follower thread watches
+    # `PRAGMA data_version` and syncs whenever another worker commits, so
+    # sessions on every worker see every change.
+    #
+    # `archive` moves rows to the `archive` table and announces them in the
+    # feed, so every worker drops them from memory together.
+    def __init__(self, path="data", snapshot_every=10000, pool_size=4, poll_interval=0.05):
+        self.db_path = os.path.join(path, "leave.db")
+        self.pool_size = pool_size
+        self.poll_interval = poll_interval
+        self.seen = 0
+        self.writes = 0
+        self.stopped = threading.Event()
+        super().__init__(path, snapshot_every)
+        self.follower = threading.Thread(target=self._follow, name="sqlite-follower", daemon=True)
+        self.follower.start()
+
+    # Loading
+
+    def _load(self):
+        self.pool = ConnectionPool(self.db_path, self.pool_size)
+        with self.pool.connection() as db:
+            for statement in SCHEMA:
+                db.execute(statement)
+            # One read transaction, so the rows and the feed position match
+            db.execute("BEGIN")
+            try:
+                self.archived.extend(_record(json.loads(data)) for (data,) in db.execute(SELECT_ARCHIVE))
+                for (data,) in db.execute(SELECT_ALL):
+                    self._put(_record(json.loads(data)))
+                self.seen = db.execute(SELECT_LAST_SEQ).fetchone()[0]
+            finally:
+                db.execute("COMMIT")
+        self._build_indexes()
+
+    def _follow(self):
+        watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            version = None
+            while not self.stopped.wait(self.poll_interval):
+                current = watcher.execute("PRAGMA data_version").fetchone()[0]
+                if current != version:
+                    version = current
+                    self.sync()
+        finally:
+            watcher.close()
+
+    # Change feed
+
+    def sync(self):
+        # Apply every change committed since the last sync, ours and other
+        # workers', in commit order
+        with self.lock:
+            with self.pool.connection() as db:
+                rows = db.execute(SELECT_CHANGES, (self.seen,)).fetchall()
+            # Runs of adds and of updates are each notified as one batch.
+            # Archiving notifies nothing, as with the JSONL store.
+            added, updated, archived = [], [], []
+            for seq, op, request_id, fields in rows:
+                if op == "archive":
+                    request = self.requests.pop(request_id, None)
+                    if request is not None:
+                        self._unindex(request)
+                        archived.append(request)
+                elif op == "add":
+                    if updated:
+                        self._notify_updated(updated)
+                        updated = []
+                    request = _record(json.loads(fields))
+                    self._put(request)
+                    self._index(request)
+                    added.append(request)
+                else:
+                    if added:
+                        self._notify_added(added)
+                        added = []
+                    request = self.requests.get(request_id)
+                    if request is not None:
+                        fields = _decode_dates(json.loads(fields))
+                        previous = {key: request.get(key) for key in fields}
+                        self._change_fields(request, fields)
+                        updated.append((request, previous))
+                self.seen = seq
+            if added:
+                self._notify_added(added)
+            if updated:
+                self._notify_updated(updated)
+            if archived:
+                self.archived.extend(archived)
+
+    def _wrote(self, count):
+        # A checkpoint cannot run inside a transaction; the next write
+        # outside one compacts instead
+        self.writes += count
+        if self.writes >= self.snapshot_every and not self.pool.in_transaction():
+            self.writes = 0
+            self.compact()
+
+    def compact(self):
+        # Trim the feed and fold the WAL back into the database file
+        with self.pool.transaction() as db:
+            last = db.execute(SELECT_LAST_SEQ).fetchone()[0]
+            db.execute(PRUNE_CHANGES, (last - CHANGE_RETENTION,))
+        with self.pool.connection() as db:
+            db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        self.stopped.set()
+        self.follower.join()
+        with self.lock:
+            self.pool.close()
+
+    def archive(self, before):
+        # See LeaveStore.archive. Rows are picked from memory and checked
+        # again against the database, where another worker may have
+        # changed them since.
+        with self.lock:
+            candidates = [request.id for request in self.requests.values() if _archivable(request, before)]
+        if not candidates:
+            return 0
+        with self.pool.transaction() as db:
+            moved = []
+            for request_id in candidates:
+                row = db.execute(SELECT_REQUEST, (request_id,)).fetchone()
+                if row is not None and _archivable(_record(json.loads(row[1])), before):
+                    moved.append((request_id, row[1]))
+            db.executemany(INSERT_ARCHIVE, moved)
+            db.executemany(DELETE_REQUEST, [(request_id,) for request_id, _ in moved])
+            db.executemany(INSERT_CHANGE, [("archive", request_id, "{}") for request_id, _ in moved])
+        self.sync()
+        return len(moved)
+
+    # Writes
+
+    def add(self, fields):
+        return self.add_many([fields])[0]
+
+    def add_many(self, rows):
+        added = []
+        for fields in rows:
+            request = fields if isinstance(fields, LeaveRequest) else _record(dict(fields))
+            if request.status is None:
+                request.status = "Pending"
+            request.version = 1
+            added.append(request)
+        if not added:
+            return []
+        # Ids come from the database, under its write lock, so workers never
+        # hand out the same one
+        with self.pool.transaction() as db:
+            next_id = db.execute(SELECT_MAX_ID).fetchone()[0] + 1
+            rows = []
+            for request in added:
+                request.id = next_id
+                next_id += 1
+                rows.append((request.id, _dumps(request)))
+            db.executemany(INSERT_REQUEST, [(request_id, 1, data) for request_id, data in rows])
+            db.executemany(INSERT_CHANGE, [("add", request_id, data) for request_id, data in rows])
+        self.sync()
+        self._wrote(len(added))
+        return [self.requests[request.id] for request in added]
+
+    def update(self, request_id, **fields):
+        return self._change(request_id, fields)
+
+    def transition(self, request_id, status, expected_version=None, **fields):
+        return self._change(request_id, fields, status, expected_version)
+
+    def _change(self, request_id, fields, status=None, expected_version=None):
+        # Checked against the database row rather than the in-memory copy,
+        # which may lag behind another worker's write
+        fields = json.loads(_dumps(fields))
+        with self.pool.transaction() as db:
+            row = db.execute(SELECT_REQUEST, (request_id,)).fetchone()
+            if row is None:
+                raise KeyError(request_id)
+            version, data = row
+            current = json.loads(data)
+            if expected_version is not None and version != expected_version:
+                raise StaleRequest(
+                    f"Request {request_id} was changed by someone else "
+                    f"(now {current['status']})"
+                )
+            if status is not None:
+                if status not in TRANSITIONS.get(current["status"], ()):
+                    raise InvalidTransition(
+                        f"Cannot change request {request_id} from {current['status']} to {status}"
+                    )
+                fields["status"] = status
+            fields["version"] = version + 1
+            current.update(fields)
+            db.execute(UPDATE_REQUEST, (version + 1, _dumps(current), request_id))
+            db.execute(INSERT_CHANGE, ("update", request_id, _dumps(fields)))
+        self.sync()
+        self._wrote(1)
+        return self.requests[request_id]
+
+    def transition_many(self, request_ids, status, expected=None, **fields):
+        # One transaction for the whole batch; see LeaveStore.transition_many
+        request_ids = list(dict.fromkeys(request_ids))
+        fields = json.loads(_dumps(fields))
+        changed, skipped = [], []
+        with self.pool.transaction() as db:
+            updates, feed = [], []
+            for request_id in request_ids:
+                row = db.execute(SELECT_REQUEST, (request_id,)).fetchone()
+                current = json.loads(row[1]) if row is not None else None
+                if (
+                    current is None
+                    or status not in TRANSITIONS.get(current["status"], ())
+                    or (expected is not None and row[0] != expected.get(request_id))
+                ):
+                    skipped.append(request_id)
+                    continue
+                update = dict(fields, status=status, version=row[0] + 1)
+                current.update(update)
+                updates.append((row[0] + 1, _dumps(current), request_id))
+                feed.append(("update", request_id, _dumps(update)))
+                changed.append(request_id)
+            db.executemany(UPDATE_REQUEST, updates)
+            db.executemany(INSERT_CHANGE, feed)
+        self.sync()
+        self._wrote(len(changed))
+        return [self.requests[request_id] for request_id in changed], skipped
+
+    def guarded_write(self, check, write):
+        # See LeaveStore.guarded_write. Here the check runs inside the
+        # write's BEGIN IMMEDIATE transaction, after catching up with the
+        # feed, so it sees every worker's committed writes and no other
+        # worker can write until this one commits.
+        with self.lock, self.pool.transaction():
+            self.sync()
+            problems = check()
+            if problems:
+                return None, problems
+            return write(), []
+
+    def seed(self, requests):
+        # Checked and written in one transaction, so workers starting
+        # together seed only once
+        with self.pool.transaction() as db:
+            if db.execute(SELECT_MAX_ID).fetchone()[0]:
+                return
+            next_id = 1
+            for fields in requests:
+                request = _record(dict(fields))
+                request.id = next_id
+                request.version = 1
+                if request.status is None:
+                    request.status = "Pending"
+                next_id += 1
+                data = _dumps(request)
+                db.execute(INSERT_REQUEST, (request.id, 1, data))
+                db.execute(INSERT_CHANGE, ("add", request.id, data))
+        self.sync()
@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+from datetime import date
+
+
+class DashboardStats:
+    # Counters behind the home dashboard. They are filled with one pass over
+    # the store at startup and then kept current by the store's change
+    # listener, so reading them never walks the requests. Upcoming leave is
+    # answered by the interval index in `calendar`.
+    UPCOMING_DAYS = 30
+
+    def __init__(self, store, calendar):
+        self.calendar = calendar
+        self.lock = threading.Lock()
+        self.by_status = Counter()
+        self.approved_by_day = Counter()
+        self.version = 0
+
+        with store.lock:
+            for request in store.requests.values():
+                self._count(request, 1)
+            store.subscribe(self.on_change, self.on_batch, self.on_updates)
+
+    def _count(self, request, sign):
+        status = request.get("status")
+        self.by_status[status] += sign
+        if status == "Approved":
+            decided_on = request.get("decided_on")
+            if decided_on:
+                self.approved_by_day[decided_on] += sign
+
+    def on_change(self, request, previous):
+        with self.lock:
+            if previous is not None:
+                self._count({**request, **previous}, -1)
+            self._count(request, 1)
+            self.version += 1
+
+    def on_batch(self, requests):
+        with self.lock:
+            for request in requests:
+                self._count(request, 1)
+            self.version += 1
+
+    def on_updates(self, changes):
+        with self.lock:
+            for request, previous in changes:
+                self._count({**request, **previous}, -1)
+                self._count(request, 1)
+            self.version += 1
+
+    @property
+    def pending(self):
+        return self.by_status["Pending"]
+
+    @property
+    def approved_today(self):
+        return self.approved_by_day[date.today().isoformat()]
+
+    @property
+    def upcoming(self):
+        # Approved leave starting within the next UPCOMING_DAYS days
+        return self.calendar.count_upcoming(self.UPCOMING_DAYS)
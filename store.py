@@ -0,0 +1,488 @@
+import json
+import os
+import threading
+from datetime import date
+
+from dates import parse_date_range, to_date
+from records import ColumnarArchive, LeaveRequest
+
+
+# Sample requests used to seed an empty store on first run
+SEED_REQUESTS = [
+    {
+        "name": "Liam Johnson",
+        "type": "Vacation",
+        "department": "Design Department",
+        "start_date": date(2024, 3, 10),
+        "end_date": date(2024, 3, 15),
+        "status": "Pending",
+        "reason": "Family vacation"
+    },
+    {
+        "name": "Olivia Chen",
+        "type": "Sick Leave",
+        "department": "Engineering",
+        "start_date": date(2024, 3, 12),
+        "end_date": date(2024, 3, 12),
+        "status": "Approved",
+        "reason": "Medical appointment"
+    },
+    {
+        "name": "Noah Patel",
+        "type": "Maternity",
+        "department": "Marketing",
+        "start_date": date(2024, 4, 1),
+        "end_date": date(2024, 6, 30),
+        "status": "Rejected",
+        "reason": "Maternity leave for childbirth"
+    },
+    {
+        "name": "Emma Rodriguez",
+        "type": "Annual Vacation",
+        "department": "Human Resources",
+        "start_date": date(2024, 3, 20),
+        "end_date": date(2024, 3, 28),
+        "status": "Approved",
+        "reason": "Annual vacation with family"
+    }
+]
+
+
+DATE_FIELDS = ("start_date", "end_date")
+
+# Allowed status changes; anything else is rejected by `transition`
+# Pending -> Pending records one approval step of a multi-level route
+TRANSITIONS = {
+    "Pending": ("Pending", "Approved", "Rejected"),
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+class StaleRequest(Exception):
+    # The request changed since the caller read it
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, LeaveRequest):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode_dates(fields):
+    # Dates are journaled as ISO strings and held in memory as `date`.
+    # Records written before structured dates only carry a display string.
+    if "dates" in fields and "start_date" not in fields:
+        fields["start_date"], fields["end_date"] = parse_date_range(fields.pop("dates"))
+    for key in DATE_FIELDS:
+        if key in fields:
+            fields[key] = to_date(fields[key])
+    return fields
+
+
+def _record(fields):
+    return LeaveRequest.from_fields(_decode_dates(fields))
+
+
+def _archivable(request, before):
+    # Decided, and over before `before`
+    return (
+        request.status in ("Approved", "Rejected")
+        and (request.end_date or request.start_date or before) < before
+    )
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_encode_value)
+_dumps = _encoder.encode
+
+
+class LeaveStore:
+    # Leave requests live in memory keyed by id. Every change is appended to
+    # a JSONL journal; once the journal grows past `snapshot_every` entries
+    # (and past the number of requests) it is folded into a compacted
+    # snapshot and truncated.
+    #
+    # Secondary indexes map a field value to an insertion-ordered dict of
+    # request ids, so lookups are O(1) and status changes only touch the two
+    # affected buckets.
+    INDEXED_FIELDS = {
+        "name": "by_employee",
+        "status": "by_status",
+        "type": "by_type",
+        "department": "by_department",
+    }
+
+    def __init__(self, path="data", snapshot_every=10000):
+        self.path = path
+        self.journal_path = os.path.join(path, "journal.jsonl")
+        self.snapshot_path = os.path.join(path, "snapshot.jsonl")
+        self.archive_path = os.path.join(path, "archive.jsonl")
+        self.snapshot_every = snapshot_every
+
+        self.requests = {}
+        # Decided requests of past years, moved out of memory by `archive`
+        self.archived = ColumnarArchive()
+        self.by_employee = {}
+        self.by_status = {}
+        self.by_type = {}
+        self.by_department = {}
+        self.next_id = 1
+        self.journal_entries = 0
+
+        self.lock = threading.RLock()
+        # Striped per-request locks so decisions on different requests do not
+        # wait on each other; the store lock is only held for the write itself
+        self.request_locks = [threading.Lock() for _ in range(64)]
+        # Serializes guarded writes, see `guarded_write`
+        self.guard_lock = threading.Lock()
+        self.listeners = []
+        self._journal = None
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # Loading
+
+    def _load(self):
+        if os.path.exists(self.archive_path):
+            with open(self.archive_path, encoding="utf-8") as f:
+                self.archived.extend(
+                    _record(json.loads(line)) for line in f if line.strip()
+                )
+            if len(self.archived):
+                self.next_id = self.archived.ids[-1] + 1
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._put(_record(json.loads(line)))
+
+        if os.path.exists(self.journal_path):
+            good = 0
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError("no line end")
+                            entry = json.loads(line)
+                        except ValueError:
+                            # A torn last line from a crash mid-write; cut it
+                            # off so the next entry starts on a clean line
+                            break
+                        self._apply(entry)
+                        self.journal_entries += 1
+                    good += len(line)
+            if good != os.path.getsize(self.journal_path):
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good)
+
+        # A crash between writing the archive and the next snapshot leaves
+        # archived requests in the snapshot too; the archive wins
+        if len(self.archived):
+            for request_id in [i for i in self.requests if i in self.archived]:
+                del self.requests[request_id]
+
+        self._build_indexes()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _put(self, request):
+        self.requests[request["id"]] = request
+        if request["id"] >= self.next_id:
+            self.next_id = request["id"] + 1
+
+    def _apply(self, entry):
+        # Replay only touches the primary map; indexes are built once at the end
+        op = entry["op"]
+        if op == "add":
+            self._put(_record(entry["request"]))
+        elif op == "update":
+            request = self.requests.get(entry["id"])
+            if request is not None:
+                request.update(_decode_dates(entry["fields"]))
+
+    def _build_indexes(self):
+        for field, attr in self.INDEXED_FIELDS.items():
+            index = getattr(self, attr)
+            index.clear()
+            for request_id, request in self.requests.items():
+                index.setdefault(request.get(field), {})[request_id] = None
+
+    def _index(self, request):
+        for field, attr in self.INDEXED_FIELDS.items():
+            getattr(self, attr).setdefault(request.get(field), {})[request["id"]] = None
+
+    def _unindex(self, request):
+        for field, attr in self.INDEXED_FIELDS.items():
+            bucket = getattr(self, attr).get(request.get(field))
+            if bucket is not None:
+                bucket.pop(request["id"], None)
+
+    def _change_fields(self, request, fields):
+        # Apply `fields` and move the request only between the index buckets
+        # of indexed fields whose value changes, so buckets it stays in keep
+        # their id order
+        for field, attr in self.INDEXED_FIELDS.items():
+            if field in fields and fields[field] != request.get(field):
+                index = getattr(self, attr)
+                bucket = index.get(request.get(field))
+                if bucket is not None:
+                    bucket.pop(request["id"], None)
+                index.setdefault(fields[field], {})[request["id"]] = None
+        request.update(fields)
+
+    # Journal
+
+    def _write(self, *entries):
+        for entry in entries:
+            self._journal.write(_dumps(entry) + "\n")
+        self._journal.flush()
+        self.journal_entries += len(entries)
+        # Compacting only once the journal outgrows the store keeps the
+        # snapshot cost amortized O(1) per write, even during bulk imports
+        if self.journal_entries >= max(self.snapshot_every, len(self.requests)):
+            self.compact()
+
+    def compact(self):
+        with self.lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for request in self.requests.values():
+                    f.write(_dumps(request) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            self._journal.close()
+            self._journal = open(self.journal_path, "w", encoding="utf-8")
+            self.journal_entries = 0
+
+    def close(self):
+        with self.lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def archive(self, before):
+        # Move decided requests that ended before `before` out of the live
+        # maps into the columnar archive. They stay readable through `get`
+        # but drop out of the indexes, search and the rollups rebuilt at the
+        # next start. Returns the number of requests moved.
+        with self.lock:
+            moved = [request for request in self.requests.values() if _archivable(request, before)]
+            if not moved:
+                return 0
+            with open(self.archive_path, "a", encoding="utf-8") as f:
+                for request in moved:
+                    f.write(_dumps(request) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.archived.extend(moved)
+            for request in moved:
+                self._unindex(request)
+                del self.requests[request.id]
+            self.compact()
+            return len(moved)
+
+    # Change listeners
+
+    def subscribe(self, listener, on_batch=None, on_updates=None):
+        # listener(request, previous) is called under the store lock after
+        # every write; `previous` holds the old values of the changed fields
+        # and is None for newly added requests. Bulk inserts call
+        # on_batch(requests) once instead, when given, and bulk decisions
+        # call on_updates([(request, previous), ...]).
+        self.listeners.append((listener, on_batch, on_updates))
+
+    def _notify(self, request, previous):
+        for listener, _, _ in self.listeners:
+            listener(request, previous)
+
+    def _notify_added(self, requests):
+        for listener, on_batch, _ in self.listeners:
+            if on_batch is not None:
+                on_batch(requests)
+            else:
+                for request in requests:
+                    listener(request, None)
+
+    def _notify_updated(self, changes):
+        for listener, _, on_updates in self.listeners:
+            if on_updates is not None:
+                on_updates(changes)
+            else:
+                for request, previous in changes:
+                    listener(request, previous)
+
+    # Writes
+
+    def _new_request(self, fields):
+        if isinstance(fields, LeaveRequest):
+            request = fields
+        else:
+            request = _record(dict(fields))
+        request.id = self.next_id
+        if request.status is None:
+            request.status = "Pending"
+        request.version = 1
+        self._put(request)
+        self._index(request)
+        return request
+
+    def add(self, fields):
+        with self.lock:
+            request = self._new_request(fields)
+            self._write({"op": "add", "request": request})
+            self._notify(request, None)
+            return request
+
+    def add_many(self, rows):
+        # One lock hold, one journal flush and one batch notification for
+        # the whole chunk
+        with self.lock:
+            added = [self._new_request(fields) for fields in rows]
+            if added:
+                self._write(*({"op": "add", "request": request} for request in added))
+                self._notify_added(added)
+            return added
+
+    def update(self, request_id, **fields):
+        with self._request_lock(request_id):
+            return self._update(request_id, fields)
+
+    def _request_lock(self, request_id):
+        return self.request_locks[request_id % len(self.request_locks)]
+
+    def _update(self, request_id, fields):
+        with self.lock:
+            request = self.requests[request_id]
+            fields = _decode_dates(fields)
+            fields["version"] = request.get("version", 1) + 1
+            previous = {key: request.get(key) for key in fields}
+            self._change_fields(request, fields)
+            self._write({"op": "update", "id": request_id, "fields": fields})
+            self._notify(request, previous)
+            return request
+
+    def transition(self, request_id, status, expected_version=None, **fields):
+        # Move a request to `status`. With `expected_version` this is a
+        # compare-and-set: if anyone changed the request since the caller
+        # read it, StaleRequest is raised and nothing is written.
+        with self._request_lock(request_id):
+            request = self.requests.get(request_id)
+            if request is None:
+                raise KeyError(request_id)
+            if expected_version is not None and request.get("version", 1) != expected_version:
+                raise StaleRequest(
+                    f"Request {request_id} was changed by someone else "
+                    f"(now {request['status']})"
+                )
+            if status not in TRANSITIONS.get(request["status"], ()):
+                raise InvalidTransition(
+                    f"Cannot change request {request_id} from {request['status']} to {status}"
+                )
+            return self._update(request_id, dict(fields, status=status))
+
+    def transition_many(self, request_ids, status, expected=None, **fields):
+        # Move many requests to `status` at once: one lock hold, one journal
+        # flush and one batch notification. Requests that are gone or can no
+        # longer move to `status` are skipped, and so are those whose version
+        # differs from the one in `expected` (id -> version), if given.
+        # Returns (changed requests, skipped ids).
+        request_ids = list(dict.fromkeys(request_ids))
+        # Take the stripes in a fixed order so two batches cannot deadlock,
+        # and so a single `transition` cannot decide a request mid-batch
+        stripes = sorted({request_id % len(self.request_locks) for request_id in request_ids})
+        locks = [self.request_locks[i] for i in stripes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            with self.lock:
+                changed, skipped, entries, changes = [], [], [], []
+                for request_id in request_ids:
+                    request = self.requests.get(request_id)
+                    if (
+                        request is None
+                        or status not in TRANSITIONS.get(request.status, ())
+                        or (expected is not None and request.get("version", 1) != expected.get(request_id))
+                    ):
+                        skipped.append(request_id)
+                        continue
+                    update = _decode_dates(dict(fields, status=status))
+                    update["version"] = request.get("version", 1) + 1
+                    previous = {key: request.get(key) for key in update}
+                    self._change_fields(request, update)
+                    entries.append({"op": "update", "id": request_id, "fields": update})
+                    changes.append((request, previous))
+                    changed.append(request)
+                if entries:
+                    self._write(*entries)
+                    self._notify_updated(changes)
+                return changed, skipped
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def guarded_write(self, check, write):
+        # Run write() only if check() finds no problems, with no other
+        # guarded write in between, so two writes that are each fine alone
+        # cannot both pass. Returns (write() result, []) or (None, problems).
+        with self.guard_lock:
+            problems = check()
+            if problems:
+                return None, problems
+            return write(), []
+
+    def seed(self, requests):
+        # Only a store that never held a request is seeded; one whose
+        # requests were all archived is not empty
+        with self.lock:
+            if self.next_id == 1:
+                for fields in requests:
+                    self.add(fields)
+
+    # Reads
+
+    def get(self, request_id):
+        request = self.requests.get(request_id)
+        if request is None and len(self.archived):
+            return self.archived.get(request_id)
+        return request
+
+    def __len__(self):
+        return len(self.requests)
+
+    def all(self):
+        return list(self.requests.values())
+
+    def ids(self, newest_first=False):
+        with self.lock:
+            if newest_first:
+                return list(reversed(self.requests))
+            return list(self.requests)
+
+    def _lookup(self, index, value):
+        # Under the lock: writers on other threads resize these dicts
+        with self.lock:
+            return [self.requests[i] for i in index.get(value, ())]
+
+    def for_employee(self, name):
+        return self._lookup(self.by_employee, name)
+
+    def with_status(self, status):
+        return self._lookup(self.by_status, status)
+
+    def of_type(self, leave_type):
+        return self._lookup(self.by_type, leave_type)
+
+    def in_department(self, department):
+        return self._lookup(self.by_department, department)
+
+    def count(self, status):
+        return len(self.by_status.get(status, ()))
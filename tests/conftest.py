@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def open_app(tmp_path):
+    # Starts LeaveRequestApp instances on one data directory and shuts
+    # their background threads down afterwards
+    from main import LeaveRequestApp
+
+    apps = []
+
+    def start(**options):
+        app = LeaveRequestApp(str(tmp_path), **options)
+        apps.append(app)
+        return app
+
+    yield start
+    for app in apps:
+        app.broker.close()
+        app.notifier.close()
+        app.audit.close()
+        app.workers.shutdown()
+        app.auth.executor.shutdown(wait=False)
+        app.store.close()
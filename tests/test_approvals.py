@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+
+import pytest
+
+from records import LeaveRequest
+from store import InvalidTransition, StaleRequest
+
+MANAGER = "joynadu@management.com"
+HR = "hr@management.com"
+
+
+def next_monday(days_ahead):
+    day = date.today() + timedelta(days=days_ahead)
+    return day + timedelta(days=-day.weekday() % 7)
+
+
+def leave(name, start, working_days=1, type="Vacation"):
+    end = start
+    for _ in range(working_days - 1):
+        end += timedelta(days=3 if end.weekday() == 4 else 1)
+    return LeaveRequest(name=name, type=type, department="Finance", start_date=start, end_date=end, reason="Trip")
+
+
+def test_nobody_decides_their_own_leave(open_app):
+    app = open_app()
+    own, _ = app.submit_request(leave("Joy Nadu", next_monday(30)))
+    other, _ = app.submit_request(leave("Liam Johnson", next_monday(30)))
+    assert app.waiting_for(own) == "manager"
+    assert not app.can_approve(MANAGER, own)
+    assert app.can_approve(MANAGER, other)
+
+    with pytest.raises(InvalidTransition):
+        app.decide_request(own.id, "Approved", MANAGER)
+    changed, skipped = app.decide_requests([own.id, other.id], "Approved", MANAGER)
+    assert [r.id for r in changed] == [other.id] and skipped == [own.id]
+    assert app.store.get(own.id).status == "Pending"
+
+
+def test_long_leave_needs_the_manager_then_hr(open_app):
+    app = open_app()
+    request, _ = app.submit_request(leave("Liam Johnson", next_monday(30), working_days=12))
+    assert (request.route, request.steps, app.waiting_for(request)) == ("long-leave", "manager,hr", "manager")
+
+    # HR cannot go first
+    with pytest.raises(InvalidTransition):
+        app.decide_request(request.id, "Approved", HR)
+    request = app.decide_request(request.id, "Approved", MANAGER)
+    assert (request.status, request.level, app.waiting_for(request)) == ("Pending", 1, "hr")
+    assert request.decided_by is None
+
+    # Nor can the manager approve twice
+    with pytest.raises(InvalidTransition):
+        app.decide_request(request.id, "Approved", MANAGER)
+    request = app.decide_request(request.id, "Approved", HR)
+    assert (request.status, request.decided_by, app.waiting_for(request)) == ("Approved", HR, None)
+    assert [e["action"] for e in app.audit.entries(request_id=request.id)][-2:] == ["approve-step", "approve"]
+
+
+def test_decision_on_a_stale_read_is_refused(open_app):
+    app = open_app()
+    request, _ = app.submit_request(leave("Liam Johnson", next_monday(30), working_days=12))
+    read = request.version
+    app.decide_request(request.id, "Approved", MANAGER)
+
+    with pytest.raises(StaleRequest):
+        app.decide_request(request.id, "Rejected", HR, expected_version=read)
+    stored = app.store.get(request.id)
+    assert (stored.status, stored.level) == ("Pending", 1)
+
+
+def test_batch_decisions_skip_and_group(open_app, monkeypatch):
+    app = open_app()
+    start = next_monday(30)
+    short, _ = app.submit_request(leave("Liam Johnson", start))
+    long, _ = app.submit_request(leave("Liam Johnson", start + timedelta(days=7), working_days=12))
+    maternity, _ = app.submit_request(leave("Liam Johnson", start + timedelta(days=35), type="Maternity"))
+    own, _ = app.submit_request(leave("Joy Nadu", start + timedelta(days=60)))
+    decided, _ = app.submit_request(leave("Liam Johnson", start + timedelta(days=70)))
+    app.decide_request(decided.id, "Approved", MANAGER)
+
+    transactions = []
+    transition_many = app.store.transition_many
+
+    def counted(*args, **kwargs):
+        transactions.append(args[1])
+        return transition_many(*args, **kwargs)
+
+    monkeypatch.setattr(app.store, "transition_many", counted)
+    ids = [short.id, long.id, short.id, maternity.id, own.id, decided.id, 9999]
+    changed, skipped = app.decide_requests(ids, "Approved", MANAGER)
+
+    # One transaction per outcome: approved outright, and passed on to HR
+    assert sorted(transactions) == ["Approved", "Pending"]
+    assert sorted((r.id, r.status, r.level) for r in changed) == [(short.id, "Approved", 0), (long.id, "Pending", 1)]
+    assert skipped == [maternity.id, own.id, decided.id, 9999]
+    assert app.waiting_for(app.store.get(long.id)) == "hr"
+    assert [e["action"] for e in app.audit.entries(request_id=long.id)][-1] == "approve-step"
@@ -0,0 +1,74 @@
+import json
+import zlib
+from datetime import date, datetime, timezone
+
+from audit import AuditLog
+from records import LeaveRequest
+
+NAMES = ["Ann Lee", "Bo Chen", "Cy Berg"]
+
+
+def leave(request_id):
+    return LeaveRequest(
+        id=request_id, name=NAMES[request_id % len(NAMES)], type="Vacation",
+        start_date=date(2024, 5, 6), status="Pending", version=1,
+    )
+
+
+def fill(path, count):
+    # Segments of 8 entries in blocks of 3, so 20 entries leave two sealed
+    # segments and four entries in the active one
+    log = AuditLog(str(path), segment_entries=8, block_entries=3)
+    log.record("submit", leave(1), "ann@x", at=datetime(2024, 1, 2, tzinfo=timezone.utc))
+    log.record_many("import", [leave(i) for i in range(2, count + 1)], "hr@x", at=datetime(2024, 3, 4, tzinfo=timezone.utc))
+    return log
+
+
+def test_sealed_segments_read_back_and_verify(tmp_path):
+    log = fill(tmp_path, 20)
+    assert sorted(p.name for p in (tmp_path / "audit").iterdir()) == [
+        "audit-000001.idx", "audit-000001.seg", "audit-000002.idx", "audit-000002.seg", "audit-000003.jsonl",
+    ]
+    assert [e["seq"] for e in log.entries()] == list(range(1, 21))
+    assert [e["request"] for e in log.entries(employee="Bo Chen")] == [1, 4, 7, 10, 13, 16, 19]
+    assert [e["request"] for e in log.entries(end=date(2024, 1, 31))] == [1]
+    assert next(log.entries(request_id=1))["fields"]["start_date"] == "2024-05-06"
+    assert log.verify() == (20, [])
+    head = log.head
+    log.close()
+
+    log = AuditLog(str(tmp_path), segment_entries=8, block_entries=3)
+    assert (log.seq, log.head) == (20, head)
+    log.record("approve", leave(3), "joy@x")
+    assert log.verify() == (21, [])
+    log.close()
+
+
+def test_verify_finds_edited_and_dropped_entries(tmp_path):
+    fill(tmp_path, 20).close()
+    # Edit an entry inside a sealed block and fix up the index, as someone
+    # covering their tracks would
+    data_path, index_path = tmp_path / "audit" / "audit-000001.seg", tmp_path / "audit" / "audit-000001.idx"
+    index = json.loads(index_path.read_text())
+    block = index["blocks"][-1]
+    data = data_path.read_bytes()
+    lines = zlib.decompress(data[block["offset"]:]).decode().splitlines()
+    lines[0] = lines[0].replace('"Vacation"', '"Sick Leave"')
+    rewritten = zlib.compress(("\n".join(lines) + "\n").encode())
+    data_path.write_bytes(data[:block["offset"]] + rewritten)
+    block["length"] = len(rewritten)
+    index_path.write_text(json.dumps(index))
+    # And drop one entry from the active segment
+    active = tmp_path / "audit" / "audit-000003.jsonl"
+    kept = active.read_text().splitlines(keepends=True)
+    active.write_text("".join(kept[:1] + kept[2:]))
+
+    log = AuditLog(str(tmp_path), segment_entries=8, block_entries=3)
+    count, problems = log.verify()
+    assert count == 19
+    assert problems == [
+        "entry 7: contents do not match its hash",
+        "entry 19: expected seq 18",
+        "entry 19: does not follow the entry before it",
+    ]
+    log.close()
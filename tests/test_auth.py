@@ -0,0 +1,40 @@
+import sys
+
+import auth
+from auth import Authenticator
+
+
+def test_seed_accounts_cover_every_role(tmp_path):
+    accounts = Authenticator(str(tmp_path), workers=1)
+    roles = {user["role"] for user in accounts.users.values()}
+    assert roles == {"employee", "manager", "hr"}
+    employee = next(email for email, user in accounts.users.items() if user["role"] == "employee")
+    assert accounts.can(employee, "submit") and accounts.can(employee, "view_history")
+    assert not accounts.can(employee, "decide")
+    accounts.executor.shutdown()
+
+
+def test_add_user_command(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["auth.py", "add-user", "Sam@Example.com", "--name", "Sam Reed", "--data", str(tmp_path)])
+    monkeypatch.setattr(auth.getpass, "getpass", lambda prompt: "s3cret")
+    auth.main()
+    assert "Added Sam@Example.com (employee)" in capsys.readouterr().out
+
+    accounts = Authenticator(str(tmp_path), workers=1)
+    user, token = accounts.login("sam@example.com", "s3cret").result()
+    assert user["name"] == "Sam Reed" and user["role"] == "employee"
+    assert accounts.verify_token(token)[0] == "sam@example.com"
+    assert accounts.can("sam@example.com", "submit")
+    accounts.executor.shutdown()
+
+
+def test_seed_accounts_only_on_a_fresh_install(tmp_path):
+    accounts = Authenticator(str(tmp_path), workers=1)
+    del accounts.users["joynadu@management.com"]
+    accounts._save_users()
+    accounts.executor.shutdown()
+
+    restarted = Authenticator(str(tmp_path), workers=1)
+    assert "joynadu@management.com" not in restarted.users
+    assert restarted.check_password("joynadu@management.com", "1234") is None
+    restarted.executor.shutdown()
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+import balances
+from balances import LEAVE_TYPES, BalanceEngine
+from records import LeaveRequest
+from store import LeaveStore
+
+NAMES = ["Ann Lee", "Bo Chen", "Cy Berg"]
+
+
+def used(engine):
+    return {(name, leave_type): engine.balance(name, leave_type, date(2024, 12, 31))[1] for name in NAMES for leave_type in LEAVE_TYPES}
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_recompute_matches_the_incremental_path(tmp_path, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(balances, "np", None)
+    store = LeaveStore(str(tmp_path))
+    engine = BalanceEngine(store, year=2024)
+    types = LEAVE_TYPES + ["Unpaid"]
+    requests = store.add_many([
+        LeaveRequest(
+            name=NAMES[i % 3], type=types[i % len(types)],
+            # Some run over the new year, and count only their 2024 days
+            start_date=date(2024, 1 + i % 12, 20), end_date=date(2024 + (i % 12 == 11), (1 + i % 12) % 12 + 1, 2),
+            status="Approved" if i % 4 else "Pending",
+        )
+        for i in range(40)
+    ])
+    # Approve some, take others out of Approved, and change who and what
+    for request in requests[:10]:
+        if request.status == "Pending":
+            store.transition(request.id, "Approved")
+        else:
+            store.update(request.id, status="Rejected")
+    store.update(requests[11].id, name="Cy Berg", end_date=date(2024, 12, 28))
+    store.update(requests[12].id, type="Vacation")
+    incremental = used(engine)
+    assert any(incremental.values())
+
+    engine.recompute()
+    assert used(engine) == incremental
+    store.close()
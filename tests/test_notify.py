@@ -0,0 +1,53 @@
+import notify
+from notify import MAX_ATTEMPTS, NotificationQueue
+
+
+def message(key):
+    return {"channel": "inbox", "recipient": "ann@x", "subject": key, "body": "", "key": key}
+
+
+def test_failed_counts_attempts_per_message(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(notify.time, "time", lambda: clock[0])
+
+    def fail_due():
+        clock[0] += 10_000
+        batch = sorted(queue.take_due(10), key=lambda m: m["id"])
+        return [m["key"] for m in batch], queue.failed(batch, "down")
+
+    queue = NotificationQueue(str(tmp_path))
+    queue.put_many([message("old")])
+    for _ in range(MAX_ATTEMPTS - 2):
+        assert fail_due() == (["old"], 0)
+
+    # A new message joins the batch of one on its last retry
+    queue.put_many([message("new")])
+    assert fail_due() == (["old", "new"], 0)
+    assert fail_due() == (["old", "new"], 1)
+    assert queue.dead == 1
+    assert [(m["key"], m["attempts"]) for m in queue.pending.values()] == [("new", 2)]
+    # The second attempt backs off for about 2 * BACKOFF_BASE seconds
+    assert queue.pending[2]["due"] - clock[0] < 3 * notify.BACKOFF_BASE
+    queue.close()
+
+    reopened = NotificationQueue(str(tmp_path))
+    assert reopened.dead == 1
+    assert [(m["key"], m["attempts"]) for m in reopened.pending.values()] == [("new", 2)]
+    reopened.close()
+
+
+def test_messages_queued_after_a_torn_line_survive(tmp_path):
+    queue = NotificationQueue(str(tmp_path))
+    queue.put_many([message("first")])
+    queue.close()
+    with open(tmp_path / "notifications.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op":"enqueue","message":{"id":2,')
+
+    queue = NotificationQueue(str(tmp_path))
+    assert len(queue) == 1
+    queue.put_many([message("second")])
+    queue.close()
+
+    queue = NotificationQueue(str(tmp_path))
+    assert sorted(m["key"] for m in queue.pending.values()) == ["first", "second"]
+    queue.close()
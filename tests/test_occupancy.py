@@ -0,0 +1,70 @@
+from datetime import date
+
+from occupancy import StaffingCalendar
+from store import LeaveStore
+
+
+def write_csv(path, rows):
+    lines = ["name,department,type,start_date,end_date,status"]
+    lines += [",".join(row) for row in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_import_and_restart_with_leave_before_2000(tmp_path, open_app):
+    app = open_app()
+    path = write_csv(tmp_path / "old.csv", [
+        ("Ann Lee", "Finance", "Vacation", "1999-06-01", "1999-06-03", "Approved"),
+        ("Ann Lee", "Finance", "Vacation", "2024-03-04", "2024-03-05", "Approved"),
+    ])
+    result = app.import_requests(path)
+    assert result.imported == 2
+    # Every index subscribed after the calendar saw both rows
+    assert app.search.query("ann", None) and len(list(app.search.query("ann", None))) == 2
+    rows, totals = app.staffing.schedule("Finance", date(1999, 5, 31), 5)
+    assert rows == [("Ann Lee", [False, True, True, True, False])]
+    assert totals == [0, 1, 1, 1, 0]
+    app.store.close()
+
+    restarted = open_app()
+    rows, _ = restarted.staffing.schedule("Finance", date(2024, 3, 4), 2)
+    assert rows == [("Ann Lee", [True, True])]
+    rows, _ = restarted.staffing.schedule("Finance", date(1999, 6, 1), 1)
+    assert rows == [("Ann Lee", [True])]
+
+
+def test_added_and_updated_requests_keep_day_sets_current(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    calendar = StaffingCalendar(store)
+    first = store.add({"name": "Bo", "department": "Design", "start_date": date(2024, 5, 6), "end_date": date(2024, 5, 7), "status": "Pending"})
+    store.add_many([
+        {"name": "Bo", "department": "Design", "start_date": date(2024, 5, 2), "end_date": date(2024, 5, 2), "status": "Pending"},
+        {"name": "Cy", "department": "Design", "start_date": date(2024, 5, 3), "end_date": date(2024, 5, 3), "status": "Pending"},
+    ])
+    rows, totals = calendar.schedule("Design", date(2024, 5, 2), 6)
+    assert rows == [
+        ("Bo", [True, False, False, False, True, True]),
+        ("Cy", [False, True, False, False, False, False]),
+    ]
+    assert totals == [1, 1, 0, 0, 1, 1]
+
+    store.transition(first.id, "Rejected")
+    rows, totals = calendar.schedule("Design", date(2024, 5, 2), 6)
+    assert rows[0] == ("Bo", [True, False, False, False, False, False])
+    assert totals == [1, 1, 0, 0, 0, 0]
+    store.close()
+
+
+def test_edited_request_does_not_count_against_itself(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    calendar = StaffingCalendar(store, headcounts={"Design": 3}, minimum_staff={"Design": 1})
+    store.add({"name": "Ann", "department": "Design", "start_date": date(2024, 5, 6), "end_date": date(2024, 5, 8), "status": "Approved"})
+    own = store.add({"name": "Bo", "department": "Design", "start_date": date(2024, 5, 7), "end_date": date(2024, 5, 9), "status": "Pending"})
+
+    assert calendar.check("Bo", "Design", date(2024, 5, 7), date(2024, 5, 9), ignore_id=own.id) == []
+    assert calendar.check("Bo", "Design", date(2024, 5, 6), date(2024, 5, 10), ignore_id=own.id) == []
+    # Someone else on the same days still does not fit
+    assert calendar.check("Cy", "Design", date(2024, 5, 8), date(2024, 5, 8)) == [
+        "Design would drop below 1 staff on May 08, 2024"
+    ]
+    store.close()
@@ -0,0 +1,43 @@
+import pytest
+
+from policy import DEFAULT_RULES, FALLBACK, ApprovalPolicy
+
+# Overlapping day ranges, departments and types, and a gap no rule covers
+RULES = [
+    {"name": "finance-long", "departments": ["Finance"], "min_days": 5, "steps": ["manager", "hr"]},
+    {"name": "sick-short", "types": ["Sick Leave"], "max_days": 2, "steps": []},
+    {"name": "design-sick", "departments": ["Design"], "types": ["Sick Leave"], "min_days": 3, "max_days": 9, "steps": ["hr"]},
+    {"name": "mid", "min_days": 3, "max_days": 20, "steps": ["manager"]},
+    {"name": "very-long", "min_days": 30, "steps": ["hr", "manager"]},
+]
+
+
+def first_match(rules, department, leave_type, days):
+    # The rules read top to bottom, as they are documented
+    for rule in rules:
+        if rule.get("departments") and department not in rule["departments"]:
+            continue
+        if rule.get("types") and leave_type not in rule["types"]:
+            continue
+        if days < (rule.get("min_days") or 0):
+            continue
+        if rule.get("max_days") is not None and days > rule["max_days"]:
+            continue
+        return rule["name"]
+    return FALLBACK.rule
+
+
+@pytest.mark.parametrize("rules", [DEFAULT_RULES, RULES])
+def test_table_routes_like_the_first_matching_rule(rules):
+    policy = ApprovalPolicy(rules)
+    for department in ("Finance", "Design", "Marketing", None):
+        for leave_type in ("Sick Leave", "Maternity", "Vacation", None):
+            for days in range(40):
+                assert policy.route(department, leave_type, days).rule == first_match(rules, department, leave_type, days), (department, leave_type, days)
+
+
+def test_rules_are_checked():
+    with pytest.raises(ValueError):
+        ApprovalPolicy([{"name": "no-steps"}])
+    with pytest.raises(ValueError):
+        ApprovalPolicy([{"name": "ceo", "steps": ["ceo"]}])
@@ -0,0 +1,49 @@
+from datetime import date
+
+from records import ColumnarArchive, LeaveRequest
+from store import LeaveStore
+
+
+def decided(**fields):
+    return LeaveRequest(
+        name="Ann Lee",
+        type="Vacation",
+        department="Finance",
+        start_date=date(2021, 4, 6),
+        end_date=date(2021, 4, 9),
+        status="Approved",
+        reason="Trip",
+        decided_on="2021-03-30",
+        decided_by="Joy Nadu",
+        **fields,
+    )
+
+
+def test_archive_keeps_every_field(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    routed, automatic, plain = store.add_many([
+        decided(route="long-leave", steps="manager,hr", level=1, cost_centre="F-12", tags=["q2", "offsite"]),
+        decided(route="short-sick-leave", steps="", level=0),
+        decided(),
+    ])
+    expected = {request.id: request.to_dict() for request in (routed, automatic, plain)}
+    assert store.archive(date(2022, 1, 1)) == 3
+    assert {request_id: store.get(request_id).to_dict() for request_id in expected} == expected
+    assert store.get(routed.id)["cost_centre"] == "F-12"
+    assert store.get(plain.id).level is None
+    store.close()
+
+    restarted = LeaveStore(str(tmp_path))
+    assert {request_id: restarted.get(request_id).to_dict() for request_id in expected} == expected
+    restarted.close()
+
+
+def test_rows_added_out_of_order_stay_aligned():
+    archive = ColumnarArchive()
+    archive.extend([decided(id=5, version=2, route="default", steps="manager", level=1, note="late")])
+    archive.extend([decided(id=2, version=1, route="maternity", steps="hr", level=0)])
+    assert list(archive.ids) == [2, 5]
+    assert [(r.route, r.steps, r.level, r.get("note")) for r in archive] == [
+        ("maternity", "hr", 0, None),
+        ("default", "manager", 1, "late"),
+    ]
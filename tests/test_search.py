@@ -0,0 +1,26 @@
+from search import RequestSearch
+from store import LeaveStore
+
+
+def test_results_stay_newest_first_after_updates(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    search = RequestSearch(store)
+    for i in range(4):
+        store.add({"name": "Ann Lee" if i != 2 else "Anna Berg", "department": "Finance"})
+    store.transition(1, "Approved")
+    store.update(3, reason="Moved")
+    store.transition_many([2], "Rejected")
+
+    assert list(search.query("ann")) == [4, 3, 2, 1]
+    assert list(search.query("lee")) == [4, 2, 1]
+    assert list(search.query("", "Pending")) == [4, 3]
+
+    store.transition(4, "Approved")
+    assert list(search.query("", "Approved")) == [4, 1]
+    assert list(search.query("ann", "Approved")) == [4, 1]
+    store.close()
+
+    # The order also survives a restart from the journal
+    store = LeaveStore(str(tmp_path))
+    assert list(RequestSearch(store).query("ann")) == [4, 3, 2, 1]
+    store.close()
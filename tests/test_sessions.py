@@ -0,0 +1,118 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import flet as ft
+
+from bench import HeadlessPage
+from records import LeaveRequest
+
+
+def walk(control):
+    yield control
+    for child in getattr(control, "controls", None) or ():
+        yield from walk(child)
+    for attribute in ("content", "title"):
+        child = getattr(control, attribute, None)
+        if isinstance(child, ft.Control):
+            yield from walk(child)
+
+
+def button(page, text):
+    return next(c for c in walk(page.views[-1]) if isinstance(c, (ft.ElevatedButton, ft.OutlinedButton)) and c.text == text)
+
+
+def click(control):
+    result = control.on_click(None)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+
+
+def open_session(app, email):
+    page = HeadlessPage(f"test-{email}", app.auth.issue_token(email))
+    app.main(page)
+    return page
+
+
+def fill_form(page, start, reason):
+    fields = page.views[-1].controls[1].content.controls
+    fields[2].value = "Finance"
+    fields[4].value = "Vacation"
+    fields[12].value = reason
+    for button_index in (7, 10):
+        click(fields[button_index])
+        page.dialogs[-1].on_change(SimpleNamespace(control=SimpleNamespace(value=datetime.combine(start, datetime.min.time()))))
+    click(button(page, "Submit"))
+
+
+def test_new_form_after_home_creates_a_new_request(open_app):
+    app = open_app()
+    page = open_session(app, "liam@management.com")
+    before = len(app.store.requests)
+    start = date.today() + timedelta(days=30)
+
+    page.go("/form")
+    name_field = page.views[-1].controls[1].content.controls[0]
+    assert (name_field.value, name_field.read_only) == ("Liam Johnson", True)
+    # Typing another name changes nothing for an employee
+    name_field.value = "Joy Nadu"
+    fill_form(page, start, "First")
+    assert page.route == "/details"
+    page.go("/home")
+    page.go("/form")
+    fill_form(page, start + timedelta(days=7), "Second")
+    assert len(app.store.requests) == before + 2
+
+    # Back to Form edits the request just submitted
+    click(button(page, "Back to Form"))
+    fields = page.views[-1].controls[1].content.controls
+    fields[12].value = "Second, edited"
+    click(button(page, "Submit"))
+    assert len(app.store.requests) == before + 2
+    assert [r.reason for r in app.store.for_employee("Liam Johnson")][-2:] == ["First", "Second, edited"]
+
+
+def test_edit_racing_a_decision_is_refused(open_app, monkeypatch):
+    app = open_app()
+    start = date.today() + timedelta(days=40)
+    while start.weekday() != 0:
+        start += timedelta(days=1)
+
+    def leave(end):
+        return LeaveRequest(name="Liam Johnson", type="Vacation", department="Finance", start_date=start, end_date=end, reason="Trip")
+
+    request, _ = app.submit_request(leave(start))
+    read = app.store.get
+
+    def read_then_approve(request_id):
+        # The manager's decision lands right after the edit read the request
+        snapshot = LeaveRequest.from_fields(read(request_id).to_dict())
+        if request_id == request.id:
+            monkeypatch.setattr(app.store, "get", read)
+            app.decide_request(request_id, "Approved", "joynadu@management.com")
+        return snapshot
+
+    monkeypatch.setattr(app.store, "get", read_then_approve)
+    edited, problems = app.submit_request(leave(start + timedelta(days=15)), request.id)
+    assert edited is None
+    assert problems == [f"Request {request.id} was changed by someone else (now Approved)"]
+    stored = app.store.get(request.id)
+    assert (stored.status, stored.end_date, stored.route) == ("Approved", start, "default")
+
+    # Once decided, it is no longer edited at all
+    _, problems = app.submit_request(leave(start + timedelta(days=1)), request.id)
+    assert problems == [f"Request {request.id} was already approved"]
+
+
+def test_employees_only_file_their_own_leave(open_app):
+    app = open_app()
+    start = date.today() + timedelta(days=50)
+    theirs = LeaveRequest(name="Joy Nadu", type="Vacation", department="Finance", start_date=start, end_date=start)
+    assert app.submit_request(theirs, actor="liam@management.com") == (None, ["You can only request leave for yourself"])
+
+    request, problems = app.submit_request(theirs, actor="joynadu@management.com")
+    assert problems == []
+    # Nor edit someone else's by id
+    mine = LeaveRequest(name="Liam Johnson", type="Vacation", department="Finance", start_date=start, end_date=start)
+    assert app.submit_request(mine, request.id, actor="liam@management.com") == (None, ["You can only request leave for yourself"])
+    assert app.store.get(request.id).name == "Joy Nadu"
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from records import LeaveRequest
+from sqlstore import SqliteStore
+
+
+def stop_following(store):
+    # Leave the store behind other workers until something syncs it
+    store.stopped.set()
+    store.follower.join()
+
+
+def test_archive_moves_rows_for_every_worker(tmp_path):
+    first = SqliteStore(str(tmp_path))
+    second = SqliteStore(str(tmp_path))
+    stop_following(second)
+    try:
+        old, rejected, pending, recent = first.add_many([
+            LeaveRequest(name="Ann Lee", type="Vacation", start_date=date(2020, 5, 4), end_date=date(2020, 5, 8), status="Approved"),
+            LeaveRequest(name="Bo Chen", type="Vacation", start_date=date(2020, 7, 1), status="Rejected"),
+            LeaveRequest(name="Ann Lee", type="Vacation", start_date=date(2020, 9, 1)),
+            LeaveRequest(name="Bo Chen", type="Vacation", start_date=date(2024, 2, 1), status="Approved"),
+        ])
+        assert first.archive(date(2023, 1, 1)) == 2
+        assert old.id not in first.requests and rejected.id not in first.requests
+        assert first.get(old.id).end_date == date(2020, 5, 8)
+        assert [r.id for r in first.for_employee("Ann Lee")] == [pending.id]
+
+        second.sync()
+        assert old.id not in second.requests
+        assert second.get(rejected.id).status == "Rejected"
+        assert second.get(recent.id).status == "Approved"
+
+        # Archived ids are not handed out again, even when they were the last
+        assert first.archive(date(2025, 1, 1)) == 1
+        assert first.add(LeaveRequest(name="Cy Berg", start_date=date(2024, 3, 1))).id == recent.id + 1
+    finally:
+        first.close()
+        second.close()
+
+    restarted = SqliteStore(str(tmp_path))
+    try:
+        assert sorted(restarted.requests) == [pending.id, recent.id + 1]
+        assert restarted.get(old.id).name == "Ann Lee"
+        assert restarted.get(recent.id).start_date == date(2024, 2, 1)
+    finally:
+        restarted.close()
+
+
+def test_staffing_check_sees_other_workers(open_app):
+    first = open_app(backend="sqlite", worker=0)
+    second = open_app(backend="sqlite", worker=1)
+    stop_following(second.store)
+    day = date.today() + timedelta(days=60)
+
+    def leave(name):
+        return LeaveRequest(name=name, type="Vacation", department="Finance", start_date=day, end_date=day, reason="Trip")
+
+    # Finance has 8 people and needs 1 in; 7 are off after this
+    for i in range(7):
+        request, problems = first.submit_request(leave(f"Person {i}"))
+        assert problems == [] and request.status == "Pending"
+
+    request, problems = second.submit_request(leave("Person 7"))
+    assert request is None
+    assert problems == [f"Finance would drop below 1 staff on {day.strftime('%b %d, %Y')}"]
+    assert second.store.count("Pending") == first.store.count("Pending")
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from intervals import LeaveCalendar
+from stats import DashboardStats
+from store import LeaveStore
+
+
+def test_upcoming_counts_approved_leave_from_the_interval_index(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    calendar = LeaveCalendar(store, statuses=("Approved",))
+    stats = DashboardStats(store, calendar)
+    today = date.today()
+    soon = store.add({"name": "Ann", "start_date": today + timedelta(days=3), "end_date": today + timedelta(days=4)})
+    store.add_many([
+        {"name": "Bo", "start_date": today + timedelta(days=10), "status": "Approved"},
+        {"name": "Cy", "start_date": today + timedelta(days=90), "status": "Approved"},
+        {"name": "Di", "start_date": today - timedelta(days=2), "status": "Approved"},
+    ])
+    assert stats.upcoming == 1
+    assert stats.pending == 1
+
+    store.transition(soon.id, "Approved", decided_on=today.isoformat())
+    assert stats.upcoming == 2
+    assert stats.approved_today == 1
+    assert calendar.on_leave(today - timedelta(days=2)) == [4]
+    store.close()
@@ -0,0 +1,42 @@
+from datetime import date
+
+from records import LeaveRequest
+from store import SEED_REQUESTS, LeaveStore
+
+
+def leave(name):
+    return LeaveRequest(name=name, type="Vacation", start_date=date(2024, 5, 6))
+
+
+def test_writes_after_a_torn_journal_line_survive(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    store.add_many([leave("Ann Lee"), leave("Bo Chen")])
+    store.close()
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"op":"add","request":{"id":3,"na')
+
+    store = LeaveStore(str(tmp_path))
+    assert sorted(store.requests) == [1, 2]
+    store.add(leave("Cy Berg"))
+    store.add(leave("Di Shaw"))
+    store.close()
+
+    store = LeaveStore(str(tmp_path))
+    assert [store.get(i).name for i in sorted(store.requests)] == ["Ann Lee", "Bo Chen", "Cy Berg", "Di Shaw"]
+    store.close()
+
+
+def test_archiving_everything_does_not_bring_the_seed_back(tmp_path):
+    store = LeaveStore(str(tmp_path))
+    store.seed(SEED_REQUESTS)
+    seeded = len(store)
+    for request_id in list(store.requests):
+        if store.get(request_id).status == "Pending":
+            store.transition(request_id, "Approved", decided_on="2024-03-01", decided_by="Joy Nadu")
+    assert store.archive(date(2025, 1, 1)) == seeded
+    store.close()
+
+    store = LeaveStore(str(tmp_path))
+    store.seed(SEED_REQUESTS)
+    assert not store.requests and len(store.archived) == seeded
+    store.close()
@@ -0,0 +1,99 @@
+import csv
+from datetime import date, timedelta
+
+import transfer
+from balances import BalanceEngine
+from occupancy import StaffingCalendar
+from records import LeaveRequest
+from reports import LeaveReports
+from store import LeaveStore
+
+MANAGER = "joynadu@management.com"
+ROUTE_FIELDS = ("status", "decided_on", "decided_by", "route", "steps", "level")
+
+
+def next_monday(days_ahead):
+    day = date.today() + timedelta(days=days_ahead)
+    return day + timedelta(days=-day.weekday() % 7)
+
+
+def test_export_then_import_keeps_decisions_and_routes(open_app, tmp_path):
+    app = open_app()
+    start = next_monday(30)
+    # Twelve working days take the manager, then HR
+    long, _ = app.submit_request(LeaveRequest(
+        name="Liam Johnson", type="Vacation", department="Finance",
+        start_date=start, end_date=start + timedelta(days=15), reason="Trip",
+    ))
+    short, _ = app.submit_request(LeaveRequest(
+        name="Liam Johnson", type="Vacation", department="Finance",
+        start_date=start + timedelta(days=28), end_date=start + timedelta(days=28), reason="Trip",
+    ))
+    app.decide_request(long.id, "Approved", MANAGER)
+    app.decide_request(short.id, "Approved", MANAGER)
+    exported = [app.store.get(request_id) for request_id in (long.id, short.id)]
+    assert [(r.status, r.level) for r in exported] == [("Pending", 1), ("Approved", 0)]
+
+    path = str(tmp_path / "requests.csv")
+    assert app.export_requests(path, [long.id, short.id]) == 2
+    assert app.import_requests(path, MANAGER).imported == 2
+    imported = [app.store.get(request_id) for request_id in sorted(app.store.requests)[-2:]]
+    assert [[r[field] for field in ROUTE_FIELDS] for r in imported] == [
+        [r[field] for field in ROUTE_FIELDS] for r in exported
+    ]
+    assert app.waiting_for(imported[0]) == "hr"
+
+
+def write_rows(path, count):
+    year = date.today().year
+    names = ["Ann Lee", "Bo Chen", "Cy Berg", "Di Shaw"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=transfer.FIELDS)
+        writer.writeheader()
+        for i in range(count):
+            start = date(year, 1, 1) + timedelta(days=(i * 37) % 360)
+            writer.writerow({
+                "name": names[i % len(names)],
+                "department": ("Finance", "Design", "")[i % 3],
+                "type": ("Vacation", "Sick Leave", "Personal")[i % 3],
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=i % 9)).isoformat(),
+                "status": ("Approved", "Pending", "Approved", "Rejected")[i % 4],
+            })
+
+
+def days_off(staffing):
+    # {department: {day ordinal: people off}} without the zero days
+    return {
+        department: {staffing.base + i: count for i, count in enumerate(counts) if count}
+        for department, counts in staffing.days_off.items()
+    }
+
+
+def test_imported_chunks_add_up_like_single_requests(open_app, tmp_path):
+    app = open_app()
+    path = str(tmp_path / "requests.csv")
+    write_rows(path, 90)
+    # Small chunks, so the batch handlers add onto what earlier chunks left
+    assert transfer.import_requests(app.store, path, chunk_size=7).imported == 90
+
+    # Every stored request fed one at a time through the per-change listeners
+    store = LeaveStore(str(tmp_path / "single"))
+    reports = LeaveReports(store, app.workdays)
+    balances = BalanceEngine(store, year=app.balances.year, count_days=app.workdays.days_in_year)
+    staffing = StaffingCalendar(store)
+    for request_id in sorted(app.store.requests):
+        request = app.store.get(request_id)
+        for listener in (reports, balances, staffing):
+            listener.on_change(request, None)
+
+    assert app.reports.days_by_department == reports.days_by_department
+    assert app.reports.days_by_week == reports.days_by_week
+    assert app.reports.decisions_by_type == reports.decisions_by_type
+    for name in ("Ann Lee", "Bo Chen", "Cy Berg", "Di Shaw"):
+        for leave_type in ("Vacation", "Sick Leave", "Personal"):
+            assert app.balances.balance(name, leave_type) == balances.balance(name, leave_type)
+    assert app.staffing.employee_days == staffing.employee_days
+    assert app.staffing.counted == staffing.counted
+    assert days_off(app.staffing) == days_off(staffing)
+    store.close()
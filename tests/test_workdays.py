@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+from workdays import WorkCalendar, easter_sunday
+
+
+def counted(calendar, start, end):
+    # Day by day, as the prefix sums should add up
+    days = 0
+    day = start
+    while day <= end:
+        if day.weekday() not in calendar.weekend and day not in calendar.holidays:
+            days += 1
+        day += timedelta(days=1)
+    return days
+
+
+def test_easter():
+    assert [easter_sunday(year) for year in (2024, 2025, 2038)] == [date(2024, 3, 31), date(2025, 4, 20), date(2038, 4, 25)]
+
+
+def test_holidays_are_not_working_days():
+    calendar = WorkCalendar("UK", first_year=2024, last_year=2024)
+    # Good Friday and Easter Monday
+    assert calendar.business_days(date(2024, 3, 25), date(2024, 4, 5)) == 8
+    assert not calendar.is_working_day(date(2024, 3, 29))
+    # Christmas week without Christmas Day and Boxing Day
+    assert calendar.business_days(date(2024, 12, 23), date(2024, 12, 27)) == 3
+    assert calendar.business_days(date(2024, 12, 25)) == 0
+    assert calendar.business_days(date(2024, 5, 10), date(2024, 5, 9)) == 0
+
+
+def test_extra_holidays_and_weekend():
+    calendar = WorkCalendar(weekend=(4, 5), extra_holidays={date(2024, 6, 3)}, first_year=2024, last_year=2024)
+    # Sun 2 Jun - Sat 8 Jun: Friday and Saturday off, and Monday is a holiday
+    assert calendar.business_days(date(2024, 6, 2), date(2024, 6, 8)) == 4
+
+
+@pytest.mark.parametrize("start, end", [
+    # The first and last day of the table
+    (date(2024, 1, 1), date(2025, 12, 31)),
+    # Over the year boundary inside the table
+    (date(2024, 12, 20), date(2025, 1, 10)),
+    # Starting before it, ending after it, and wholly outside it
+    (date(2023, 12, 20), date(2024, 1, 10)),
+    (date(2025, 12, 20), date(2026, 1, 10)),
+    (date(2019, 3, 1), date(2019, 4, 30)),
+])
+def test_counts_across_the_table_edges(start, end):
+    calendar = WorkCalendar("FI", first_year=2024, last_year=2025)
+    days = calendar.business_days(start, end)
+    assert calendar.first_year <= start.year and end.year <= calendar.last_year
+    assert days == counted(calendar, start, end)
+    # Holidays of the years added on the fly count too
+    assert date(start.year, 1, 1) in calendar.holidays
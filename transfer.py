@@ -0,0 +1,208 @@
+import csv
+import gc
+import itertools
+import json
+import os
+from datetime import date, datetime
+
+from dates import DISPLAY_FORMAT, parse_date_range
+from records import LeaveRequest
+
+
+# Columns written on export and accepted on import. Imported requests get
+# fresh ids, so an `id` column is ignored. Who decided and when, and where
+# a request is in its approval route, come back as they were exported.
+FIELDS = [
+    "id", "name", "department", "type", "start_date", "end_date", "status", "reason",
+    "decided_on", "decided_by", "route", "steps", "level",
+]
+STATUSES = ("Pending", "Approved", "Rejected")
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        # (row number, message) for the first MAX_REPORTED_ERRORS failures
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported file type: {path} (use .csv or .jsonl)")
+
+
+def read_rows(path):
+    # Yields (row number, dict) one row at a time
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format(path) == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                yield number, row
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as ex:
+                    yield number, ex
+                    continue
+                yield number, row
+
+
+def _parse_date(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, DISPLAY_FORMAT).date()
+
+
+def validate(row):
+    # Returns a LeaveRequest ready to store, or raises ValueError
+    if not isinstance(row, dict):
+        raise ValueError(f"Not a JSON object: {row}")
+
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+
+    status = row.get("status") or "Pending"
+    if status not in STATUSES:
+        raise ValueError(f"unknown status {status!r}")
+
+    if row.get("dates") and not row.get("start_date"):
+        start, end = parse_date_range(row["dates"])
+        if start is None:
+            raise ValueError(f"cannot read dates {row['dates']!r}")
+    else:
+        try:
+            start = _parse_date(row.get("start_date"))
+            end = _parse_date(row.get("end_date"))
+        except ValueError:
+            raise ValueError(f"cannot read dates {row.get('start_date')!r} - {row.get('end_date')!r}")
+    end = end or start
+    if start is not None and end < start:
+        raise ValueError("end_date is before start_date")
+
+    try:
+        decided_on = _parse_date(row.get("decided_on"))
+    except ValueError:
+        raise ValueError(f"cannot read decided_on {row.get('decided_on')!r}")
+
+    # An empty `steps` is a route approved without steps, so it only counts
+    # as missing when there is no route either
+    route = row.get("route") or None
+    level = row.get("level")
+    if level in (None, ""):
+        level = None
+    elif str(level).strip().isdigit():
+        level = int(level)
+    else:
+        raise ValueError(f"level must be a whole number, not {level!r}")
+
+    return LeaveRequest(
+        name=name,
+        department=row.get("department") or None,
+        type=row.get("type") or None,
+        start_date=start,
+        end_date=end,
+        status=status,
+        reason=row.get("reason") or "",
+        decided_on=decided_on.isoformat() if decided_on else None,
+        decided_by=row.get("decided_by") or None,
+        route=route,
+        steps=(row.get("steps") or "") if route else None,
+        level=level if route else None,
+    )
+
+
+def valid_rows(rows, result):
+    for number, row in rows:
+        if isinstance(row, Exception):
+            result.add_error(number, f"invalid JSON: {row}")
+            continue
+        try:
+            yield validate(row)
+        except ValueError as ex:
+            result.add_error(number, str(ex))
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_requests(store, path, chunk_size=CHUNK_SIZE, on_chunk=None, prepare=None):
+    # Streams the file through read -> validate -> chunk -> store.add_many,
+    # so only one chunk is held in memory at a time. prepare(chunk) may fill
+    # in fields of the validated requests before they are stored, and
+    # on_chunk(added) sees every stored chunk.
+    #
+    # Every stored request is a new long-lived object and none of them form
+    # reference cycles, so the cyclic collector would only rescan the
+    # growing heap over and over; it is paused until the import ends.
+    result = ImportResult()
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for chunk in chunks(valid_rows(read_rows(path), result), chunk_size):
+            if prepare is not None:
+                prepare(chunk)
+            added = store.add_many(chunk)
+            if on_chunk is not None:
+                on_chunk(added)
+            result.imported += len(chunk)
+    finally:
+        if collecting:
+            gc.enable()
+    return result
+
+
+def _export_row(request):
+    row = {key: getattr(request, key) for key in FIELDS}
+    for key in ("start_date", "end_date"):
+        if row[key] is not None:
+            row[key] = row[key].isoformat()
+    return row
+
+
+def export_requests(store, path, request_ids=None):
+    # Writes the given ids (any iterable, e.g. a search result) or the whole
+    # store, one row at a time. Returns the number of rows written.
+    if request_ids is None:
+        request_ids = store.ids()
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        if file_format(path) == "csv":
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda row: f.write(json.dumps(row) + "\n")
+        for request_id in request_ids:
+            request = store.get(request_id)
+            if request is not None:
+                write(_export_row(request))
+                count += 1
+    os.replace(tmp_path, path)
+    return count
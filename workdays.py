@@ -0,0 +1,120 @@
+import threading
+from array import array
+from datetime import date, timedelta
+
+
+def easter_sunday(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _finland(year):
+    easter = easter_sunday(year)
+    midsummer_eve = date(year, 6, 19)
+    midsummer_eve += timedelta(days=(4 - midsummer_eve.weekday()) % 7)
+    return {
+        date(year, 1, 1), date(year, 1, 6),
+        easter - timedelta(days=2), easter + timedelta(days=1),
+        date(year, 5, 1), easter + timedelta(days=39),
+        midsummer_eve,
+        date(year, 12, 6), date(year, 12, 24), date(year, 12, 25), date(year, 12, 26),
+    }
+
+
+def _united_kingdom(year):
+    easter = easter_sunday(year)
+    first_may = date(year, 5, 1)
+    last_may = date(year, 5, 31)
+    last_august = date(year, 8, 31)
+    return {
+        date(year, 1, 1),
+        easter - timedelta(days=2), easter + timedelta(days=1),
+        first_may + timedelta(days=(0 - first_may.weekday()) % 7),
+        last_may - timedelta(days=last_may.weekday()),
+        last_august - timedelta(days=last_august.weekday()),
+        date(year, 12, 25), date(year, 12, 26),
+    }
+
+
+# Public holidays per region, as functions of the year
+HOLIDAY_RULES = {
+    "none": lambda year: set(),
+    "FI": _finland,
+    "UK": _united_kingdom,
+}
+
+
+class WorkCalendar:
+    # Working-day counts in O(1) from a prefix-sum array: cumulative[i] is
+    # the number of working days in [base, base + i). Weekends are weekday
+    # numbers (Monday=0); holidays come from HOLIDAY_RULES plus any extra
+    # dates. The array covers whole years and is extended when a date
+    # outside it is asked for.
+    def __init__(self, region="none", weekend=(5, 6), extra_holidays=(), first_year=None, last_year=None):
+        if region not in HOLIDAY_RULES:
+            raise ValueError(f"Unknown holiday region: {region}")
+        self.region = region
+        self.weekend = frozenset(weekend)
+        self.extra_holidays = frozenset(extra_holidays)
+        self.lock = threading.Lock()
+        this_year = date.today().year
+        self._build(first_year or this_year - 5, last_year or this_year + 5)
+
+    def _build(self, first_year, last_year):
+        rule = HOLIDAY_RULES[self.region]
+        holidays = set(self.extra_holidays)
+        for year in range(first_year, last_year + 1):
+            holidays |= rule(year)
+
+        base = date(first_year, 1, 1)
+        total_days = (date(last_year + 1, 1, 1) - base).days
+        cumulative = array("i", [0]) * (total_days + 1)
+        weekday = base.weekday()
+        day = base
+        running = 0
+        for i in range(total_days):
+            if weekday not in self.weekend and day not in holidays:
+                running += 1
+            cumulative[i + 1] = running
+            weekday = (weekday + 1) % 7
+            day += timedelta(days=1)
+
+        self.holidays = frozenset(holidays)
+        # Swapped in as one tuple so readers never pair a new base with an old array
+        self.table = (base.toordinal(), cumulative)
+        self.first_year, self.last_year = first_year, last_year
+
+    def _covers(self, start, end):
+        if start.year < self.first_year or end.year > self.last_year:
+            with self.lock:
+                if start.year < self.first_year or end.year > self.last_year:
+                    self._build(min(start.year, self.first_year), max(end.year, self.last_year))
+
+    def business_days(self, start, end=None):
+        # Working days in [start, end], both ends included
+        end = end or start
+        if end < start:
+            return 0
+        self._covers(start, end)
+        base, cumulative = self.table
+        return cumulative[end.toordinal() - base + 1] - cumulative[start.toordinal() - base]
+
+    def days_in_year(self, start, end, year):
+        # Same signature as balances.leave_days: working days of [start, end] inside `year`
+        if start is None:
+            return 0
+        end = end or start
+        return self.business_days(max(start, date(year, 1, 1)), min(end, date(year, 12, 31)))
+
+    def is_working_day(self, day):
+        return self.business_days(day, day) == 1
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    # Raised instead of queueing when the pool already has max_pending jobs
+    pass
+
+
+class WorkerPool:
+    # Runs blocking work for async event handlers on a bounded executor.
+    #
+    # At most `max_pending` jobs may be queued or running; past that `run`
+    # fails fast with Overloaded so callers can tell the user to retry
+    # instead of piling up work. Each call waits at most `timeout` seconds.
+    # Use processes=True for CPU-bound work on picklable functions.
+    def __init__(self, max_workers=8, max_pending=64, timeout=10.0, processes=False):
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.timeout = timeout
+
+    def submit(self, fn, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            raise Overloaded("Too much work queued, please try again")
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        # The slot is held until the job really finishes, even if the caller
+        # stopped waiting for it
+        future.add_done_callback(lambda f: self.slots.release())
+        return future
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        return await self.wait(self.submit(fn, *args, **kwargs), timeout)
+
+    async def wait(self, future, timeout=None):
+        # Await a concurrent.futures.Future (e.g. from another pool) with a timeout
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)